@@ -0,0 +1,43 @@
+"""add ts column to attendances and clients
+
+Revision ID: 5c1d7e2a9b40
+Revises: ac8b89991722
+Create Date: 2026-10-18 14:05:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1d7e2a9b40'
+down_revision: Union[str, None] = 'ac8b89991722'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('attendances', sa.Column('ts', sa.DateTime(), nullable=True))
+    op.add_column('clients', sa.Column('ts', sa.DateTime(), nullable=True))
+
+    # Postgres parses both "YYYY-MM-DD HH:MM:SS" and ISO 8601 strings; a UTC offset is dropped,
+    # which matches the wall-clock time the reports have always used.
+    op.execute("UPDATE attendances SET ts = CAST(time AS TIMESTAMP)")
+    op.execute("UPDATE clients SET ts = CAST(time AS TIMESTAMP)")
+
+    op.alter_column('attendances', 'ts', existing_type=sa.DateTime(), nullable=False)
+    op.alter_column('clients', 'ts', existing_type=sa.DateTime(), nullable=False)
+
+    op.create_index('ix_attendances_person_id_ts', 'attendances', ['person_id', 'ts'], unique=False)
+    op.create_index('ix_attendances_camera_id_ts', 'attendances', ['camera_id', 'ts'], unique=False)
+    op.create_index('ix_clients_camera_id_ts', 'clients', ['camera_id', 'ts'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clients_camera_id_ts', table_name='clients')
+    op.drop_index('ix_attendances_camera_id_ts', table_name='attendances')
+    op.drop_index('ix_attendances_person_id_ts', table_name='attendances')
+    op.drop_column('clients', 'ts')
+    op.drop_column('attendances', 'ts')
@@ -0,0 +1,53 @@
+"""add daily_presence table
+
+Revision ID: 9a4e6b1f03c8
+Revises: 5c1d7e2a9b40
+Create Date: 2026-10-18 14:32:47.105612
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4e6b1f03c8'
+down_revision: Union[str, None] = '5c1d7e2a9b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('daily_presence',
+    sa.Column('person_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('first_ts', sa.DateTime(), nullable=False),
+    sa.Column('last_ts', sa.DateTime(), nullable=False),
+    sa.Column('punch_count', sa.Integer(), nullable=False),
+    sa.Column('first_file_path', sa.String(), nullable=False),
+    sa.Column('last_file_path', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text("TIMEZONE('utc', now())"), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text("TIMEZONE('utc', now())"), nullable=False),
+    sa.ForeignKeyConstraint(['person_id'], ['employees.id'], ),
+    sa.PrimaryKeyConstraint('person_id', 'date')
+    )
+    op.create_index('ix_daily_presence_date', 'daily_presence', ['date'], unique=False)
+
+    op.execute("""
+        INSERT INTO daily_presence (person_id, date, first_ts, last_ts, punch_count, first_file_path, last_file_path)
+        SELECT person_id,
+               CAST(ts AS DATE),
+               min(ts),
+               max(ts),
+               count(id),
+               (array_agg(file_path ORDER BY ts ASC, id ASC))[1],
+               (array_agg(file_path ORDER BY ts DESC, id DESC))[1]
+        FROM attendances
+        GROUP BY person_id, CAST(ts AS DATE)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_daily_presence_date', table_name='daily_presence')
+    op.drop_table('daily_presence')
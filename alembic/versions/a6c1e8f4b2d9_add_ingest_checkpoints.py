@@ -0,0 +1,31 @@
+"""add ingest checkpoints
+
+Revision ID: a6c1e8f4b2d9
+Revises: e4b9d0a3c7f2
+Create Date: 2026-10-18 21:04:52.118306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c1e8f4b2d9'
+down_revision: Union[str, None] = 'e4b9d0a3c7f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('ingest_checkpoints',
+    sa.Column('journal', sa.String(), nullable=False),
+    sa.Column('last_seq', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text("TIMEZONE('utc', now())"), nullable=False),
+    sa.PrimaryKeyConstraint('journal')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ingest_checkpoints')
@@ -0,0 +1,44 @@
+"""add daily report counters
+
+Revision ID: b3f0c27d5e81
+Revises: 9a4e6b1f03c8
+Create Date: 2026-10-18 15:20:11.482930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f0c27d5e81'
+down_revision: Union[str, None] = '9a4e6b1f03c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('daily_report_counters',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('time_slot', sa.String(), nullable=False),
+    sa.Column('gender', sa.String(), nullable=False),
+    sa.Column('age', sa.Integer(), nullable=False),
+    sa.Column('client_status', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text("TIMEZONE('utc', now())"), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text("TIMEZONE('utc', now())"), nullable=False),
+    sa.PrimaryKeyConstraint('date', 'time_slot', 'gender', 'age', 'client_status')
+    )
+    op.create_table('daily_report_clients',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('ts', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text("TIMEZONE('utc', now())"), nullable=False),
+    sa.PrimaryKeyConstraint('date', 'client_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_report_clients')
+    op.drop_table('daily_report_counters')
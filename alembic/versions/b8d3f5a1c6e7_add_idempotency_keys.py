@@ -0,0 +1,35 @@
+"""add idempotency keys
+
+Revision ID: b8d3f5a1c6e7
+Revises: a6c1e8f4b2d9
+Create Date: 2026-10-18 23:12:37.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d3f5a1c6e7'
+down_revision: Union[str, None] = 'a6c1e8f4b2d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('attendances', sa.Column('idempotency_key', sa.String(), nullable=True))
+    op.create_index('ux_attendances_idempotency_key', 'attendances', ['idempotency_key'], unique=True)
+    op.create_table('client_event_keys',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text("TIMEZONE('utc', now())"), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('client_event_keys')
+    op.drop_index('ux_attendances_idempotency_key', table_name='attendances')
+    op.drop_column('attendances', 'idempotency_key')
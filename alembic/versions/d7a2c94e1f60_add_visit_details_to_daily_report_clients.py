@@ -0,0 +1,60 @@
+"""add visit details to daily_report_clients
+
+Revision ID: d7a2c94e1f60
+Revises: b3f0c27d5e81
+Create Date: 2026-10-18 18:05:36.219874
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a2c94e1f60'
+down_revision: Union[str, None] = 'b3f0c27d5e81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('daily_report_clients', sa.Column('time_slot', sa.String(), nullable=True))
+    op.add_column('daily_report_clients', sa.Column('gender', sa.String(), nullable=True))
+    op.add_column('daily_report_clients', sa.Column('age', sa.Integer(), nullable=True))
+    op.add_column('daily_report_clients', sa.Column('client_status', sa.String(), nullable=True))
+    op.create_index('ix_daily_report_clients_ts', 'daily_report_clients', ['ts'], unique=False)
+
+    # time_slot follows get_time_slot(): the minute is rounded half to even to a half hour.
+    # A visit is "new" when it is the client's first one, like create_client() decides.
+    op.execute("""
+        UPDATE daily_report_clients AS drc
+        SET time_slot = to_char(
+                date_trunc('hour', drc.ts) + CASE
+                    WHEN extract(minute FROM drc.ts) <= 15 THEN interval '0 minutes'
+                    WHEN extract(minute FROM drc.ts) < 45 THEN interval '30 minutes'
+                    ELSE interval '60 minutes'
+                END,
+                'HH24:MI'
+            ),
+            client_status = CASE
+                WHEN drc.date = (SELECT min(first.date) FROM daily_report_clients AS first
+                                 WHERE first.client_id = drc.client_id) THEN 'new'
+                ELSE 'regular'
+            END
+    """)
+    # gender and age are only known as the client row holds them now
+    op.execute("""
+        UPDATE daily_report_clients AS drc
+        SET gender = c.gender, age = c.age
+        FROM clients AS c
+        WHERE c.id = drc.client_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_daily_report_clients_ts', table_name='daily_report_clients')
+    op.drop_column('daily_report_clients', 'client_status')
+    op.drop_column('daily_report_clients', 'age')
+    op.drop_column('daily_report_clients', 'gender')
+    op.drop_column('daily_report_clients', 'time_slot')
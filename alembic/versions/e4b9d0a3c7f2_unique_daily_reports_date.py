@@ -0,0 +1,107 @@
+"""unique daily_reports date
+
+Revision ID: e4b9d0a3c7f2
+Revises: d7a2c94e1f60
+Create Date: 2026-10-18 19:12:08.530417
+
+"""
+from collections import defaultdict
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b9d0a3c7f2'
+down_revision: Union[str, None] = 'd7a2c94e1f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+daily_reports = sa.table(
+    'daily_reports',
+    sa.column('id', sa.Integer),
+    sa.column('date', sa.String),
+    sa.column('clients', sa.JSON),
+    sa.column('gender', sa.JSON),
+    sa.column('age', sa.JSON),
+    sa.column('time_slots', sa.JSON),
+    sa.column('total_new_clients', sa.Integer),
+    sa.column('total_regular_clients', sa.Integer),
+    sa.column('male_percentage', sa.Float),
+    sa.column('female_percentage', sa.Float),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def merge_reports(reports):
+    clients = []
+    gender = defaultdict(int)
+    age = defaultdict(int)
+    time_slots = {}
+    total_new_clients = total_regular_clients = 0
+
+    for report in reports:
+        for client_id in report.clients or []:
+            if client_id not in clients:
+                clients.append(client_id)
+        for key, count in (report.gender or {}).items():
+            gender[key] += count
+        for key, count in (report.age or {}).items():
+            age[key] += count
+        for slot in report.time_slots if isinstance(report.time_slots, list) else []:
+            merged = time_slots.setdefault(slot["time"], {
+                "time": slot["time"], "male_count": 0, "female_count": 0, "client_count": 0
+            })
+            for key in ("male_count", "female_count", "client_count"):
+                merged[key] += slot.get(key, 0)
+        total_new_clients += report.total_new_clients or 0
+        total_regular_clients += report.total_regular_clients or 0
+
+    return {
+        "clients": clients,
+        "gender": dict(gender),
+        "age": dict(age),
+        "time_slots": [time_slots[time] for time in sorted(time_slots)],
+        "total_new_clients": total_new_clients,
+        "total_regular_clients": total_regular_clients,
+        "male_percentage": gender.get("male", 0) / len(clients) * 100 if clients else 0,
+        "female_percentage": gender.get("female", 0) / len(clients) * 100 if clients else 0,
+    }
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    duplicated_dates = (
+        sa.select(daily_reports.c.date)
+        .group_by(daily_reports.c.date)
+        .having(sa.func.count() > 1)
+    )
+    rows = bind.execute(
+        sa.select(daily_reports)
+        .where(daily_reports.c.date.in_(duplicated_dates))
+        .order_by(daily_reports.c.date, daily_reports.c.created_at.desc(), daily_reports.c.id.desc())
+    ).all()
+
+    reports_by_date = defaultdict(list)
+    for row in rows:
+        reports_by_date[row.date].append(row)
+
+    # the newest row of a date survives and takes the merged counts of the others
+    for reports in reports_by_date.values():
+        bind.execute(
+            daily_reports.update()
+            .where(daily_reports.c.id == reports[0].id)
+            .values(**merge_reports(reports))
+        )
+        bind.execute(
+            daily_reports.delete().where(daily_reports.c.id.in_([report.id for report in reports[1:]]))
+        )
+
+    op.create_index('ux_daily_reports_date', 'daily_reports', ['date'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_daily_reports_date', table_name='daily_reports')
@@ -0,0 +1,85 @@
+"""backfill legacy daily reports
+
+Revision ID: f2c6a8e5d317
+Revises: b8d3f5a1c6e7
+Create Date: 2026-10-19 10:42:17.305618
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c6a8e5d317'
+down_revision: Union[str, None] = 'b8d3f5a1c6e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # one visit per client of every daily_reports row, unless the date already has one for that
+    # client. The legacy row only lists client ids, so gender, age and the time of day come from
+    # the client row, which holds the client's latest visit. time_slot follows get_time_slot()
+    # like d7a2c94e1f60, and a visit is "new" on the client's first date.
+    op.execute("""
+        WITH legacy AS (
+            SELECT DISTINCT CAST(dr.date AS date) AS date, CAST(legacy_client.value AS integer) AS client_id
+            FROM daily_reports AS dr
+            CROSS JOIN LATERAL json_array_elements_text(dr.clients) AS legacy_client(value)
+        ),
+        visit AS (
+            SELECT legacy.date,
+                   c.id AS client_id,
+                   CASE WHEN CAST(c.ts AS date) = legacy.date THEN c.ts
+                        ELSE legacy.date + CAST(c.ts AS time) END AS ts,
+                   c.gender,
+                   c.age,
+                   min(legacy.date) OVER (PARTITION BY c.id) AS first_date
+            FROM legacy
+            JOIN clients AS c ON c.id = legacy.client_id
+        )
+        INSERT INTO daily_report_clients (date, client_id, ts, time_slot, gender, age, client_status)
+        SELECT visit.date,
+               visit.client_id,
+               visit.ts,
+               to_char(
+                   date_trunc('hour', visit.ts) + CASE
+                       WHEN extract(minute FROM visit.ts) <= 15 THEN interval '0 minutes'
+                       WHEN extract(minute FROM visit.ts) < 45 THEN interval '30 minutes'
+                       ELSE interval '60 minutes'
+                   END,
+                   'HH24:MI'
+               ),
+               visit.gender,
+               visit.age,
+               CASE
+                   WHEN visit.date = visit.first_date
+                        AND NOT EXISTS (SELECT 1 FROM daily_report_clients AS earlier
+                                        WHERE earlier.client_id = visit.client_id AND earlier.date < visit.date)
+                   THEN 'new'
+                   ELSE 'regular'
+               END
+        FROM visit
+        ON CONFLICT (date, client_id) DO NOTHING
+    """)
+    # the counters of those dates are rebuilt from the legacy and the new visits together
+    op.execute("""
+        DELETE FROM daily_report_counters
+        WHERE date IN (SELECT CAST(date AS date) FROM daily_reports)
+    """)
+    op.execute("""
+        INSERT INTO daily_report_counters (date, time_slot, gender, age, client_status, count)
+        SELECT date, time_slot, gender, age, client_status, count(*)
+        FROM daily_report_clients
+        WHERE date IN (SELECT CAST(date AS date) FROM daily_reports)
+          AND time_slot IS NOT NULL AND gender IS NOT NULL AND age IS NOT NULL AND client_status IS NOT NULL
+        GROUP BY date, time_slot, gender, age, client_status
+    """)
+
+
+def downgrade() -> None:
+    # the daily_reports rows are left in place, so the backfilled visits are indistinguishable
+    # from posted ones and stay
+    pass
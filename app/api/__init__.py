@@ -7,6 +7,7 @@ from .position import router as position_router
 from .working_graphic import router as working_graphic_router
 from .user import router as user_router
 from .client import router as client_router
+from .metrics import router as metrics_router
 
 router = APIRouter()
 router.include_router(attendance_router, prefix="/attendance", tags=["Attendance"])
@@ -17,3 +18,4 @@ router.include_router(filial_router, prefix="/filials", tags=["Filials"])
 router.include_router(position_router, prefix="/positions", tags=["Positions"])
 router.include_router(working_graphic_router, prefix="/working_graphics", tags=["Working Graphics"])
 router.include_router(user_router, prefix="/users", tags=["Users"])
+router.include_router(metrics_router, tags=["Metrics"])
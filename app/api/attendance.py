@@ -1,17 +1,25 @@
-from fastapi import APIRouter, UploadFile, Depends, File, HTTPException, status
+from typing import List, Optional
+
+from fastapi import APIRouter, UploadFile, Depends, File, Form, Header, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.auth import current_user
 from app.auth.db import User
-from ..crud.attendance import create_attendance, get_attendances, get_commers_by_filial, get_commers_filials, \
+from ..config import ATTENDANCE_INGEST_MODE
+from ..crud.attendance import create_attendance, enqueue_attendance, create_attendances_bulk, get_attendances, get_commers_by_filial, get_commers_filials, \
     delete_attendance, get_commers_percentage, get_daily_attendance, get_attend_day
+from ..crud.export import EXPORT_FORMATS, get_export_range, stream_attendance_export
+from ..crud.report_cache import ATTENDANCE_REPORTS, cached_report, period_scope
 from ..database import get_db
-from ..schemas import AttendanceDataResponse, AttendanceResponse
+from ..utils.pagination import clamp_page_size, decode_cursor, set_next_cursor
+from ..schemas import AttendanceDataResponse, AttendanceResponse, AttendanceBulkResponse, AttendanceQueuedResponse
 
 router = APIRouter()
 
 
-@router.post("/", response_model=AttendanceResponse)
+@router.post("/", response_model=AttendanceResponse,
+             responses={status.HTTP_202_ACCEPTED: {"model": AttendanceQueuedResponse}})
 async def create_attendance_endpoint(
         person_id: int,
         camera_id: int,
@@ -19,12 +27,18 @@ async def create_attendance_endpoint(
         score: str,
 
         file: UploadFile = File(...),
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
         db: AsyncSession = Depends(get_db),
         user: User = Depends(current_user)
 
 ):
     """
     Create a new attendance with the given details.
+    With ATTENDANCE_INGEST_MODE=queued the attendance is acknowledged with 202 once it is in the
+    ingest journal, and stored in the database by the next batch flush.
+    A retried request, recognised by its Idempotency-Key header or else by camera, employee, time and
+    image, is answered with the attendance stored the first time.
+    :param idempotency_key:
     :param user:
     :param score:
     :param time:
@@ -37,22 +51,91 @@ async def create_attendance_endpoint(
 
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
-    return await create_attendance(db, file, person_id, camera_id, time, score)
+
+    if ATTENDANCE_INGEST_MODE == "queued":
+        queued = await enqueue_attendance(db, file, person_id, camera_id, time, score, idempotency_key)
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=queued.model_dump())
+    return await create_attendance(db, file, person_id, camera_id, time, score, idempotency_key)
+
+
+@router.post("/bulk", response_model=AttendanceBulkResponse)
+async def create_attendances_bulk_endpoint(
+        events: str = Form(..., description="NDJSON (or a JSON array) of {person_id, camera_id, time, score, file}"),
+        files: List[UploadFile] = File(...),
+        db: AsyncSession = Depends(get_db),
+        user: User = Depends(current_user)
+):
+    """
+    Create a batch of attendances replayed by a camera gateway.
+    Each event names its image through "file", the filename of one of the uploaded parts.
+    Events stored before, by key or by camera, employee, time and image, are reported as duplicate.
+    :param user:
+    :param events:
+    :param files:
+    :param db:
+    :return:
+    """
+
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    return await create_attendances_bulk(db, events, files)
 
 
 @router.get("/", response_model=AttendanceDataResponse)
 async def get_attendances_endpoint(
+        response: Response,
+        limit: int = 100,
+        cursor: Optional[str] = None,
         db: AsyncSession = Depends(get_db),
         user: User = Depends(current_user)):
     """
     Get a list of attendances with the given details.
+    The next page token is returned in the X-Next-Cursor header.
+    :param response:
+    :param limit:
+    :param cursor:
     :param user:
     :param db:
     :return:
     """
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
-    return await get_attendances(db)
+
+    limit = clamp_page_size(limit)
+    attendances = await get_attendances(db, limit, after_id=decode_cursor(cursor))
+    set_next_cursor(response, [attendance.id for attendance in attendances.data], limit)
+    return attendances
+
+
+@router.get("/export")
+async def export_attendances_endpoint(
+        start_date: str,
+        end_date: str,
+        export_format: str = Query("csv", alias="format"),
+        filial_id: Optional[int] = None,
+        employee_id: Optional[int] = None,
+        user: User = Depends(current_user)):
+    """
+    Stream the attendance history between two dates as CSV or NDJSON.
+    :param start_date: first day, YYYY-MM-DD
+    :param end_date: last day (inclusive), YYYY-MM-DD
+    :param export_format: csv or ndjson
+    :param filial_id:
+    :param employee_id:
+    :param user:
+    :return:
+    """
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format, expected one of {', '.join(EXPORT_FORMATS)}")
+
+    start, end = get_export_range(start_date, end_date)
+    return StreamingResponse(
+        stream_attendance_export(export_format, start, end, filial_id, employee_id),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="attendances_{start_date}_{end_date}.{export_format}"'},
+    )
 
 
 @router.get("/commers/{filial_id}/{date}", response_model=[])
@@ -62,6 +145,7 @@ async def get_commers_by_filial_endpoint(
         user: User = Depends(current_user)):
     """
     Get the commers for the given date.
+    Served from the report cache until an attendance of the filial on that date is written.
     :param user:
     :param filial_id:
     :param date:
@@ -70,7 +154,11 @@ async def get_commers_by_filial_endpoint(
     """
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
-    return await get_commers_by_filial(db, date, filial_id)
+    return await cached_report(
+        ("commers", filial_id, date),
+        period_scope(ATTENDANCE_REPORTS, filial_id, date),
+        lambda: get_commers_by_filial(db, date, filial_id),
+    )
 
 
 @router.get("/commers/{date}", response_model=[])
@@ -115,6 +203,7 @@ async def get_daily_attendance_endpoint(
         user: User = Depends(current_user)):
     """
     Get the daily attendance for the given date.
+    Served from the report cache until an attendance of the filial in that month is written.
     :param user:
     :param filial_id:
     :param date:
@@ -123,7 +212,11 @@ async def get_daily_attendance_endpoint(
     """
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
-    return await get_daily_attendance(db, date, filial_id)
+    return await cached_report(
+        ("daily", filial_id, date),
+        period_scope(ATTENDANCE_REPORTS, filial_id, date),
+        lambda: get_daily_attendance(db, date, filial_id),
+    )
 
 
 @router.get("/attend-day/{date}", response_model=[])
@@ -1,12 +1,13 @@
 from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, BackgroundTasks, Query, HTTPException, status
+from fastapi import APIRouter, Depends, BackgroundTasks, Header, Query, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.auth import current_user
 from app.auth.db import User
 from ..crud.client import create_client, get_daily_report
+from ..crud.report_cache import CLIENT_REPORTS, cached_report, range_scope
 from ..schemas import ClientCreate, ClientResponse
 from ..database import get_db
 
@@ -17,6 +18,7 @@ router = APIRouter()
 async def create_client_endpoint(
         background_tasks: BackgroundTasks,
         client: ClientCreate,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
         db: AsyncSession = Depends(get_db),
         user: User = Depends(current_user)
 ):
@@ -27,11 +29,12 @@ async def create_client_endpoint(
         - **name**: The name of the client
         - **age**: The age of the client
         - **score**: The score of the client
+        - **Idempotency-Key**: Identifies retries of the sighting, derived from the camera, client and time when omitted
         """
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
-    created_client = await create_client(db, client, background_tasks)
+    created_client = await create_client(db, client, background_tasks, idempotency_key)
     return created_client
 
 
@@ -45,6 +48,7 @@ async def get_daily_report_endpoint(
 ):
     """
     Get the daily report for the given date.
+    Served from the report cache until a client visit in the requested days is stored.
     :param user:
     :param date2:
     :param date1:
@@ -66,7 +70,16 @@ async def get_daily_report_endpoint(
             raise HTTPException(status_code=400,
                                 detail="You must provide either a date or both start_datetime and end_datetime.")
 
-        report = await get_daily_report(db=db, date=date_obj, start_datetime=start_datetime, end_datetime=end_datetime)
+        if date_obj:
+            scope = range_scope(CLIENT_REPORTS, None, date_obj, date_obj)
+        else:
+            scope = range_scope(CLIENT_REPORTS, None, start_datetime, end_datetime)
+
+        report = await cached_report(
+            ("clients/reports", date, date1, date2),
+            scope,
+            lambda: get_daily_report(db=db, date=date_obj, start_datetime=start_datetime, end_datetime=end_datetime),
+        )
         return report
 
     except ValueError as e:
@@ -1,6 +1,6 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, status
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.auth import current_user
@@ -15,6 +15,7 @@ from ..crud.employee_image import (
     )
 from ..schemas.employee_image import EmployeeImageResponse, EmployeeImageUpdate
 from ..database import get_db
+from ..utils.pagination import clamp_page_size, decode_cursor, set_next_cursor
 
 router = APIRouter()
 
@@ -44,20 +45,32 @@ async def create_employee_image_endpoint(
 
 @router.get("/images", response_model=List[EmployeeImageResponse])
 async def get_employees_images_endpoint(
+        response: Response,
+        skip: int = 0,
+        limit: int = 10,
+        cursor: Optional[str] = None,
         db: AsyncSession = Depends(get_db),
         user: User = Depends(current_user)):
 
     """
-    Get an image for the employee with the given ID.
+    Get a page of employee images.
+    The next page token is returned in the X-Next-Cursor header.
+    :param response:
     :param user:
-    :param employee_id:
+    :param skip:
+    :param limit:
+    :param cursor:
     :param db:
     :return:
     """
 
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
-    return await get_employees_images(db)
+
+    limit = clamp_page_size(limit)
+    employee_images = await get_employees_images(db, skip, limit, after_id=decode_cursor(cursor))
+    set_next_cursor(response, [image.image_id for image in employee_images], limit)
+    return employee_images
 
 
 @router.get("/{employee_id}/images/", response_model=List[EmployeeImageResponse])
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.auth import current_user
@@ -6,6 +8,7 @@ from app.auth.db import User
 from ..crud.employee import create_employee, get_employees, delete_employee, update_employee, get_employee, get_employee_deep
 from ..schemas.employee import EmployeeCreate, EmployeeUpdate
 from ..database import get_db
+from ..utils.pagination import clamp_page_size, decode_cursor, set_next_cursor
 
 router = APIRouter()
 
@@ -31,23 +34,31 @@ async def create_employee_endpoint(
 
 @router.get("/", response_model=[])
 async def get_employees_endpoint(
+        response: Response,
         skip: int = 0,
         limit: int = 10,
+        cursor: Optional[str] = None,
         db: AsyncSession = Depends(get_db),
         user: User = Depends(current_user)
 ):
     """
     Get a list of employees with the given details.
+    The next page token is returned in the X-Next-Cursor header.
+    :param response:
     :param user:
     :param skip:
     :param limit:
+    :param cursor:
     :param db:
     :return:
     """
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
-    return await get_employees(db, skip, limit)
+    limit = clamp_page_size(limit)
+    employees = await get_employees(db, skip, limit, after_id=decode_cursor(cursor))
+    set_next_cursor(response, [employee["id"] for employee in employees], limit)
+    return employees
 
 
 @router.get("/{employee_id}", response_model=[])
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
 from app.auth.auth import current_user
 from app.auth.db import User
@@ -8,6 +8,7 @@ from ..crud.filial import create_filial, get_filials, delete_filial, update_fili
     get_filial_employees_by_date, get_commers_filials
 from ..schemas.filial import FilialCreate, FilialResponse, FilialUpdate
 from ..database import get_db
+from ..utils.pagination import clamp_page_size, decode_cursor, set_next_cursor
 
 router = APIRouter()
 
@@ -33,24 +34,32 @@ async def create_filial_endpoint(
 
 @router.get("/", response_model=List[FilialResponse])
 async def get_filials_endpoint(
+        response: Response,
         skip: int = 0,
         limit: int = 10,
+        cursor: Optional[str] = None,
         db: AsyncSession = Depends(get_db),
         user: User = Depends(current_user)
 ):
 
     """
     Get a list of filials with the given details.
+    The next page token is returned in the X-Next-Cursor header.
+    :param response:
     :param user:
     :param skip:
     :param limit:
+    :param cursor:
     :param db:
     :return:
     """
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
-    return await get_filials(db, skip, limit)
+    limit = clamp_page_size(limit)
+    filials = await get_filials(db, skip, limit, after_id=decode_cursor(cursor))
+    set_next_cursor(response, [filial.id for filial in filials], limit)
+    return filials
 
 
 @router.get("/{filial_id}", response_model=FilialResponse)
@@ -0,0 +1,79 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+
+from app.auth.auth import optional_current_user
+from app.auth.db import User
+from ..config import METRICS_TOKEN
+from ..crud.attendance_ingest import attendance_ingest
+from ..crud.report_cache import get_report_cache_stats
+from ..crud.schedule_cache import schedule_cache_stats
+from ..database import engine
+from ..utils.file_utils import upload_write_metrics
+from ..utils.image_variants import pending_variant_renders
+from ..utils.metrics import CONTENT_TYPE, CallbackMetric, registry
+
+router = APIRouter()
+
+
+def pool_gauge(name: str, documentation: str, read):
+    CallbackMetric(name, documentation, "gauge", lambda: [({}, read(engine.pool))])
+
+
+def upload_metric(name: str, documentation: str, metric_type: str, key: str):
+    CallbackMetric(name, documentation, metric_type, lambda: [({}, upload_write_metrics.snapshot()[key])])
+
+
+def cache_metrics(cache: str, stats):
+    CallbackMetric(f"{cache}_cache_hits_total", f"Lookups answered by the {cache} cache.", "counter",
+                   lambda: [({}, stats()["hits"])])
+    CallbackMetric(f"{cache}_cache_misses_total", f"Lookups the {cache} cache had to compute.", "counter",
+                   lambda: [({}, stats()["misses"])])
+    CallbackMetric(f"{cache}_cache_hit_ratio", f"Share of {cache} cache lookups answered from the cache.", "gauge",
+                   lambda: [({}, hit_ratio(stats()))])
+
+
+def hit_ratio(stats: dict) -> float:
+    lookups = stats["hits"] + stats["misses"]
+    return stats["hits"] / lookups if lookups else 0.0
+
+
+pool_gauge("db_pool_size", "Connections the pool keeps open.", lambda pool: pool.size())
+pool_gauge("db_pool_checked_out", "Connections currently lent to sessions.", lambda pool: pool.checkedout())
+pool_gauge("db_pool_checked_in", "Idle connections waiting in the pool.", lambda pool: pool.checkedin())
+pool_gauge("db_pool_overflow", "Connections open beyond the pool size.", lambda pool: max(pool.overflow(), 0))
+pool_gauge("db_pool_max_overflow", "Connections allowed beyond the pool size.", lambda pool: pool._max_overflow)
+
+upload_metric("image_bytes_written_total", "Bytes of uploaded images written to storage.", "counter", "bytes")
+upload_metric("image_files_written_total", "Uploaded images written to storage.", "counter", "files")
+upload_metric("image_uploads_rejected_total", "Uploads refused for exceeding MAX_UPLOAD_SIZE.", "counter", "rejected")
+upload_metric("image_uploads_deduplicated_total", "Uploads answered by an already stored identical image.", "counter",
+              "deduplicated")
+upload_metric("image_write_seconds_total", "Time spent writing uploaded images.", "counter", "seconds")
+
+cache_metrics("report", get_report_cache_stats)
+cache_metrics("schedule", lambda: schedule_cache_stats)
+CallbackMetric("report_cache_entries", "Responses held by the report cache.", "gauge",
+               lambda: [({}, get_report_cache_stats()["size"])])
+CallbackMetric("image_variant_queue_depth", "Images waiting for their thumbnails to be rendered.", "gauge",
+               lambda: [({}, pending_variant_renders())])
+CallbackMetric("ingest_queue_depth", "Queued attendances acknowledged but not yet in the database.", "gauge",
+               lambda: [({}, attendance_ingest.depth())])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(authorization: Optional[str] = Header(None),
+                           user: Optional[User] = Depends(optional_current_user)):
+    """
+    Expose the in-process metrics in the Prometheus text format.
+    Scrapers authenticate with "Authorization: Bearer <METRICS_TOKEN>" when METRICS_TOKEN is set,
+    otherwise like every other endpoint, as a logged-in user.
+    :param authorization:
+    :param user:
+    :return:
+    """
+    token_valid = bool(METRICS_TOKEN) and secrets.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}")
+    if user is None and not token_valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
 from app.auth.auth import current_user
 from app.auth.db import User
 from ..crud.position import create_position, get_positions, delete_position, update_position, get_position
 from ..schemas.position import PositionCreate, PositionResponse, PositionUpdate
 from ..database import get_db
+from ..utils.pagination import clamp_page_size, decode_cursor, set_next_cursor
 
 router = APIRouter()
 
@@ -30,24 +31,32 @@ async def create_position_endpoint(
 
 @router.get("/", response_model=List[PositionResponse])
 async def get_positions_endpoint(
+        response: Response,
         skip: int = 0,
         limit: int = 10,
+        cursor: Optional[str] = None,
         db: AsyncSession = Depends(get_db),
         user: User = Depends(current_user)
 ):
 
     """
     Get a list of positions with the given details.
+    The next page token is returned in the X-Next-Cursor header.
+    :param response:
     :param user:
     :param skip:
     :param limit:
+    :param cursor:
     :param db:
     :return:
     """
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
-    return await get_positions(db, skip, limit)
+    limit = clamp_page_size(limit)
+    positions = await get_positions(db, skip, limit, after_id=decode_cursor(cursor))
+    set_next_cursor(response, [position.id for position in positions], limit)
+    return positions
 
 
 @router.get("/{position_id}", response_model=PositionResponse)
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.auth import current_user
@@ -9,6 +11,7 @@ from ..crud.working_graphic import create_day, create_working_graphic, \
 from ..schemas.working_graphic import WorkingGraphicCreate, WorkingGraphicResponse, DayCreate, DayResponse, \
     WorkingGraphicUpdate, DayUpdate
 from app.database import get_db
+from ..utils.pagination import clamp_page_size, decode_cursor, set_next_cursor
 
 router = APIRouter()
 
@@ -52,14 +55,20 @@ async def get_days_endpoint(
 
 @router.get("/", response_model=list[WorkingGraphicResponse])
 async def get_working_graphics_endpoint(
+        response: Response,
         skip: int = 0,
         limit: int = 10,
+        cursor: Optional[str] = None,
         db: AsyncSession = Depends(get_db),
         user: User = Depends(current_user)
 ):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
-    return await get_working_graphics(db, skip, limit)
+
+    limit = clamp_page_size(limit)
+    working_graphics = await get_working_graphics(db, skip, limit, after_id=decode_cursor(cursor))
+    set_next_cursor(response, [working_graphic.id for working_graphic in working_graphics], limit)
+    return working_graphics
 
 
 @router.get("/{working_graphic_id}", response_model=WorkingGraphicResponse)
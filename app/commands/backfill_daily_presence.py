@@ -0,0 +1,20 @@
+"""
+Rebuild the daily_presence table from the full attendances history.
+
+    python -m app.commands.backfill_daily_presence
+"""
+import asyncio
+
+from app.crud.daily_presence import rebuild_daily_presence
+from app.database import SessionLocal, close_db
+
+
+async def main():
+    async with SessionLocal() as db:
+        rows = await rebuild_daily_presence(db)
+    await close_db()
+    print(f"daily_presence rebuilt: {rows} rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
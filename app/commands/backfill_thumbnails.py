@@ -0,0 +1,59 @@
+"""
+Render the missing variants (thumbnails) of every stored image: the per-employee files
+under storage/users as well as the blob store.
+
+    python -m app.commands.backfill_thumbnails --workers 4
+    python -m app.commands.backfill_thumbnails --force
+"""
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from app.utils.file_utils import BLOB_DIR, IMAGE_DIR
+from app.utils.image_variants import STORAGE_DIR, STORAGE_URL, missing_variants, render_variants, storage_location
+
+
+def stored_images():
+    for directory in (IMAGE_DIR, BLOB_DIR):
+        for path in directory.rglob("*"):
+            if path.is_file() and not path.name.startswith("."):
+                yield f"{STORAGE_URL}{path.relative_to(STORAGE_DIR).as_posix()}"
+
+
+def render(job: tuple[str, list]) -> Optional[str]:
+    source, targets = job
+    try:
+        render_variants(source, targets)
+    except Exception as e:
+        return f"{source}: {e}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the CPU count")
+    parser.add_argument("--force", action="store_true", help="render variants that already exist again")
+    args = parser.parse_args()
+
+    stats = Counter()
+    jobs = []
+    for url in stored_images():
+        stats["images"] += 1
+        targets = missing_variants(url, args.force)
+        if targets:
+            jobs.append((str(storage_location(url)), targets))
+
+    with ProcessPoolExecutor(args.workers) as pool:
+        for error in pool.map(render, jobs, chunksize=16):
+            if error:
+                stats["failed"] += 1
+                print(f"failed {error}")
+            else:
+                stats["rendered"] += 1
+
+    print(", ".join(f"{name}={value}" for name, value in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Delete blobs of the image store that no attendance or employee image references,
+together with their thumbnails.
+
+    python -m app.commands.gc_blobs --dry-run
+    python -m app.commands.gc_blobs --grace-minutes 60
+
+Uploads write or touch their blob before the row pointing at it is committed, so blobs
+modified within the grace period are kept. Queued attendances still in the ingest journal
+count as references too.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from pathlib import Path
+
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from app.config import INGEST_JOURNAL_DIR
+from app.database import SessionLocal, close_db
+from app.models import Attendance, EmployeeImage
+from app.utils.file_utils import BLOB_DIR, BLOB_URL
+from app.utils.image_variants import VARIANT_SIZES, storage_location, variant_url
+
+
+async def count_references() -> Counter:
+    references = Counter()
+    async with SessionLocal() as db:
+        for column in (Attendance.file_path, EmployeeImage.image_url):
+            result = await db.execute(
+                select(column, func.count()).filter(column.startswith(f"{BLOB_URL}/")).group_by(column)
+            )
+            references.update(dict(result.all()))
+    return references
+
+
+def journal_references() -> set[str]:
+    references = set()
+    for journal in Path(INGEST_JOURNAL_DIR).glob("*.ndjson"):
+        for line in journal.read_text().splitlines():
+            try:
+                references.add(json.loads(line)["file_path"])
+            except (ValueError, KeyError):
+                continue
+    return references
+
+
+def collect_blobs(references, grace_seconds: float, dry_run: bool) -> Counter:
+    cutoff = time.time() - grace_seconds
+    stats = Counter()
+    for path in BLOB_DIR.rglob("*"):
+        if not path.is_file():
+            continue
+        stat = path.stat()
+        stats["blobs"] += 1
+        stats["bytes"] += stat.st_size
+        url = f"{BLOB_URL}/{path.relative_to(BLOB_DIR).as_posix()}"
+        if url in references or stat.st_mtime > cutoff:
+            continue
+
+        stats["deleted"] += 1
+        stats["freed_bytes"] += stat.st_size
+        if not dry_run:
+            path.unlink(missing_ok=True)
+            for variant in VARIANT_SIZES:
+                storage_location(variant_url(url, variant)).unlink(missing_ok=True)
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--grace-minutes", type=float, default=60)
+    parser.add_argument("--dry-run", action="store_true", help="report what would be deleted")
+    args = parser.parse_args()
+
+    references = await count_references()
+    await close_db()
+    live = set(references) | journal_references()
+    stats = await asyncio.to_thread(collect_blobs, live, args.grace_minutes * 60, args.dry_run)
+
+    print(f"blobs={stats['blobs']} bytes={stats['bytes']} references={sum(references.values())} "
+          f"referenced_blobs={len(references)} {'would_delete' if args.dry_run else 'deleted'}={stats['deleted']} "
+          f"freed_bytes={stats['freed_bytes']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+"""
+Move the images stored per employee under storage/users into the content-addressed blob
+store and point attendances, daily_presence and employee_images at the blobs. Identical
+images collapse into one blob.
+
+    python -m app.commands.migrate_images --dry-run
+    python -m app.commands.migrate_images
+
+Run it while the ingest journal is empty, queued attendances still name the old paths.
+Thumbnails of the moved files are dropped, app.commands.backfill_thumbnails renders them again.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import shutil
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import String, column, update, values
+from sqlalchemy.future import select
+
+from app.database import SessionLocal, close_db
+from app.models import Attendance, DailyPresence, EmployeeImage
+from app.utils.file_utils import BLOB_DIR, BLOB_URL, CHUNK_SIZE, IMAGE_DIR, blob_name, sniff_extension
+from app.utils.image_variants import VARIANT_SIZES, storage_location, variant_url
+
+LEGACY_URL = "/storage/users/"
+BATCH_SIZE = 500
+
+
+def legacy_location(url: str):
+    return IMAGE_DIR / url.removeprefix(LEGACY_URL)
+
+
+def adopt_file(url: str) -> Optional[tuple[str, bool]]:
+    source = legacy_location(url)
+    if not source.is_file():
+        return None
+
+    digest = hashlib.sha256()
+    with open(source, "rb") as file:
+        extension = sniff_extension(file.read(16))
+        file.seek(0)
+        while chunk := file.read(CHUNK_SIZE):
+            digest.update(chunk)
+
+    name = blob_name(digest.hexdigest(), extension)
+    target = BLOB_DIR / name
+    if target.exists():
+        return f"{BLOB_URL}/{name}", True
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+    return f"{BLOB_URL}/{name}", False
+
+
+async def repoint(db, moves: dict[str, str]):
+    mapping = values(column("old", String), column("new", String), name="moves").data(list(moves.items()))
+    targets = [
+        (Attendance.__table__, Attendance.file_path),
+        (EmployeeImage.__table__, EmployeeImage.image_url),
+        (DailyPresence.__table__, DailyPresence.first_file_path),
+        (DailyPresence.__table__, DailyPresence.last_file_path),
+    ]
+    for table, path_column in targets:
+        # moving a file is not an edit of the row, keep updated_at as it was
+        unchanged = {"updated_at": table.c.updated_at} if "updated_at" in table.c else {}
+        await db.execute(
+            update(table).where(path_column == mapping.c.old).values({path_column.key: mapping.c.new, **unchanged})
+        )
+    await db.commit()
+
+
+async def migrate(dry_run: bool) -> Counter:
+    stats = Counter()
+    async with SessionLocal() as db:
+        urls = set()
+        for path_column in (Attendance.file_path, EmployeeImage.image_url):
+            result = await db.execute(select(path_column).filter(path_column.startswith(LEGACY_URL)).distinct())
+            urls.update(result.scalars().all())
+        urls = sorted(urls)
+        stats["legacy_paths"] = len(urls)
+
+        for offset in range(0, len(urls), BATCH_SIZE):
+            batch = urls[offset:offset + BATCH_SIZE]
+            if dry_run:
+                stats["missing"] += sum(not legacy_location(url).is_file() for url in batch)
+                continue
+
+            moves = {}
+            duplicates = []
+            for url in batch:
+                adopted = await asyncio.to_thread(adopt_file, url)
+                if adopted is None:
+                    stats["missing"] += 1
+                    continue
+                moves[url], reused = adopted
+                if reused:
+                    duplicates.append(url)
+            if not moves:
+                continue
+
+            await repoint(db, moves)
+            stats["moved"] += len(moves)
+            stats["deduplicated"] += len(duplicates)
+            for url in duplicates:
+                stats["freed_bytes"] += legacy_location(url).stat().st_size
+            # the other sources are hard links of their new blobs, unlinking them only drops the old name
+            for url in moves:
+                legacy_location(url).unlink()
+                for variant in VARIANT_SIZES:
+                    storage_location(variant_url(url, variant)).unlink(missing_ok=True)
+
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dry-run", action="store_true", help="only count the legacy paths and missing files")
+    args = parser.parse_args()
+
+    stats = await migrate(args.dry_run)
+    await close_db()
+    print(", ".join(f"{name}={value}" for name, value in stats.items()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,6 @@
 import os
+from pathlib import Path
+
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,6 +15,32 @@ BASE_URL = os.getenv("BASE_URL")
 
 SECRET_AUTH = os.getenv("SECRET_AUTH")
 
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 10 * 1024 * 1024))
+
+SCHEDULE_CACHE_TTL = int(os.getenv("SCHEDULE_CACHE_TTL", 300))
+
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", 60))
+REPORT_CACHE_PAST_TTL = int(os.getenv("REPORT_CACHE_PAST_TTL", 3600))
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", 512))
+
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", 1000))
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+ATTENDANCE_INGEST_MODE = os.getenv("ATTENDANCE_INGEST_MODE", "direct")
+# relative to the project directory, not the working directory, so the server and the commands
+# run from anywhere agree on the journal
+INGEST_JOURNAL_DIR = str(Path(__file__).resolve().parent.parent / os.getenv("INGEST_JOURNAL_DIR", "journal"))
+INGEST_FLUSH_INTERVAL_MS = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", 200))
+INGEST_FLUSH_ROWS = int(os.getenv("INGEST_FLUSH_ROWS", 500))
+
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 4096))
+IDEMPOTENCY_CACHE_TTL = int(os.getenv("IDEMPOTENCY_CACHE_TTL", 600))
+
+IMAGE_VARIANT_FORMAT = os.getenv("IMAGE_VARIANT_FORMAT", "webp")
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", 320))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", 2))
+
 if not all([DB_USER, DB_PASS, DB_NAME, DB_HOST, DB_PORT]):
     raise ValueError("One or more environment variables are missing")
 
@@ -21,3 +49,9 @@ if not BASE_URL:
 
 if not SECRET_AUTH:
     raise ValueError("SECRET_AUTH is not set in the environment variables")
+
+if ATTENDANCE_INGEST_MODE not in ("direct", "queued"):
+    raise ValueError("ATTENDANCE_INGEST_MODE must be either direct or queued")
+
+if IMAGE_VARIANT_FORMAT not in ("webp", "jpeg"):
+    raise ValueError("IMAGE_VARIANT_FORMAT must be either webp or jpeg")
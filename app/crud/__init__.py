@@ -3,5 +3,5 @@ from .filial import create_filial, get_filials, get_filial, update_filial, delet
 from .position import create_position, get_positions, get_position, update_position, delete_position
 from .employee_image import create_employee_image, get_employees_images, get_employee_images, update_employee_image, delete_employee_image, get_employee_image
 from .working_graphic import create_working_graphic, create_day, get_working_graphics, get_working_graphic, update_working_graphic, delete_working_graphic, get_days, update_day, delete_day
-from .attendance import create_attendance, get_attendances, get_commers_by_filial, get_commers_filials, get_commers_percentage, delete_attendance, get_daily_attendance, get_attend_day
+from .attendance import create_attendance, get_attendances, get_commers_by_filial, get_commers_filials, get_commers_percentage, delete_attendance, get_daily_attendance, get_attend_day, create_attendances_bulk
 from .client import create_client, store_daily_report, get_daily_report
@@ -1,53 +1,317 @@
-import os
-from collections import defaultdict
+import asyncio
+import json
 from datetime import datetime, timedelta
+from typing import Optional
 
+import numpy as np
 from fastapi import HTTPException, UploadFile
-from sqlalchemy import func
+from pydantic import ValidationError
+from sqlalchemy import BigInteger, cast, func
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from ..models import Attendance, Employee, WorkingGraphic, Day, Filial
-from ..schemas.attendance import AttendanceDataResponse, AttendanceResponse, Image, AttendanceData
-from ..utils.file_utils import save_upload_file
+from ..models import Attendance, Employee, Filial, Position, DailyPresence
+from ..schemas.attendance import AttendanceDataResponse, AttendanceResponse, Image, AttendanceData, AttendanceBulkItem, \
+    AttendanceQueuedResponse
+from ..utils.file_utils import hash_upload_file, save_upload_file
+from ..utils.image_variants import schedule_image_variants
+from ..utils.lateness import ScheduleTable, evaluate_month, evaluate_punches, LATE, ON_TIME
+from ..utils.metrics import attendance_events, duplicate_events
+from .daily_presence import upsert_daily_presence, upsert_daily_presences, merge_daily_presences, \
+    refresh_daily_presence
+from ..config import MAX_UPLOAD_SIZE
 from ..database import BASE_URL
+from .attendance_ingest import attendance_ingest
+from .idempotency import check_key, event_key, recent_attendances
+from .loaders import EMPLOYEE_DETAIL_LOADERS
+from .report_cache import ATTENDANCE_REPORTS, invalidate_reports
+from .schedule_cache import get_resolved_schedules
 
 
-async def create_attendance(db: AsyncSession, file: UploadFile, person_id: int, camera_id: int, time: str, score: str):
+def resolve_attendance_key(person_id: int, camera_id: int, ts: datetime, digest: str,
+                           idempotency_key: Optional[str]) -> str:
+    if idempotency_key is not None:
+        return check_key(idempotency_key)
+    return event_key("attendance", camera_id, person_id, ts.isoformat(), digest)
+
+
+async def create_attendance(db: AsyncSession, file: UploadFile, person_id: int, camera_id: int, time: str, score: str,
+                            idempotency_key: Optional[str] = None):
     try:
-        main_image_url = f"/storage/users/"
-        dir_path = f"{main_image_url}{person_id}"
-        img_type = "attendances"
-
-        if not os.path.exists(dir_path):
-            os.makedirs(f"{dir_path}/{img_type}")
-
-        file_path = save_upload_file(file, employee_id=person_id, img_type=img_type)
-        image_url = f"{main_image_url}{person_id}/{img_type}/{file_path}"
-
-        db_attendance = Attendance(
-            person_id=person_id,
-            camera_id=camera_id,
-            time=time,
-            score=score,
-            file_path=image_url
-        )
-        db.add(db_attendance)
-        await db.commit()
-        await db.refresh(db_attendance)
+        ts = parse_datetime(time).replace(tzinfo=None)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid time format, expected YYYY-MM-DD HH:MM:SS or ISO 8601")
 
-        response = AttendanceResponse.model_validate(db_attendance)
-        response.file_path = f"{BASE_URL}{image_url}"
+    digest = await hash_upload_file(file)
+    key = resolve_attendance_key(person_id, camera_id, ts, digest, idempotency_key)
+    cached = recent_attendances.get(key)
+    if cached is not None:
+        duplicate_events.inc(kind="attendance", source="cache")
+        return cached
+
+    try:
+        image_url = await save_upload_file(file, digest)
+
+        result = await db.execute(
+            insert(Attendance)
+            .values(
+                person_id=person_id,
+                camera_id=camera_id,
+                time=time,
+                ts=ts,
+                score=score,
+                file_path=image_url,
+                idempotency_key=key,
+            )
+            .on_conflict_do_nothing(index_elements=[Attendance.idempotency_key])
+            .returning(Attendance)
+        )
+        db_attendance = result.scalar_one_or_none()
+
+        if db_attendance is None:
+            await db.rollback()
+            result = await db.execute(select(Attendance).filter_by(idempotency_key=key))
+            response = AttendanceResponse.model_validate(result.scalar_one())
+            duplicate_events.inc(kind="attendance", source="database")
+        else:
+            # RETURNING already loaded every column, so the response is built before commit expires them
+            response = AttendanceResponse.model_validate(db_attendance)
+            await upsert_daily_presence(db, person_id, ts, image_url)
+            result = await db.execute(select(Employee.filial_id).filter_by(id=person_id))
+            filial_id = result.scalar_one_or_none()
+            await db.commit()
+            invalidate_reports(ATTENDANCE_REPORTS, ts.date(), filial_id)
+            attendance_events.inc(camera_id=camera_id)
+            schedule_image_variants([image_url])
+
+        response.file_path = f"{BASE_URL}{response.file_path}"
+        recent_attendances.put(key, response)
 
         return response
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def get_attendances(db: AsyncSession):
-    result = await db.execute(select(Employee).options(selectinload(Employee.images)))
+async def enqueue_attendance(db: AsyncSession, file: UploadFile, person_id: int, camera_id: int, time: str,
+                             score: str, idempotency_key: Optional[str] = None):
+    try:
+        ts = parse_datetime(time).replace(tzinfo=None)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid time format, expected YYYY-MM-DD HH:MM:SS or ISO 8601")
+
+    digest = await hash_upload_file(file)
+    key = resolve_attendance_key(person_id, camera_id, ts, digest, idempotency_key)
+    cached = recent_attendances.get(key)
+    if cached is not None:
+        duplicate_events.inc(kind="attendance", source="cache")
+        return cached
+
+    result = await db.execute(select(Employee.id).filter_by(id=person_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Employee not found")
+
+    image_url = await save_upload_file(file, digest)
+
+    event = {"person_id": person_id, "camera_id": camera_id, "time": time, "score": score}
+    try:
+        seq = await attendance_ingest.submit(
+            {**event, "ts": ts.isoformat(), "file_path": image_url, "idempotency_key": key}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Attendance could not be queued: {e}")
+
+    schedule_image_variants([image_url])
+    response = AttendanceQueuedResponse(**event, seq=seq, file_path=f"{BASE_URL}{image_url}")
+    recent_attendances.put(key, response)
+    return response
+
+
+MAX_BULK_ATTENDANCES = 1000
+
+
+def parse_bulk_events(events: str) -> list:
+    events = events.strip()
+    if events.startswith("["):
+        return json.loads(events)
+    return [json.loads(line) for line in events.splitlines() if line.strip()]
+
+
+async def create_attendances_bulk(db: AsyncSession, events: str, files: list[UploadFile]):
+    try:
+        raw_events = parse_bulk_events(events)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid events payload, expected NDJSON or a JSON array")
+
+    if len(raw_events) > MAX_BULK_ATTENDANCES:
+        raise HTTPException(status_code=413, detail=f"A batch can hold at most {MAX_BULK_ATTENDANCES} events")
+
+    files_by_name = {}
+    for file in files:
+        if file.filename in files_by_name:
+            # events name their image by filename, so either part could be the one meant
+            raise HTTPException(status_code=400, detail=f"File name {file.filename!r} is used by more than one part")
+        files_by_name[file.filename] = file
+    used_files = set()
+    items = [None] * len(raw_events)
+    accepted = []
+    repeated = []
+    stored = {}
+
+    for index, raw_event in enumerate(raw_events):
+        try:
+            event = AttendanceBulkItem.model_validate(raw_event)
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+            items[index] = {"index": index, "status": "error", "detail": detail}
+            continue
+
+        try:
+            ts = parse_datetime(event.time).replace(tzinfo=None)
+        except ValueError:
+            items[index] = {"index": index, "status": "error",
+                            "detail": "Invalid time format, expected YYYY-MM-DD HH:MM:SS or ISO 8601"}
+            continue
+
+        upload = files_by_name.get(event.file)
+        if upload is None:
+            items[index] = {"index": index, "status": "error", "detail": "File not found in request"}
+            continue
+        if event.file in used_files:
+            items[index] = {"index": index, "status": "error", "detail": "File already used by another event"}
+            continue
+        if upload.size is not None and upload.size > MAX_UPLOAD_SIZE:
+            items[index] = {"index": index, "status": "error",
+                            "detail": f"File is larger than {MAX_UPLOAD_SIZE} bytes"}
+            continue
+
+        used_files.add(event.file)
+        accepted.append((index, event, ts, upload))
+
+    if accepted:
+        result = await db.execute(
+            select(Employee.id, Employee.filial_id)
+            .filter(Employee.id.in_({event.person_id for _, event, _, _ in accepted}))
+        )
+        filial_ids = dict(result.all())
+
+        for index, event, _, _ in accepted:
+            if event.person_id not in filial_ids:
+                items[index] = {"index": index, "status": "error", "detail": "Employee not found"}
+        accepted = [entry for entry in accepted if entry[1].person_id in filial_ids]
+
+    if accepted:
+        digests = await asyncio.gather(*(hash_upload_file(upload) for *_, upload in accepted))
+        keys = [
+            resolve_attendance_key(event.person_id, event.camera_id, ts, digest, event.idempotency_key)
+            for (_, event, ts, _), digest in zip(accepted, digests)
+        ]
+        result = await db.execute(
+            select(Attendance.idempotency_key, Attendance.id, Attendance.file_path)
+            .filter(Attendance.idempotency_key.in_(set(keys)))
+        )
+        stored = {key: (attendance_id, file_path) for key, attendance_id, file_path in result.all()}
+
+        # a retried batch, or the same event twice in one batch, is answered with the stored attendance
+        fresh = []
+        for entry, key, digest in zip(accepted, keys, digests):
+            if key in stored:
+                repeated.append((entry[0], key))
+            else:
+                stored[key] = None
+                fresh.append((*entry, key, digest))
+        accepted = fresh
+
+    if accepted:
+        try:
+            image_urls = await asyncio.gather(*(
+                save_upload_file(upload, digest) for _, _, _, upload, _, digest in accepted
+            ))
+
+            rows = [
+                {
+                    "person_id": event.person_id,
+                    "camera_id": event.camera_id,
+                    "time": event.time,
+                    "ts": ts,
+                    "score": event.score,
+                    "file_path": image_url,
+                    "idempotency_key": key,
+                }
+                for (_, event, ts, _, key, _), image_url in zip(accepted, image_urls)
+            ]
+            result = await db.execute(
+                insert(Attendance)
+                .on_conflict_do_nothing(index_elements=[Attendance.idempotency_key])
+                .returning(Attendance.idempotency_key, Attendance.id),
+                rows
+            )
+            inserted = dict(result.all())
+
+            if len(inserted) < len(rows):
+                # stored by a concurrent request since the lookup above
+                result = await db.execute(
+                    select(Attendance.idempotency_key, Attendance.id, Attendance.file_path)
+                    .filter(Attendance.idempotency_key.in_({row["idempotency_key"] for row in rows} - set(inserted)))
+                )
+                stored.update((key, (attendance_id, file_path)) for key, attendance_id, file_path in result.all())
+            rows = [row for row in rows if row["idempotency_key"] in inserted]
+
+            await upsert_daily_presences(db, merge_daily_presences(
+                (row["person_id"], row["ts"], row["file_path"]) for row in rows
+            ))
+            await db.commit()
+            for day, filial_id in {(row["ts"].date(), filial_ids[row["person_id"]]) for row in rows}:
+                invalidate_reports(ATTENDANCE_REPORTS, day, filial_id)
+            for row in rows:
+                attendance_events.inc(camera_id=row["camera_id"])
+            schedule_image_variants(row["file_path"] for row in rows)
+        except HTTPException:
+            await db.rollback()
+            raise
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
+
+        for row in rows:
+            stored[row["idempotency_key"]] = (inserted[row["idempotency_key"]], row["file_path"])
+        for index, _, _, _, key, _ in accepted:
+            if key in inserted:
+                attendance_id, file_path = stored[key]
+                items[index] = {"index": index, "status": "created", "id": attendance_id,
+                                "file_path": f"{BASE_URL}{file_path}"}
+            else:
+                repeated.append((index, key))
+
+    for index, key in repeated:
+        attendance_id, file_path = stored[key]
+        items[index] = {"index": index, "status": "duplicate", "id": attendance_id,
+                        "file_path": f"{BASE_URL}{file_path}"}
+    if repeated:
+        duplicate_events.inc(len(repeated), kind="attendance", source="database")
+
+    created = sum(1 for item in items if item["status"] == "created")
+    duplicates = sum(1 for item in items if item["status"] == "duplicate")
+
+    return {
+        "total": len(items),
+        "created": created,
+        "duplicates": duplicates,
+        "failed": len(items) - created - duplicates,
+        "items": items
+    }
+
+
+async def get_attendances(db: AsyncSession, limit: int = 100, after_id: Optional[int] = None):
+    query = select(Employee).options(selectinload(Employee.images)).order_by(Employee.id).limit(limit)
+    if after_id is not None:
+        query = query.filter(Employee.id > after_id)
+    result = await db.execute(query)
     attendances = result.scalars().all()
 
     data = []
@@ -58,112 +322,108 @@ async def get_attendances(db: AsyncSession):
     return AttendanceDataResponse(total=len(data), data=data)
 
 
-async def get_commers_by_filial(db: AsyncSession, date: str, filial_id: int):
-    date_obj = datetime.strptime(date, "%Y-%m-%d").date()
+async def get_weekly_schedules(db: AsyncSession, working_graphic_ids):
+    schedules = await get_resolved_schedules(db, working_graphic_ids)
+    return {working_graphic_id: schedule.weekly for working_graphic_id, schedule in schedules.items()}
 
-    result = await db.execute(select(Attendance))
-    attendances = result.scalars().all()
 
-    formatted_date_attendances = [
-        attendance for attendance in attendances
-        if (len(date) == 7 and date.startswith(parse_datetime(attendance.time).date().isoformat()[:7]))
-           or (len(date) != 7 and date == parse_datetime(attendance.time).date().isoformat())
-    ]
+async def get_commers_by_filial(db: AsyncSession, date: str, filial_id: int):
+    date_obj = datetime.strptime(date, "%Y-%m-%d").date()
 
-    first_attendances = {}
-    for attendance in formatted_date_attendances:
-        if attendance.person_id not in first_attendances:
-            first_attendances[attendance.person_id] = attendance
-        elif parse_datetime(first_attendances[attendance.person_id].time) > parse_datetime(attendance.time):
-            first_attendances[attendance.person_id] = attendance
+    first_attendances = (
+        select(DailyPresence.person_id, DailyPresence.first_ts.label("first_time"))
+        .filter(DailyPresence.date == date_obj)
+        .subquery()
+    )
+
+    result = await db.execute(
+        select(
+            Employee.id,
+            Employee.name,
+            Employee.phone_number,
+            Employee.working_graphic_id,
+            Position.name.label("position_name"),
+            Filial.name.label("filial_name"),
+            first_attendances.c.first_time,
+        )
+        .join(Filial, Filial.id == Employee.filial_id)
+        .outerjoin(Position, Position.id == Employee.position_id)
+        .outerjoin(first_attendances, first_attendances.c.person_id == Employee.id)
+        .filter(Employee.filial_id == filial_id)
+        .order_by(Employee.id)
+    )
+    employees = result.all()
+
+    working_graphic_ids = {employee.working_graphic_id for employee in employees if employee.working_graphic_id}
+    schedules = await get_resolved_schedules(db, working_graphic_ids)
+    weekday = date_obj.strftime("%A").lower()
 
     on_time_commers = []
     late_commers = []
     did_not_come = []
 
-    for person_id, attendance in first_attendances.items():
-        result = await db.execute(select(Employee).filter_by(id=attendance.person_id))
-        employee = result.scalar_one_or_none()
-        if not employee or employee.filial_id != filial_id:
-            continue
-
-        attendance_datetime = parse_datetime(attendance.time)
-        time = attendance_datetime.time()
-
-        working_graphic = await db.execute(select(WorkingGraphic).filter_by(id=employee.working_graphic_id))
-        working_graphic = working_graphic.scalar_one_or_none()
-        if not working_graphic:
+    attendees = [employee for employee in employees if employee.first_time is not None]
+    for employee in attendees:
+        if employee.working_graphic_id is None:
             raise HTTPException(status_code=404, detail="Working graphic not found")
 
-        day_result = await db.execute(select(Day).filter_by(working_graphic_id=working_graphic.id))
-        day = day_result.scalars().all()
-
-        if not day:
+        if not schedules[employee.working_graphic_id].days:
             raise HTTPException(status_code=404, detail="Day not found")
 
-        attendance_time = time.isoformat()
-        day_found = False
-
-        for day in day:
-            if day.time_in is None:
-                continue
-
-            if isinstance(day.time_in, str):
-                try:
-                    day.time_in = datetime.strptime(day.time_in, "%H:%M:%S").time()
-                except ValueError:
-                    day.time_in = datetime.strptime(day.time_in, "%H:%M").time()
-
-            if attendance_time <= day.time_in.isoformat():
-                early_come_to_n_minute = (datetime.combine(date_obj,
-                                                           day.time_in) - attendance_datetime).total_seconds() // 60
-                on_time_commers.append(
-                    {
-                        "employee_id": employee.id,
-                        "employee_name": employee.name,
-                        "employee_position": employee.position.name,
-                        "employee_filial": employee.filial.name,
-                        "employee_time_in": day.time_in,
-                        "employee_time_out": day.time_out,
-                        "early_come_to_n_minute": early_come_to_n_minute
-                    }
-                )
-                day_found = True
-                break
-            elif attendance_time > day.time_in.isoformat():
-                late_commers.append(
-                    {
-                        "employee_id": employee.id,
-                        "employee_name": employee.name,
-                        "employee_position": employee.position.name,
-                        "attendance_time": attendance_time,
-                        "late_to_n_minute": (attendance_datetime - datetime.combine(date_obj,
-                                                                                    day.time_in)).total_seconds() // 60,
-                        "employee_time_in": day.time_in,
-                    }
-                )
-
-    unique_late_commers = {f"{commer['employee_id']}_{commer['attendance_time']}": commer for commer in late_commers}
-    late_commers = list(unique_late_commers.values())
+    table = ScheduleTable({working_graphic_id: schedule.weekly for working_graphic_id, schedule in schedules.items()})
+    evaluation = evaluate_punches(
+        table,
+        [employee.working_graphic_id for employee in attendees],
+        [employee.first_time for employee in attendees],
+    )
+
+    for employee, status, minutes_late, minutes_early in zip(
+            attendees, evaluation.status.tolist(), evaluation.minutes_late.tolist(), evaluation.minutes_early.tolist()
+    ):
+        time_in, time_out = schedules[employee.working_graphic_id].weekly.get(weekday, (None, None))
+
+        if status == ON_TIME:
+            on_time_commers.append(
+                {
+                    "employee_id": employee.id,
+                    "employee_name": employee.name,
+                    "employee_position": employee.position_name,
+                    "employee_filial": employee.filial_name,
+                    "employee_time_in": time_in,
+                    "employee_time_out": time_out,
+                    "early_come_to_n_minute": float(minutes_early)
+                }
+            )
+        elif status == LATE:
+            late_commers.append(
+                {
+                    "employee_id": employee.id,
+                    "employee_name": employee.name,
+                    "employee_position": employee.position_name,
+                    "attendance_time": employee.first_time.time().isoformat(),
+                    "late_to_n_minute": float(minutes_late),
+                    "employee_time_in": time_in,
+                }
+            )
+
+    for employee in employees:
+        if employee.first_time is not None or employee.working_graphic_id is None:
+            continue
 
-    all_employees = await db.execute(select(Employee).filter_by(filial_id=filial_id))
-    all_employees = all_employees.scalars().all()
-
-    attended_employees = {attendance.person_id for attendance in first_attendances.values()}
-    for employee in all_employees:
-        if employee.id not in attended_employees:
-            if employee.working_graphic and employee.working_graphic.days:
-                did_not_come.append(
-                    {
-                        "employee_id": employee.id,
-                        "employee_name": employee.name,
-                        "employee_position": employee.position.name,
-                        "employee_filial": employee.filial.name,
-                        "employee_time_in": employee.working_graphic.days[0].time_in,
-                        "employee_time_out": employee.working_graphic.days[0].time_out,
-                        "employee_phone_number": employee.phone_number
-                    }
-                )
+        workday = schedules[employee.working_graphic_id].weekly.get(weekday)
+        if workday:
+            time_in, time_out = workday
+            did_not_come.append(
+                {
+                    "employee_id": employee.id,
+                    "employee_name": employee.name,
+                    "employee_position": employee.position_name,
+                    "employee_filial": employee.filial_name,
+                    "employee_time_in": time_in,
+                    "employee_time_out": time_out,
+                    "employee_phone_number": employee.phone_number
+                }
+            )
 
     response_model = [
         {
@@ -190,27 +450,16 @@ async def get_commers_by_filial(db: AsyncSession, date: str, filial_id: int):
 async def get_commers_filials(db: AsyncSession, date: str):
     date_obj = datetime.strptime(date, "%Y-%m-%d").date()
 
-    result = await db.execute(select(Attendance))
-    attendances = result.scalars().all()
-
-    formatted_date_attendances = [
-        attendance for attendance in attendances
-        if (len(date) == 7 and date.startswith(parse_datetime(attendance.time).date().isoformat()[:7]))
-           or (len(date) != 7 and date == parse_datetime(attendance.time).date().isoformat())
-    ]
-
-    first_attendances = {}
-    for attendance in formatted_date_attendances:
-        if attendance.person_id not in first_attendances:
-            first_attendances[attendance.person_id] = attendance
-        elif parse_datetime(first_attendances[attendance.person_id].time) > parse_datetime(attendance.time):
-            first_attendances[attendance.person_id] = attendance
+    result = await db.execute(
+        select(DailyPresence).filter_by(date=date_obj).order_by(DailyPresence.person_id)
+    )
+    first_attendances = {presence.person_id: presence for presence in result.scalars().all()}
 
     on_time_commers = []
     late_commers = []
     did_not_come = []
 
-    all_employees = await db.execute(select(Employee))
+    all_employees = await db.execute(select(Employee).options(*EMPLOYEE_DETAIL_LOADERS))
     all_employees = all_employees.scalars().all()
 
     if not first_attendances:
@@ -236,85 +485,70 @@ async def get_commers_filials(db: AsyncSession, date: str):
                     }
                 )
     else:
-        for person_id, attendance in first_attendances.items():
-            result = await db.execute(select(Employee).filter_by(id=attendance.person_id))
-            employee = result.scalar_one_or_none()
-
-            if not employee:
-                continue
-
-            attendance_datetime = parse_datetime(attendance.time)
-            time = attendance_datetime.time()
-
-            working_graphic = await db.execute(select(WorkingGraphic).filter_by(id=employee.working_graphic_id))
-            working_graphic = working_graphic.scalar_one_or_none()
-            if not working_graphic:
+        employees = {employee.id: employee for employee in all_employees}
+        attendees = [
+            (employees[person_id], attendance.first_ts)
+            for person_id, attendance in first_attendances.items() if person_id in employees
+        ]
+        for employee, _ in attendees:
+            if employee.working_graphic_id is None:
                 raise HTTPException(status_code=404, detail="Working graphic not found")
 
-            day_result = await db.execute(select(Day).filter_by(working_graphic_id=working_graphic.id))
-            day = day_result.scalars().all()
-
-            if not day:
+        working_graphic_ids = {employee.working_graphic_id for employee, _ in attendees}
+        schedules = await get_resolved_schedules(db, working_graphic_ids)
+        for employee, _ in attendees:
+            if not schedules[employee.working_graphic_id].days:
                 raise HTTPException(status_code=404, detail="Day not found")
 
-            attendance_time = time.isoformat()
-            day_found = False
-
-            for day in day:
-                if isinstance(day.time_in, str):
-                    try:
-                        day.time_in = datetime.strptime(day.time_in, "%H:%M:%S").time()
-                    except ValueError:
-                        day.time_in = datetime.strptime(day.time_in, "%H:%M").time()
-
-                if attendance_time <= day.time_in.isoformat():
-                    early_come_to_n_minute = (datetime.combine(date_obj,
-                                                               day.time_in) - attendance_datetime).total_seconds() // 60
-                    filial_employee_count = await db.execute(
-                        select(func.count(Employee.id)).filter_by(filial_id=employee.filial.id))
-                    filial_employee_count = filial_employee_count.scalar()
-                    on_time_commers.append(
-                        {
-                            "employee_id": employee.id,
-                            "employee_name": employee.name,
-                            "employee_position": employee.position.name,
-                            "employee_time_in": day.time_in,
-                            "employee_time_out": day.time_out,
-                            "early_come_to_n_minute": early_come_to_n_minute,
-                            "employee_filial": {
-                                "id": employee.filial.id,
-                                "name": employee.filial.name,
-                                "address": employee.filial.address,
-                                "filial_employees": filial_employee_count
-                            },
-                        }
-                    )
-                    day_found = True
-                    break
-                elif attendance_time > day.time_in.isoformat():
-                    late_to_n_minute = (attendance_datetime - datetime.combine(date_obj,
-                                                                               day.time_in)).total_seconds() // 60
-                    filial_employee_count = await db.execute(
-                        select(func.count(Employee.id)).filter_by(filial_id=employee.filial.id))
-                    filial_employee_count = filial_employee_count.scalar()
-                    late_commers.append(
-                        {
-                            "employee_id": employee.id,
-                            "employee_name": employee.name,
-                            "employee_position": employee.position.name,
-                            "attendance_time": attendance_time,
-                            "late_to_n_minute": late_to_n_minute,
-                            "employee_time_in": day.time_in,
-                            "employee_filial": {
-                                "id": employee.filial.id,
-                                "name": employee.filial.name,
-                                "address": employee.filial.address,
-                                "filial_employees": filial_employee_count
-                            },
-                        }
-                    )
-                    day_found = True
-                    break
+        filial_counts_result = await db.execute(
+            select(Employee.filial_id, func.count(Employee.id)).group_by(Employee.filial_id)
+        )
+        filial_counts = dict(filial_counts_result.all())
+
+        table = ScheduleTable({working_graphic_id: schedule.weekly for working_graphic_id, schedule in schedules.items()})
+        evaluation = evaluate_punches(
+            table,
+            [employee.working_graphic_id for employee, _ in attendees],
+            [first_ts for _, first_ts in attendees],
+        )
+        weekday = date_obj.strftime("%A").lower()
+
+        for (employee, attendance_datetime), status, minutes_late, minutes_early in zip(
+                attendees, evaluation.status.tolist(), evaluation.minutes_late.tolist(),
+                evaluation.minutes_early.tolist()
+        ):
+            time_in, time_out = schedules[employee.working_graphic_id].weekly.get(weekday, (None, None))
+            employee_filial = {
+                "id": employee.filial.id,
+                "name": employee.filial.name,
+                "address": employee.filial.address,
+                "filial_employees": filial_counts.get(employee.filial.id, 0)
+            }
+
+            if status == ON_TIME:
+                on_time_commers.append(
+                    {
+                        "employee_id": employee.id,
+                        "employee_name": employee.name,
+                        "employee_position": employee.position.name,
+                        "employee_time_in": time_in,
+                        "employee_time_out": time_out,
+                        "early_come_to_n_minute": float(minutes_early),
+                        "employee_filial": employee_filial,
+                    }
+                )
+            elif status == LATE:
+                late_commers.append(
+                    {
+                        "employee_id": employee.id,
+                        "employee_name": employee.name,
+                        "employee_position": employee.position.name,
+                        "attendance_time": attendance_datetime.time().isoformat(),
+                        "late_to_n_minute": float(minutes_late),
+                        "employee_time_in": time_in,
+                        "employee_filial": employee_filial,
+                    }
+                )
 
     response_model = [
         {
@@ -341,35 +575,58 @@ async def get_commers_filials(db: AsyncSession, date: str):
 async def get_commers_percentage(db: AsyncSession, date: str, filial_id: int):
     try:
         date_obj = datetime.strptime(date, "%Y-%m")
-        year, month = date_obj.year, date_obj.month
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format, expected YYYY-MM")
 
-    start_date = datetime(year, month, 1)
-    end_date = start_date.replace(month=month % 12 + 1) if month != 12 else start_date.replace(year=year + 1, month=1)
-
-    total_on_time = 0
-    total_late = 0
-    total_did_not_come = 0
-    total_days = (end_date - start_date).days
-    total_employees = 0
-
-    current_date = start_date
-    while current_date < end_date:
-        daily_result = await get_commers_by_filial(db, current_date.strftime("%Y-%m-%d"), filial_id)
+    month_start, month_end = get_date_range(date)
 
-        if daily_result:
-            on_time_commers = daily_result[0]["on_time_commers"]["total"]
-            late_commers = daily_result[0]["late_commers"]["total"]
-            did_not_come = daily_result[0]["did_not_come"]["total"]
-            total_employees = daily_result[0]["total"]
+    result = await db.execute(
+        select(Employee.id, Employee.working_graphic_id).filter(Employee.filial_id == filial_id)
+    )
+    employees = result.all()
 
-            total_on_time += on_time_commers
-            total_late += late_commers
-            total_did_not_come += did_not_come
+    result = await db.execute(
+        select(DailyPresence.person_id, epoch_microseconds(DailyPresence.first_ts))
+        .join(Employee, Employee.id == DailyPresence.person_id)
+        .filter(
+            Employee.filial_id == filial_id,
+            DailyPresence.date >= month_start.date(),
+            DailyPresence.date < month_end.date(),
+        )
+    )
+    presences = np.array(result.all(), dtype=np.int64).reshape(-1, 2)
+
+    working_graphic_ids = {employee.working_graphic_id for employee in employees if employee.working_graphic_id}
+    table = ScheduleTable(await get_weekly_schedules(db, working_graphic_ids))
+
+    month = evaluate_month(
+        table,
+        [employee.id for employee in employees],
+        [employee.working_graphic_id for employee in employees],
+        month_start.date(),
+        month_end.date(),
+        presences[:, 0],
+        presences[:, 1],
+    )
+
+    days = [
+        {
+            "date": day.item().isoformat(),
+            "total": int(on_time + late + did_not_come),
+            "on_time": int(on_time),
+            "late": int(late),
+            "did_not_come": int(did_not_come),
+        } for day, on_time, late, did_not_come in zip(month.days, month.on_time, month.late, month.did_not_come)
+    ]
 
-        current_date += timedelta(days=1)
+    total_on_time = int(month.on_time.sum())
+    total_late = int(month.late.sum())
+    total_did_not_come = int(month.did_not_come.sum())
+    total_days = len(days)
+    total_employees = len(employees)
 
+    # the averages keep their employees x calendar days denominator, the expected_* ones are
+    # taken over the employee-days with a shift and add up to 100
     if total_employees > 0:
         average_on_time_percentage = (total_on_time / (total_employees * total_days)) * 100
         average_late_percentage = (total_late / (total_employees * total_days)) * 100
@@ -377,13 +634,27 @@ async def get_commers_percentage(db: AsyncSession, date: str, filial_id: int):
     else:
         average_on_time_percentage = average_late_percentage = average_did_not_come_percentage = 0
 
+    total_expected = total_on_time + total_late + total_did_not_come
+    if total_expected > 0:
+        expected_on_time_percentage = (total_on_time / total_expected) * 100
+        expected_late_percentage = (total_late / total_expected) * 100
+        expected_did_not_come_percentage = (total_did_not_come / total_expected) * 100
+    else:
+        expected_on_time_percentage = expected_late_percentage = expected_did_not_come_percentage = 0
+
     response_model = {
         "success": True,
         "month": date_obj.strftime("%Y-%m"),
         "total_days": total_days,
+        "total_employees": total_employees,
         "average_on_time_percentage": average_on_time_percentage,
         "average_late_percentage": average_late_percentage,
-        "average_did_not_come_percentage": average_did_not_come_percentage
+        "average_did_not_come_percentage": average_did_not_come_percentage,
+        "total_expected": total_expected,
+        "expected_on_time_percentage": expected_on_time_percentage,
+        "expected_late_percentage": expected_late_percentage,
+        "expected_did_not_come_percentage": expected_did_not_come_percentage,
+        "days": days
     }
 
     return response_model
@@ -397,7 +668,13 @@ async def delete_attendance(db: AsyncSession, attendance_id: int):
         raise HTTPException(status_code=404, detail="Attendance not found")
 
     await db.delete(attendance)
+    await db.flush()
+    await refresh_daily_presence(db, attendance.person_id, attendance.ts.date())
+    result = await db.execute(select(Employee.filial_id).filter_by(id=attendance.person_id))
+    filial_id = result.scalar_one_or_none()
     await db.commit()
+    invalidate_reports(ATTENDANCE_REPORTS, attendance.ts.date(), filial_id)
+    recent_attendances.discard(attendance.idempotency_key)
 
     return {"success": True, "data": "Attendance deleted successfully"}
 
@@ -408,82 +685,57 @@ async def get_daily_attendance(db: AsyncSession, date: str, filial_id: int):
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format, expected YYYY-MM")
 
-    result = await db.execute(select(Attendance))
-    attendances = result.scalars().all()
+    month_start, month_end = get_date_range(date)
+
+    result = await db.execute(
+        select(DailyPresence.date, DailyPresence.first_ts, Employee.working_graphic_id)
+        .join(Employee, Employee.id == DailyPresence.person_id)
+        .filter(
+            Employee.filial_id == filial_id,
+            DailyPresence.date >= month_start.date(),
+            DailyPresence.date < month_end.date(),
+        )
+        .order_by(DailyPresence.date, DailyPresence.person_id)
+    )
+    presences = result.all()
 
     res_fil = await db.execute(select(Filial).filter_by(id=filial_id))
     filial = res_fil.scalar_one_or_none()
 
-    filtered_attendances = [
-        attendance for attendance in attendances
-        if parse_datetime(attendance.time).strftime("%Y-%m") == date
-    ]
-
-    daily_attendances = defaultdict(list)
-    for attendance in filtered_attendances:
-        day_key = parse_datetime(attendance.time).strftime("%Y-%m-%d")
-        daily_attendances[day_key].append(attendance)
-
-    response = []
-
-    for day, attendances in daily_attendances.items():
-        first_attendances = {}
+    res_count = await db.execute(select(func.count(Employee.id)).filter_by(filial_id=filial_id))
+    total_emp = res_count.scalar()
 
-        for attendance in attendances:
-            if attendance.person_id not in first_attendances:
-                first_attendances[attendance.person_id] = attendance
-            elif parse_datetime(first_attendances[attendance.person_id].time) > parse_datetime(attendance.time):
-                first_attendances[attendance.person_id] = attendance
+    working_graphic_ids = {presence.working_graphic_id for presence in presences if presence.working_graphic_id}
+    schedules = await get_resolved_schedules(db, working_graphic_ids)
 
-        on_time_commers = 0
-        late_commers = 0
-
-        for person_id, attendance in first_attendances.items():
-            result = await db.execute(select(Employee).filter_by(id=attendance.person_id))
-            employee = result.scalar_one_or_none()
-            if not employee or employee.filial_id != filial_id:
-                continue
-
-            attendance_datetime = parse_datetime(attendance.time)
-            time = attendance_datetime.time()
-
-            working_graphic = await db.execute(select(WorkingGraphic).filter_by(id=employee.working_graphic_id))
-            working_graphic = working_graphic.scalar_one_or_none()
-
-            if not working_graphic:
-                raise HTTPException(status_code=404, detail="Working graphic not found")
+    for presence in presences:
+        if presence.working_graphic_id is None:
+            raise HTTPException(status_code=404, detail="Working graphic not found")
 
-            day_result = await db.execute(select(Day).filter_by(working_graphic_id=working_graphic.id))
-            working_days = day_result.scalars().all()
+        if not schedules[presence.working_graphic_id].days:
+            raise HTTPException(status_code=404, detail="Day not found")
 
-            if not working_days:
-                raise HTTPException(status_code=404, detail="Day not found")
+    table = ScheduleTable({working_graphic_id: schedule.weekly for working_graphic_id, schedule in schedules.items()})
+    evaluation = evaluate_punches(
+        table,
+        [presence.working_graphic_id for presence in presences],
+        [presence.first_ts for presence in presences],
+    )
+
+    daily_attendances = {}
+    for presence, status in zip(presences, evaluation.status.tolist()):
+        day = daily_attendances.setdefault(
+            presence.date.isoformat(),
+            {"date": presence.date.isoformat(), "on_time_commers": 0, "late_commers": 0},
+        )
+        if status == ON_TIME:
+            day["on_time_commers"] += 1
+        elif status == LATE:
+            day["late_commers"] += 1
 
-            attendance_time = time.isoformat()
-
-            for working_day in working_days:
-                if isinstance(working_day.time_in, str):
-                    try:
-                        working_day.time_in = datetime.strptime(working_day.time_in, "%H:%M:%S").time()
-                    except ValueError:
-                        working_day.time_in = datetime.strptime(working_day.time_in, "%H:%M").time()
-
-                if attendance_time <= working_day.time_in.isoformat():
-                    on_time_commers += 1
-                    break
-                elif attendance_time > working_day.time_in.isoformat():
-                    late_commers += 1
-                    break
-
-        response.append({
-            "day": {
-                "date": day,
-                "on_time_commers": on_time_commers,
-                "late_commers": late_commers,
-            }
-        })
+    response = [{"day": day} for day in daily_attendances.values()]
 
-    return {"success": True, "filial_name": filial.name, "total_emp": len(filial.employees), "data": response}
+    return {"success": True, "filial_name": filial.name, "total_emp": total_emp, "data": response}
 
 
 def parse_datetime(datetime_str):
@@ -493,28 +745,70 @@ def parse_datetime(datetime_str):
         return datetime.strptime(datetime_str, "%Y-%m-%d %H:%M:%S")
 
 
+def epoch_microseconds(column):
+    return cast(func.extract("epoch", column) * 1_000_000, BigInteger)
+
+
+def get_date_range(date: str):
+    if len(date) == 7:
+        start = datetime.strptime(date, "%Y-%m")
+        end = (start + timedelta(days=32)).replace(day=1)
+    else:
+        start = datetime.strptime(date, "%Y-%m-%d")
+        end = start + timedelta(days=1)
+
+    return start, end
+
+
 async def get_attend_day(db: AsyncSession, date: str, filial_id: int):
     try:
-        result = await db.execute(select(Employee).filter_by(filial_id=filial_id))
+        date_obj = datetime.strptime(date, "%Y-%m-%d").date()
+
+        result = await db.execute(
+            select(Employee)
+            .options(selectinload(Employee.position), selectinload(Employee.filial))
+            .filter_by(filial_id=filial_id)
+        )
         employees = result.scalars().all()
 
-        formatted_employee_attendances = []
-        for formatted_employee in employees:
-            attendance_results = await db.execute(select(Attendance).filter_by(person_id=formatted_employee.id))
-            attendances = attendance_results.scalars().all()
+        presence_result = await db.execute(
+            select(DailyPresence.person_id, DailyPresence.first_ts)
+            .filter(
+                DailyPresence.person_id.in_([employee.id for employee in employees]),
+                DailyPresence.date == date_obj,
+            )
+        )
+        first_attendances = {person_id: first_ts for person_id, first_ts in presence_result.all()}
+
+        working_graphic_ids = {employee.working_graphic_id for employee in employees if employee.working_graphic_id}
+        schedules = await get_resolved_schedules(db, working_graphic_ids)
 
-            first_attendnace = {}
-            for attendance in attendances:
-                attendance_date = parse_datetime(attendance.time).date().isoformat()
-                if not attendance_date == date:
-                    continue
+        attendees = [employee for employee in employees if employee.id in first_attendances]
+        for employee in attendees:
+            if employee.working_graphic_id is None:
+                raise HTTPException(status_code=404, detail="Working graphic not found")
 
-                if attendance.person_id not in first_attendnace:
-                    first_attendnace[attendance.person_id] = attendance
-                elif parse_datetime(first_attendnace[attendance.person_id].time) > parse_datetime(attendance.time):
-                    first_attendnace[attendance.person_id] = attendance
+            if not schedules[employee.working_graphic_id].days:
+                raise HTTPException(status_code=404, detail="Day not found")
 
-            if not first_attendnace:
+        table = ScheduleTable({working_graphic_id: schedule.weekly for working_graphic_id, schedule in schedules.items()})
+        evaluation = evaluate_punches(
+            table,
+            [employee.working_graphic_id for employee in attendees],
+            [first_attendances[employee.id] for employee in attendees],
+        )
+        late_minutes = {
+            employee.id: minutes_late
+            for employee, status, minutes_late in zip(
+                attendees, evaluation.status.tolist(), evaluation.minutes_late.tolist()
+            ) if status == LATE
+        }
+
+        formatted_employee_attendances = []
+        for formatted_employee in employees:
+            attendance_datetime = first_attendances.get(formatted_employee.id)
+
+            if attendance_datetime is None:
                 formatted_employee_attendances.append(
                     {
                         "employee_id": formatted_employee.id,
@@ -525,44 +819,20 @@ async def get_attend_day(db: AsyncSession, date: str, filial_id: int):
                         "late_n_minute": None,
                     }
                 )
-            else:
-                for person_id, attendance in first_attendnace.items():
-                    attendance_datetime = parse_datetime(attendance.time)
-                    time = attendance_datetime.time()
-
-                    working_graphic = await db.execute(select(WorkingGraphic).filter_by(id=formatted_employee.working_graphic_id))
-                    working_graphic = working_graphic.scalar_one_or_none()
-                    if not working_graphic:
-                        raise HTTPException(status_code=404, detail="Working graphic not found")
-
-                    day_result = await db.execute(select(Day).filter_by(working_graphic_id=working_graphic.id))
-                    day = day_result.scalars().all()
-
-                    if not day:
-                        raise HTTPException(status_code=404, detail="Day not found")
-
-                    attendance_time = time.isoformat()
-
-                    for day in day:
-                        if isinstance(day.time_in, str):
-                            try:
-                                day.time_in = datetime.strptime(day.time_in, "%H:%M:%S").time()
-                            except ValueError:
-                                day.time_in = datetime.strptime(day.time_in, "%H:%M").time()
-
-                        if attendance_time > day.time_in.isoformat():
-                            late_n_minute = (attendance_datetime - datetime.combine(parse_datetime(date).date(), day.time_in)).total_seconds() // 60
-                            formatted_employee_attendances.append(
-                                {
-                                    "employee_id": formatted_employee.id,
-                                    "employee_name": formatted_employee.name,
-                                    "employee_position": formatted_employee.position.name,
-                                    "employee_filial": formatted_employee.filial.name,
-                                    "attendance_time": attendance_time if attendance_time is not None else None,
-                                    "late_n_minute": late_n_minute if late_n_minute > 0 else None,
-                                }
-                            )
-                            break
+                continue
+
+            late_n_minute = late_minutes.get(formatted_employee.id)
+            if late_n_minute is not None:
+                formatted_employee_attendances.append(
+                    {
+                        "employee_id": formatted_employee.id,
+                        "employee_name": formatted_employee.name,
+                        "employee_position": formatted_employee.position.name,
+                        "employee_filial": formatted_employee.filial.name,
+                        "attendance_time": attendance_datetime.time().isoformat(),
+                        "late_n_minute": float(late_n_minute) if late_n_minute > 0 else None,
+                    }
+                )
 
         return {
             "success": True,
@@ -0,0 +1,356 @@
+import asyncio
+import fcntl
+import itertools
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+
+from ..config import INGEST_FLUSH_INTERVAL_MS, INGEST_FLUSH_ROWS, INGEST_JOURNAL_DIR
+from ..database import SessionLocal
+from ..models import Attendance, Employee, IngestCheckpoint
+from ..utils.metrics import Counter, Histogram, attendance_events, duplicate_events
+from .daily_presence import merge_daily_presences, upsert_daily_presences
+from .report_cache import ATTENDANCE_REPORTS, invalidate_reports
+
+logger = logging.getLogger(__name__)
+
+MAX_JOURNAL_GROUP = 1000
+JOURNAL_PREFIX = "attendances"
+
+flush_duration = Histogram(
+    "ingest_flush_duration_seconds", "Time spent writing one batch of queued attendances to the database."
+)
+flush_lag = Histogram(
+    "ingest_flush_lag_seconds", "Time from acknowledging a queued attendance to committing it, per batch.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+flushed_events = Counter("ingest_flushed_events_total", "Queued attendances committed to the database.")
+dropped_events = Counter("ingest_dropped_events_total", "Queued attendances the database refused.")
+
+
+class AttendanceJournal:
+    """
+    Append-only NDJSON file of acknowledged attendances. Every group of appends is
+    fsynced once, and the file is emptied whenever all of it is in the database.
+
+    A journal belongs to the one process holding its exclusive lock: sequence numbers,
+    truncation and replay all assume nobody else appends to it.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    def open(self) -> Optional[list[dict]]:
+        """
+        Lock the journal and read the events in it, or return None when another process holds it.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a+b")
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.close()
+            return None
+
+        self._file.seek(0)
+        data = self._file.read()
+
+        # a crash in the middle of an append leaves a torn last line, which was never acknowledged
+        complete = data[:data.rfind(b"\n") + 1]
+        if len(complete) != len(data):
+            logger.warning(f"Dropping {len(data) - len(complete)} bytes of a torn record from {self.path}")
+            self._file.truncate(len(complete))
+            os.fsync(self._file.fileno())
+
+        return [json.loads(line) for line in complete.splitlines() if line.strip()]
+
+    def append(self, events: list[dict]):
+        self._file.write(b"".join(json.dumps(event).encode() + b"\n" for event in events))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def clear(self):
+        self._file.truncate(0)
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        # closing the file releases the lock
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class AttendanceIngest:
+    """
+    Write-behind ingest for single attendances.
+
+    ``submit`` returns once the event is durable in the journal. A flusher then commits the
+    queued events to Postgres every ``flush_interval`` seconds or ``flush_rows`` events, as one
+    multi-row insert per batch. The same transaction records the last journal sequence number
+    in ``ingest_checkpoints``, so replaying the journal on restart skips what was committed.
+
+    Every process (e.g. each uvicorn worker) claims a journal of its own, ``attendances.ndjson``,
+    ``attendances-1.ndjson``, ..., with a checkpoint row per journal. On start, journals left by
+    processes that are gone are replayed into the database before serving.
+    """
+
+    def __init__(self, journal_dir: Path, flush_interval: float, flush_rows: int):
+        self.journal_dir = journal_dir
+        self.journal: Optional[AttendanceJournal] = None
+        self.name: Optional[str] = None
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+
+        self._appends: Optional[asyncio.Queue] = None
+        self._pending: list[dict] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._journal_lock: Optional[asyncio.Lock] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._tasks: list[asyncio.Task] = []
+        self._next_seq = 1
+        self._flushed_seq = 0
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def depth(self) -> int:
+        queued = self._appends.qsize() if self._appends is not None else 0
+        return queued + len(self._pending)
+
+    async def start(self):
+        self._appends = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._journal_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._closing = False
+
+        self.journal, events = await asyncio.to_thread(self._claim_journal)
+        self.name = self.journal.path.stem
+        checkpoint = await self._checkpoint(self.name)
+        await self._replay_orphaned_journals()
+
+        self._pending = [event for event in events if event["seq"] > checkpoint]
+        self._flushed_seq = checkpoint
+        self._next_seq = max([checkpoint] + [event["seq"] for event in events]) + 1
+        if self._pending:
+            logger.info(f"Replaying {len(self._pending)} queued attendances from {self.journal.path}")
+            self._wakeup.set()
+        elif events:
+            await asyncio.to_thread(self.journal.clear)
+
+        self._tasks = [asyncio.create_task(self._write_journal()), asyncio.create_task(self._flush_loop())]
+
+    def _claim_journal(self) -> tuple[AttendanceJournal, list[dict]]:
+        for slot in itertools.count():
+            name = JOURNAL_PREFIX if slot == 0 else f"{JOURNAL_PREFIX}-{slot}"
+            journal = AttendanceJournal(self.journal_dir / f"{name}.ndjson")
+            events = journal.open()
+            if events is not None:
+                return journal, events
+
+    async def _checkpoint(self, journal: str) -> int:
+        async with SessionLocal() as db:
+            result = await db.execute(select(IngestCheckpoint.last_seq).filter_by(journal=journal))
+            return result.scalar_one_or_none() or 0
+
+    async def _replay_orphaned_journals(self):
+        for path in sorted(self.journal_dir.glob(f"{JOURNAL_PREFIX}*.ndjson")):
+            if path == self.journal.path:
+                continue
+            orphan = AttendanceJournal(path)
+            events = await asyncio.to_thread(orphan.open)
+            if events is None:
+                # owned by a live process
+                continue
+
+            try:
+                checkpoint = await self._checkpoint(path.stem)
+                pending = [event for event in events if event["seq"] > checkpoint]
+                if pending:
+                    logger.info(f"Replaying {len(pending)} queued attendances from orphaned journal {path}")
+                for offset in range(0, len(pending), self.flush_rows):
+                    await self._commit_batch(pending[offset:offset + self.flush_rows], path.stem)
+                if events:
+                    await asyncio.to_thread(orphan.clear)
+            except Exception as e:
+                # left for the next process that starts
+                logger.error(f"Error occurred while replaying the ingest journal {path}: {e}")
+            finally:
+                orphan.close()
+
+    async def stop(self):
+        self._closing = True
+        await self._appends.join()
+        async with self._flush_lock:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+
+        while self._pending:
+            if not await self._flush_once():
+                break
+        self.journal.close()
+
+    async def submit(self, event: dict) -> int:
+        if not self.running or self._closing:
+            raise RuntimeError("attendance ingest is not running")
+
+        acknowledged = asyncio.get_running_loop().create_future()
+        await self._appends.put((event, acknowledged))
+        return await acknowledged
+
+    async def _write_journal(self):
+        while True:
+            group = [await self._appends.get()]
+            while len(group) < MAX_JOURNAL_GROUP and not self._appends.empty():
+                group.append(self._appends.get_nowait())
+
+            events = []
+            for event, _ in group:
+                events.append({**event, "seq": self._next_seq, "acknowledged_at": time.time()})
+                self._next_seq += 1
+
+            try:
+                async with self._journal_lock:
+                    await asyncio.to_thread(self.journal.append, events)
+            except Exception as e:
+                logger.error(f"Error occurred while appending to the ingest journal: {e}")
+                self._next_seq -= len(events)
+                for _, acknowledged in group:
+                    if not acknowledged.done():
+                        acknowledged.set_exception(e)
+            else:
+                self._pending.extend(events)
+                for (_, acknowledged), event in zip(group, events):
+                    if not acknowledged.done():
+                        acknowledged.set_result(event["seq"])
+                if len(self._pending) >= self.flush_rows:
+                    self._wakeup.set()
+            finally:
+                for _ in group:
+                    self._appends.task_done()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            while self._pending:
+                if not await self._flush_once():
+                    # the database is unavailable, keep the events and retry on the next tick
+                    break
+                if len(self._pending) < self.flush_rows:
+                    break
+
+    async def _flush_once(self) -> bool:
+        async with self._flush_lock:
+            batch = self._pending[:self.flush_rows]
+            if not batch:
+                return True
+
+            started = time.perf_counter()
+            try:
+                await self._commit_batch(batch, self.name, self._mark_flushed)
+            except Exception as e:
+                logger.error(f"Error occurred while flushing queued attendances: {e}")
+                return False
+
+            flush_duration.observe(time.perf_counter() - started)
+            flush_lag.observe(time.time() - batch[0]["acknowledged_at"])
+
+            async with self._journal_lock:
+                if not self._pending and self._appends.empty() and self._flushed_seq == self._next_seq - 1:
+                    await asyncio.to_thread(self.journal.clear)
+            return True
+
+    def _mark_flushed(self, count: int):
+        self._flushed_seq = self._pending[count - 1]["seq"]
+        del self._pending[:count]
+
+    async def _commit_batch(self, batch: list[dict], journal: str,
+                            committed: Callable[[int], None] = lambda count: None):
+        try:
+            await self._commit(batch, journal)
+            committed(len(batch))
+        except IntegrityError:
+            # an employee was deleted since the event was accepted; commit event by event
+            for event in batch:
+                try:
+                    await self._commit([event], journal)
+                except IntegrityError as e:
+                    logger.error(f"Dropping queued attendance {event['seq']} of {journal}: {e.orig}")
+                    dropped_events.inc()
+                    await self._commit([event], journal, store=False)
+                committed(1)
+
+    async def _commit(self, events: list[dict], journal: str, store: bool = True):
+        rows = [
+            {
+                "person_id": event["person_id"],
+                "camera_id": event["camera_id"],
+                "time": event["time"],
+                "ts": datetime.fromisoformat(event["ts"]),
+                "score": event["score"],
+                "file_path": event["file_path"],
+                "idempotency_key": event.get("idempotency_key"),
+            }
+            for event in events
+        ]
+
+        async with SessionLocal() as db:
+            filial_ids = {}
+            if store:
+                result = await db.execute(
+                    insert(Attendance)
+                    .on_conflict_do_nothing(index_elements=[Attendance.idempotency_key])
+                    .returning(Attendance.person_id, Attendance.camera_id, Attendance.ts, Attendance.file_path),
+                    rows
+                )
+                duplicates = len(rows)
+                rows = [row._asdict() for row in result.all()]
+                duplicates -= len(rows)
+
+                await upsert_daily_presences(db, merge_daily_presences(
+                    (row["person_id"], row["ts"], row["file_path"]) for row in rows
+                ))
+                result = await db.execute(
+                    select(Employee.id, Employee.filial_id).filter(Employee.id.in_({row["person_id"] for row in rows}))
+                )
+                filial_ids = dict(result.all())
+
+            stmt = insert(IngestCheckpoint).values(journal=journal, last_seq=events[-1]["seq"])
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[IngestCheckpoint.journal], set_={"last_seq": stmt.excluded.last_seq}
+            ))
+            await db.commit()
+
+        if store:
+            for day, filial_id in {(row["ts"].date(), filial_ids.get(row["person_id"])) for row in rows}:
+                invalidate_reports(ATTENDANCE_REPORTS, day, filial_id)
+            for row in rows:
+                attendance_events.inc(camera_id=row["camera_id"])
+            flushed_events.inc(len(rows))
+            if duplicates:
+                duplicate_events.inc(duplicates, kind="attendance", source="database")
+
+
+attendance_ingest = AttendanceIngest(
+    Path(INGEST_JOURNAL_DIR),
+    flush_interval=INGEST_FLUSH_INTERVAL_MS / 1000,
+    flush_rows=INGEST_FLUSH_ROWS,
+)
@@ -1,17 +1,21 @@
 from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import date as date_type, datetime, timedelta
 from typing import Optional, Union
 
 from fastapi import HTTPException, BackgroundTasks
-from sqlalchemy import Date, cast, TIMESTAMP, delete
+from sqlalchemy import Date, Integer, cast, TIMESTAMP, func, or_, text, true
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm.attributes import flag_modified
 from sqlalchemy.future import select
 
 from .attendance import parse_datetime
-from ..models import Client, DailyReport
+from .idempotency import check_key, event_key, recent_clients
+from .report_cache import CLIENT_REPORTS, invalidate_reports
+from ..utils.metrics import client_events, duplicate_events
+from ..models import Client, ClientEventKey, DailyReport, DailyReportCounter, DailyReportClient
 from ..schemas import ClientResponse, ClientCreate, DailyReportResponse, DailyReportCreate
+from ..database import SessionLocal
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,27 +27,50 @@ def make_naive(dt: datetime) -> datetime:
     return dt
 
 
-async def create_client(db: AsyncSession, client: ClientCreate, background_tasks: BackgroundTasks):
-    result = await db.execute(select(Client).filter_by(id=client.id))
-    from_db_client = result.scalar_one_or_none()
-
+async def create_client(db: AsyncSession, client: ClientCreate, background_tasks: BackgroundTasks,
+                        idempotency_key: Optional[str] = None):
     date = datetime.fromisoformat(str(client.time)).date().isoformat()
-    print(f"{date=}")
-
-    background_tasks.add_task(store_daily_report, db, date, client)
 
-    # await store_daily_report(db, date=date, client=client)
+    ts = parse_datetime(client.time).replace(tzinfo=None)
 
-    if from_db_client is not None:
-        from_db_client.client_status = "regular"
-        from_db_client.age = (from_db_client.age + client.age) // 2
-        from_db_client.time = client.time
-        db_client = from_db_client
+    if idempotency_key is not None:
+        key = check_key(idempotency_key)
     else:
-        db_client = Client(**client.model_dump())
-        db_client.client_status = "new"
+        key = event_key("client", client.camera_id, client.id, ts.isoformat())
+    cached = recent_clients.get(key)
+    if cached is not None:
+        duplicate_events.inc(kind="client", source="cache")
+        return cached
 
     try:
+        # a retried sighting must neither turn a new client into a regular one nor be counted again
+        result = await db.execute(
+            insert(ClientEventKey)
+            .values(key=key, client_id=client.id)
+            .on_conflict_do_nothing()
+            .returning(ClientEventKey.key)
+        )
+        if result.scalar_one_or_none() is None:
+            await db.rollback()
+            result = await db.execute(select(Client).filter_by(id=client.id))
+            response = ClientResponse.model_validate(result.scalar_one())
+            duplicate_events.inc(kind="client", source="database")
+            recent_clients.put(key, response)
+            return response
+
+        result = await db.execute(select(Client).filter_by(id=client.id))
+        from_db_client = result.scalar_one_or_none()
+
+        if from_db_client is not None:
+            from_db_client.client_status = "regular"
+            from_db_client.age = (from_db_client.age + client.age) // 2
+            from_db_client.time = client.time
+            from_db_client.ts = ts
+            db_client = from_db_client
+        else:
+            db_client = Client(**client.model_dump(), ts=ts)
+            db_client.client_status = "new"
+
         db.add(db_client)
         await db.commit()
         await db.refresh(db_client)
@@ -52,98 +79,153 @@ async def create_client(db: AsyncSession, client: ClientCreate, background_tasks
         logger.error(f"Error occurred while creating client: {e}")
         raise HTTPException(status_code=400, detail="Integrity error occurred") from e
 
-    return ClientResponse.model_validate(db_client)
+    client_events.inc(camera_id=client.camera_id)
+    background_tasks.add_task(
+        store_daily_report_task, date, client.model_copy(update={"client_status": db_client.client_status})
+    )
+
+    response = ClientResponse.model_validate(db_client)
+    recent_clients.put(key, response)
+    return response
+
+
+def get_time_slot(client_time: datetime) -> str:
+    rounded_time = client_time.replace(second=0, microsecond=0, minute=0) + timedelta(
+        minutes=30 * round(client_time.minute / 30)
+    )
+    return rounded_time.strftime("%H:%M")
 
 
 async def store_daily_report(db: AsyncSession, date: str, client: ClientCreate):
-    try:
-        result = await db.execute(select(DailyReport).filter_by(date=date))
-        daily_report = result.scalar_one_or_none()
+    report_date = datetime.strptime(date, "%Y-%m-%d").date()
+    client_time = parse_datetime(client.time).replace(tzinfo=None)
+    time_slot = get_time_slot(client_time)
 
-        client_time = parse_datetime(client.time)
-        rounded_time = client_time.replace(second=0, microsecond=0, minute=0, hour=client_time.hour) + timedelta(
-            minutes=30 * round(client_time.minute / 30)
+    try:
+        result = await db.execute(
+            insert(DailyReportClient)
+            .values(
+                date=report_date,
+                client_id=client.id,
+                ts=client_time,
+                time_slot=time_slot,
+                gender=client.gender,
+                age=client.age,
+                client_status=client.client_status,
+            )
+            .on_conflict_do_nothing()
+            .returning(DailyReportClient.client_id)
+        )
+        if result.scalar_one_or_none() is None:
+            await db.rollback()
+            return
+
+        stmt = insert(DailyReportCounter).values(
+            date=report_date,
+            time_slot=time_slot,
+            gender=client.gender,
+            age=client.age,
+            client_status=client.client_status,
+            count=1,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                DailyReportCounter.date,
+                DailyReportCounter.time_slot,
+                DailyReportCounter.gender,
+                DailyReportCounter.age,
+                DailyReportCounter.client_status,
+            ],
+            set_={
+                "count": DailyReportCounter.count + 1,
+                "updated_at": text("TIMEZONE('utc', now())"),
+            },
         )
-        rounded_time_str = rounded_time.strftime("%H:%M")
+        await db.execute(stmt)
+        await db.commit()
+        invalidate_reports(CLIENT_REPORTS, report_date)
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error occurred while storing daily report: {e}")
+        raise HTTPException(status_code=400, detail="Integrity error occurred while storing daily report") from e
+
 
-        time_slot_data = defaultdict(lambda: {
-            "time": rounded_time_str,
+async def store_daily_report_task(date: str, client: ClientCreate):
+    async with SessionLocal() as db:
+        await store_daily_report(db, date, client)
+
+
+async def get_counted_daily_reports(db: AsyncSession, start_date: date_type, end_date: date_type):
+    counters_result = await db.execute(
+        select(DailyReportCounter)
+        .filter(DailyReportCounter.date.between(start_date, end_date))
+        .order_by(DailyReportCounter.date, DailyReportCounter.time_slot)
+    )
+    counters = counters_result.scalars().all()
+    if not counters:
+        return []
+
+    clients_result = await db.execute(
+        select(DailyReportClient.date, DailyReportClient.client_id)
+        .filter(DailyReportClient.date.between(start_date, end_date))
+        .order_by(DailyReportClient.date, DailyReportClient.client_id)
+    )
+    clients_by_date = defaultdict(list)
+    for report_date, client_id in clients_result.all():
+        clients_by_date[report_date].append(client_id)
+
+    reports = {}
+    for counter in counters:
+        report = reports.get(counter.date)
+        if report is None:
+            report = reports[counter.date] = DailyReport(
+                date=counter.date.isoformat(),
+                clients=clients_by_date[counter.date],
+                gender=defaultdict(int),
+                age=defaultdict(int),
+                time_slots={},
+                total_new_clients=0,
+                total_regular_clients=0,
+                created_at=counter.created_at,
+                updated_at=counter.updated_at,
+            )
+
+        report.gender[counter.gender] += counter.count
+        report.age[str(counter.age)] += counter.count
+
+        slot = report.time_slots.setdefault(counter.time_slot, {
+            "time": counter.time_slot,
             "male_count": 0,
             "female_count": 0,
             "client_count": 0
         })
+        if counter.gender.lower() == "male":
+            slot["male_count"] += counter.count
+        elif counter.gender.lower() == "female":
+            slot["female_count"] += counter.count
+        slot["client_count"] += counter.count
+
+        if counter.client_status == "new":
+            report.total_new_clients += counter.count
+        else:
+            report.total_regular_clients += counter.count
 
-        if daily_report is None:
-            daily_report = DailyReport(
-                date=date,
-                clients=[client.id],
-                gender={client.gender: 1},
-                age={str(client.age): 1},
-                total_new_clients=1 if client.client_status == "new" else 0,
-                total_regular_clients=1 if client.client_status == "regular" else 0,
-                time_slots=[],
-                male_percentage=0,
-                female_percentage=0
-            )
+        report.created_at = min(report.created_at, counter.created_at)
+        report.updated_at = max(report.updated_at, counter.updated_at)
+
+    for report in reports.values():
+        report.gender = dict(report.gender)
+        report.age = dict(report.age)
+        report.time_slots = list(report.time_slots.values())
 
-            if client.gender.lower() == "male":
-                time_slot_data[rounded_time_str]["male_count"] += 1
-            elif client.gender.lower() == "female":
-                time_slot_data[rounded_time_str]["female_count"] += 1
-            time_slot_data[rounded_time_str]["client_count"] += 1
-            daily_report.time_slots.append(time_slot_data[rounded_time_str])
+        total_clients = len(report.clients)
+        if total_clients > 0:
+            report.male_percentage = (report.gender.get("male", 0) / total_clients) * 100
+            report.female_percentage = (report.gender.get("female", 0) / total_clients) * 100
         else:
-            if client.id not in daily_report.clients:
-                if client.client_status == "new":
-                    daily_report.total_new_clients += 1
-                else:
-                    daily_report.total_regular_clients += 1
-
-                daily_report.clients = list(set(daily_report.clients + [client.id]))
-
-                daily_report.gender[client.gender] = daily_report.gender.get(client.gender, 0) + 1
-
-                age_key = str(client.age)
-                daily_report.age[age_key] = daily_report.age.get(age_key, 0) + 1
-
-                updated = False
-                for slot in daily_report.time_slots:
-                    if slot["time"] == rounded_time_str:
-                        slot["client_count"] += 1
-                        if client.gender.lower() == "male":
-                            slot["male_count"] += 1
-                        elif client.gender.lower() == "female":
-                            slot["female_count"] += 1
-                        updated = True
-                        break
-
-                if not updated:
-                    if client.gender.lower() == "male":
-                        time_slot_data[rounded_time_str]["male_count"] += 1
-                    elif client.gender.lower() == "female":
-                        time_slot_data[rounded_time_str]["female_count"] += 1
-                    time_slot_data[rounded_time_str]["client_count"] += 1
-                    daily_report.time_slots.append(time_slot_data[rounded_time_str])
-
-            total_clients = len(daily_report.clients)
-            male_count = daily_report.gender.get("male", 0)
-            female_count = daily_report.gender.get("female", 0)
-
-            if total_clients > 0:
-                daily_report.male_percentage = (male_count / total_clients) * 100
-                daily_report.female_percentage = (female_count / total_clients) * 100
-
-            flag_modified(daily_report, "gender")
-            flag_modified(daily_report, "age")
-            flag_modified(daily_report, "time_slots")
-
-        db.add(daily_report)
-        await db.commit()
-        await db.refresh(daily_report)
-    except SQLAlchemyError as e:
-        await db.rollback()
-        logger.error(f"Error occurred while storing daily report: {e}")
-        raise HTTPException(status_code=400, detail="Integrity error occurred while storing daily report") from e
+            report.male_percentage = report.female_percentage = 0
+
+    return list(reports.values())
 
 
 async def get_daily_report(
@@ -154,151 +236,149 @@ async def get_daily_report(
 ):
     try:
         if date:
-            date_str = date.strftime("%Y-%m-%d")
-            res = await db.execute(
-                select(DailyReport)
-                .filter_by(date=date_str)
-                .order_by(DailyReport.created_at.desc())
-                .limit(1)
-            )
+            counted_reports = await get_counted_daily_reports(db, date.date(), date.date())
+            if counted_reports:
+                return DailyReportResponse.model_validate(counted_reports[0])
+
+            res = await db.execute(select(DailyReport).filter_by(date=date.strftime("%Y-%m-%d")))
             daily_report = res.scalar_one_or_none()
 
             if daily_report:
-                res_other = await db.execute(
-                    select(DailyReport)
-                    .filter_by(date=date_str)
-                )
-                other_reports = res_other.scalars().all()
-
-                ids_to_delete = [report.id for report in other_reports if report.id != daily_report.id]
-
-                if ids_to_delete:
-                    delete_query = delete(DailyReport).filter(DailyReport.id.in_(ids_to_delete))
-                    await db.execute(delete_query)
-                    await db.commit()
                 return DailyReportResponse.model_validate(daily_report)
             else:
                 raise HTTPException(status_code=404, detail="No report found for the given date.")
 
-        start_date_str = start_datetime.date().isoformat()
-        end_date_str = end_datetime.date().isoformat()
-
-        res_start = await db.execute(
-            select(DailyReport)
-            .filter_by(date=start_date_str)
-            .order_by(DailyReport.created_at.desc())
-            .limit(1)
-        )
-        db_start_date_report = res_start.scalar_one_or_none()
+        return await get_range_report(db, start_datetime, end_datetime)
 
-        res_end = await db.execute(
-            select(DailyReport)
-            .filter_by(date=end_date_str)
-            .order_by(DailyReport.created_at.desc())
-            .limit(1)
-        )
-        db_end_date_report = res_end.scalar_one_or_none()
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=400, detail=f"Error retrieving data: {e}")
 
-        if db_start_date_report:
-            res_other = await db.execute(
-                select(DailyReport)
-                .filter_by(date=start_date_str)
-            )
-            other_reports = res_other.scalars().all()
 
-            ids_to_delete = [report.id for report in other_reports if report.id != db_start_date_report.id]
+async def get_range_report(db: AsyncSession, start_datetime: datetime, end_datetime: datetime):
+    start_date = start_datetime.date()
+    end_date = end_datetime.date()
+    # client times are compared to the minute, so the end minute is included
+    end_bound = end_datetime + timedelta(minutes=1)
 
-            if ids_to_delete:
-                delete_query = delete(DailyReport).filter(DailyReport.id.in_(ids_to_delete))
-                await db.execute(delete_query)
-                await db.commit()
+    in_range = (DailyReportClient.ts >= start_datetime, DailyReportClient.ts < end_bound)
 
-        if db_end_date_report:
-            res_other = await db.execute(
-                select(DailyReport)
-                .filter_by(date=end_date_str)
+    visits_result = await db.execute(
+        select(
+            DailyReportClient.time_slot,
+            DailyReportClient.gender,
+            DailyReportClient.age,
+            DailyReportClient.client_status,
+            func.count(),
+        )
+        .filter(*in_range)
+        .group_by(
+            DailyReportClient.time_slot,
+            DailyReportClient.gender,
+            DailyReportClient.age,
+            DailyReportClient.client_status,
+        )
+    )
+    visits = visits_result.all()
+
+    clients_result = await db.execute(
+        select(DailyReportClient.client_id).filter(*in_range).distinct()
+    )
+    combined_clients = set(clients_result.scalars().all())
+
+    legacy_reports = (
+        select(DailyReport)
+        .filter(
+            DailyReport.date.between(start_date.isoformat(), end_date.isoformat()),
+            ~select(DailyReportClient.date)
+            .filter(DailyReportClient.date == cast(DailyReport.date, Date))
+            .exists(),
+        )
+        .order_by(DailyReport.date)
+    )
+    legacy_result = await db.execute(legacy_reports)
+    legacy_reports = legacy_result.scalars().all()
+
+    if not visits and not legacy_reports:
+        raise HTTPException(status_code=404, detail="No reports found for the given date range.")
+
+    combined_gender_counts = defaultdict(int)
+    combined_age_counts = defaultdict(int)
+    combined_time_slots = defaultdict(lambda: {"male_count": 0, "female_count": 0, "client_count": 0})
+    total_new_clients = 0
+    total_regular_clients = 0
+
+    for time_slot, gender, age, client_status, count in visits:
+        if gender is not None:
+            combined_gender_counts[gender] += count
+        if age is not None:
+            combined_age_counts[str(age)] += count
+        if time_slot is not None:
+            slot = combined_time_slots[time_slot]
+            slot["client_count"] += count
+            if gender and gender.lower() == "male":
+                slot["male_count"] += count
+            elif gender and gender.lower() == "female":
+                slot["female_count"] += count
+
+        if client_status == "new":
+            total_new_clients += count
+        else:
+            total_regular_clients += count
+
+    if legacy_reports:
+        legacy_client = func.json_array_elements_text(DailyReport.clients).table_valued("value").alias("legacy_client")
+        legacy_client_id = cast(legacy_client.c.value, Integer)
+        legacy_clients_result = await db.execute(
+            select(Client.id, Client.client_status)
+            .select_from(DailyReport)
+            .join(legacy_client, true())
+            .join(Client, Client.id == legacy_client_id)
+            .filter(
+                DailyReport.id.in_([report.id for report in legacy_reports]),
+                or_(DailyReport.date != start_date.isoformat(), Client.ts >= start_datetime),
+                or_(DailyReport.date != end_date.isoformat(), Client.ts < end_bound),
             )
-            other_reports = res_other.scalars().all()
-
-            ids_to_delete = [report.id for report in other_reports if report.id != db_end_date_report.id]
-
-            if ids_to_delete:
-                delete_query = delete(DailyReport).filter(DailyReport.id.in_(ids_to_delete))
-                await db.execute(delete_query)
-                await db.commit()
-
-        query = select(DailyReport).filter(
-            DailyReport.date.between(start_date_str, end_date_str)
         )
-        res = await db.execute(query)
-        reports = res.scalars().all()
-
-        if not reports:
-            raise HTTPException(status_code=404, detail="No reports found for the given date range.")
-
-        combined_clients = set()
-        combined_gender_counts = defaultdict(int)
-        combined_age_counts = defaultdict(int)
-        combined_time_slots = defaultdict(lambda: {"male_count": 0, "female_count": 0, "client_count": 0})
-        total_new_clients = 0
-        total_regular_clients = 0
-
-        for report in reports:
-            report_date = datetime.strptime(report.date, "%Y-%m-%d")
-
-            for client in report.clients:
-                db_client = await db.execute(select(Client).filter_by(id=client))
-                client = db_client.scalar_one_or_none()
-                client_time = datetime.strptime(client.time[:16], "%Y-%m-%d %H:%M")
-
-                if report_date == start_datetime.date():
-                    if client_time >= start_datetime:
-                        combined_clients.add(client.id)
-                elif report_date == end_datetime.date():
-                    if client_time <= end_datetime:
-                        combined_clients.add(client.id)
-                else:
-                    combined_clients.add(client.id)
-
-                if client.client_status == "new":
-                    total_new_clients += 1
-                else:
-                    total_regular_clients += 1
-
-            for gender, count in report.gender.items():
-                combined_gender_counts[gender] += count
-            for age, count in report.age.items():
-                combined_age_counts[age] += count
-            for slot in report.time_slots:
-                rounded_time = slot["time"]
-                combined_time_slots[rounded_time]["client_count"] += slot["client_count"]
-                combined_time_slots[rounded_time]["male_count"] += slot["male_count"]
-                combined_time_slots[rounded_time]["female_count"] += slot["female_count"]
-
-        male_count = combined_gender_counts["male"]
-        female_count = combined_gender_counts["female"]
-        male_percentage = (male_count / len(combined_clients)) * 100 if total_new_clients > 0 else 0
-        female_percentage = (female_count / len(combined_clients)) * 100 if total_new_clients > 0 else 0
-
-        response_data = {
-            "start_date": start_datetime.strftime("%Y-%m-%d %H:%M"),
-            "end_date": end_datetime.strftime("%Y-%m-%d %H:%M"),
-            "clients": list(combined_clients),
-            "gender": dict(combined_gender_counts),
-            "age": dict(combined_age_counts),
-            "time_slots": [
-                {"time": time, **counts}
-                for time, counts in sorted(combined_time_slots.items())
-            ],
-            "total_new_clients": total_new_clients,
-            "total_regular_clients": total_regular_clients,
-            "male_percentage": male_percentage,
-            "female_percentage": female_percentage,
-        }
-        return response_data
-
-    except SQLAlchemyError as e:
-        raise HTTPException(status_code=400, detail=f"Error retrieving data: {e}")
+        for client_id, client_status in legacy_clients_result.all():
+            combined_clients.add(client_id)
+            if client_status == "new":
+                total_new_clients += 1
+            else:
+                total_regular_clients += 1
+
+    for report in legacy_reports:
+        for gender, count in report.gender.items():
+            combined_gender_counts[gender] += count
+        for age, count in report.age.items():
+            combined_age_counts[age] += count
+        for slot in report.time_slots:
+            rounded_time = slot["time"]
+            combined_time_slots[rounded_time]["client_count"] += slot["client_count"]
+            combined_time_slots[rounded_time]["male_count"] += slot["male_count"]
+            combined_time_slots[rounded_time]["female_count"] += slot["female_count"]
+
+    male_count = combined_gender_counts["male"]
+    female_count = combined_gender_counts["female"]
+    total_visits = total_new_clients + total_regular_clients
+    male_percentage = (male_count / total_visits) * 100 if total_visits > 0 else 0
+    female_percentage = (female_count / total_visits) * 100 if total_visits > 0 else 0
+
+    response_data = {
+        "start_date": start_datetime.strftime("%Y-%m-%d %H:%M"),
+        "end_date": end_datetime.strftime("%Y-%m-%d %H:%M"),
+        "clients": sorted(combined_clients),
+        "gender": dict(combined_gender_counts),
+        "age": dict(combined_age_counts),
+        "time_slots": [
+            {"time": time, **counts}
+            for time, counts in sorted(combined_time_slots.items())
+        ],
+        "total_new_clients": total_new_clients,
+        "total_regular_clients": total_regular_clients,
+        "male_percentage": male_percentage,
+        "female_percentage": female_percentage,
+    }
+    return response_data
 
 
 def round_time_slot(time):
@@ -0,0 +1,110 @@
+from sqlalchemy import Date, case, cast, delete, func, text
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models import Attendance, DailyPresence
+
+PRESENCE_COLUMNS = ["person_id", "date", "first_ts", "last_ts", "punch_count", "first_file_path", "last_file_path"]
+
+
+def select_presence_from_attendances():
+    attendance_date = cast(Attendance.ts, Date)
+    return (
+        select(
+            Attendance.person_id,
+            attendance_date,
+            func.min(Attendance.ts),
+            func.max(Attendance.ts),
+            func.count(Attendance.id),
+            array_agg(aggregate_order_by(Attendance.file_path, Attendance.ts.asc(), Attendance.id.asc()))[1],
+            array_agg(aggregate_order_by(Attendance.file_path, Attendance.ts.desc(), Attendance.id.desc()))[1],
+        )
+        .group_by(Attendance.person_id, attendance_date)
+    )
+
+
+async def upsert_daily_presence(db: AsyncSession, person_id: int, ts, file_path: str):
+    await upsert_daily_presences(db, [{
+        "person_id": person_id,
+        "date": ts.date(),
+        "first_ts": ts,
+        "last_ts": ts,
+        "punch_count": 1,
+        "first_file_path": file_path,
+        "last_file_path": file_path,
+    }])
+
+
+async def upsert_daily_presences(db: AsyncSession, rows: list[dict]):
+    if not rows:
+        return
+    stmt = insert(DailyPresence).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyPresence.person_id, DailyPresence.date],
+        set_={
+            "first_ts": func.least(DailyPresence.first_ts, stmt.excluded.first_ts),
+            "first_file_path": case(
+                (stmt.excluded.first_ts < DailyPresence.first_ts, stmt.excluded.first_file_path),
+                else_=DailyPresence.first_file_path,
+            ),
+            "last_ts": func.greatest(DailyPresence.last_ts, stmt.excluded.last_ts),
+            "last_file_path": case(
+                (stmt.excluded.last_ts >= DailyPresence.last_ts, stmt.excluded.last_file_path),
+                else_=DailyPresence.last_file_path,
+            ),
+            "punch_count": DailyPresence.punch_count + stmt.excluded.punch_count,
+            "updated_at": text("TIMEZONE('utc', now())"),
+        },
+    )
+    await db.execute(stmt)
+
+
+def merge_daily_presences(punches) -> list[dict]:
+    rows = {}
+    for person_id, ts, file_path in punches:
+        key = (person_id, ts.date())
+        row = rows.get(key)
+        if row is None:
+            rows[key] = {
+                "person_id": person_id,
+                "date": ts.date(),
+                "first_ts": ts,
+                "last_ts": ts,
+                "punch_count": 1,
+                "first_file_path": file_path,
+                "last_file_path": file_path,
+            }
+            continue
+
+        if ts < row["first_ts"]:
+            row["first_ts"], row["first_file_path"] = ts, file_path
+        if ts >= row["last_ts"]:
+            row["last_ts"], row["last_file_path"] = ts, file_path
+        row["punch_count"] += 1
+
+    # every writer upserts in key order, so concurrent batches lock the same rows in the same
+    # order instead of deadlocking
+    return sorted(rows.values(), key=lambda row: (row["person_id"], row["date"]))
+
+
+async def refresh_daily_presence(db: AsyncSession, person_id: int, date):
+    await db.execute(delete(DailyPresence).filter_by(person_id=person_id, date=date))
+    await db.execute(
+        insert(DailyPresence).from_select(
+            PRESENCE_COLUMNS,
+            select_presence_from_attendances().filter(
+                Attendance.person_id == person_id,
+                cast(Attendance.ts, Date) == date,
+            ),
+        )
+    )
+
+
+async def rebuild_daily_presence(db: AsyncSession):
+    await db.execute(delete(DailyPresence))
+    await db.execute(insert(DailyPresence).from_select(PRESENCE_COLUMNS, select_presence_from_attendances()))
+    await db.commit()
+
+    result = await db.execute(select(func.count()).select_from(DailyPresence))
+    return result.scalar()
@@ -1,4 +1,6 @@
+from collections import defaultdict
 from datetime import datetime, timezone
+from typing import Optional
 
 from fastapi import HTTPException
 from sqlalchemy import delete
@@ -9,9 +11,14 @@ from ..schemas import DayResponse
 from ..schemas import WorkingGraphicResponse, EmployeeImageResponse
 from ..schemas.position import PositionResponse
 from ..schemas.filial import FilialResponse
-from ..models import Position, WorkingGraphic, Filial, Day, EmployeeImage, Attendance
+from ..models import Position, WorkingGraphic, Filial, Day, EmployeeImage, DailyPresence
 from ..models.employee import Employee
+from .attendance import get_date_range
+from .loaders import EMPLOYEE_DETAIL_LOADERS
+from .report_cache import ATTENDANCE_REPORTS, invalidate_reports
+from .schedule_cache import get_resolved_schedule
 from ..schemas.employee import EmployeeCreate, EmployeeUpdate, EmployeeResponse
+from ..utils.image_variants import thumbnail_url
 
 from app.database import BASE_URL
 
@@ -26,72 +33,101 @@ async def create_employee(db: AsyncSession, employee: EmployeeCreate):
         db_employee = Employee(**employee.model_dump())
         db.add(db_employee)
         await db.commit()
+        invalidate_reports(ATTENDANCE_REPORTS)
         await db.refresh(db_employee)
-
-        return db_employee
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-
-async def get_employees(db: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(Employee).offset(skip).limit(limit))
-    employees = result.scalars().all()
+    result = await db.execute(
+        select(Employee)
+        .options(*EMPLOYEE_DETAIL_LOADERS)
+        .filter_by(id=db_employee.id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+
+def select_employee_rows():
+    return (
+        select(
+            Employee.id,
+            Employee.name,
+            Employee.phone_number,
+            Employee.working_graphic_id,
+            Position.id.label("position_id"),
+            Position.name.label("position_name"),
+            WorkingGraphic.name.label("working_graphic_name"),
+            Filial.id.label("filial_id"),
+            Filial.name.label("filial_name"),
+            Filial.address.label("filial_address"),
+        )
+        .outerjoin(Position, Position.id == Employee.position_id)
+        .outerjoin(WorkingGraphic, WorkingGraphic.id == Employee.working_graphic_id)
+        .outerjoin(Filial, Filial.id == Employee.filial_id)
+    )
+
+
+async def format_employees(db: AsyncSession, employees):
+    working_graphic_ids = {employee.working_graphic_id for employee in employees if employee.working_graphic_id}
+    days_by_graphic = defaultdict(list)
+    if working_graphic_ids:
+        days_result = await db.execute(
+            select(Day.id, Day.day, Day.time_in, Day.time_out, Day.is_work_day, Day.working_graphic_id)
+            .filter(Day.working_graphic_id.in_(working_graphic_ids))
+            .order_by(Day.id)
+        )
+        for day in days_result.all():
+            days_by_graphic[day.working_graphic_id].append(day)
+
+    images_by_employee = defaultdict(list)
+    if employees:
+        images_result = await db.execute(
+            select(EmployeeImage.image_id, EmployeeImage.employee_id, EmployeeImage.image_url)
+            .filter(EmployeeImage.employee_id.in_([employee.id for employee in employees]))
+            .order_by(EmployeeImage.image_id)
+        )
+        for image in images_result.all():
+            images_by_employee[image.employee_id].append(image)
 
     formatted_employees = []
     for employee in employees:
-        position = await db.execute(select(Position).filter_by(id=employee.position_id))
-        position = position.scalar_one_or_none()
-
         working_graphic = None
-        if employee.working_graphic_id:
-            working_graphic = await db.execute(select(WorkingGraphic).filter_by(id=employee.working_graphic_id))
-            working_graphic = working_graphic.scalar_one_or_none()
-
-            if working_graphic:
-                days_result = await db.execute(select(Day).filter_by(working_graphic_id=working_graphic.id))
-                days = days_result.scalars().all()
-
-                working_graphic = {
-                    "id": working_graphic.id,
-                    "name": working_graphic.name,
-                    "days": [
-                        {
-                            "id": day.id,
-                            "day": day.day,
-                            "time_in": day.time_in,
-                            "time_out": day.time_out,
-                            "is_work_day": day.is_work_day,
-                        } for day in days
-                    ],
-                }
-
-        filial = await db.execute(select(Filial).filter_by(id=employee.filial_id))
-        filial = filial.scalar_one_or_none()
-
-        images = await db.execute(select(EmployeeImage).filter_by(employee_id=employee.id))
-        images = images.scalars().all()
+        if employee.working_graphic_id and employee.working_graphic_name is not None:
+            working_graphic = {
+                "id": employee.working_graphic_id,
+                "name": employee.working_graphic_name,
+                "days": [
+                    {
+                        "id": day.id,
+                        "day": day.day,
+                        "time_in": day.time_in,
+                        "time_out": day.time_out,
+                        "is_work_day": day.is_work_day,
+                    } for day in days_by_graphic[employee.working_graphic_id]
+                ],
+            }
 
         formatted_employee = {
             "id": employee.id,
             "name": employee.name,
             "phone_number": employee.phone_number,
             "position": {
-                "id": position.id,
-                "name": position.name,
-            },
+                "id": employee.position_id,
+                "name": employee.position_name,
+            } if employee.position_id is not None else None,
             "working_graphic": working_graphic,
             "filial": {
-                "id": filial.id,
-                "name": filial.name,
-                "address": filial.address,
-            },
+                "id": employee.filial_id,
+                "name": employee.filial_name,
+                "address": employee.filial_address,
+            } if employee.filial_id is not None else None,
             "images": [
                 {
                     "image_id": image.image_id,
                     "employee_id": image.employee_id,
                     "image_url": f"{BASE_URL}{image.image_url}",
-                } for image in images
+                } for image in images_by_employee[employee.id]
             ],
         }
         formatted_employees.append(formatted_employee)
@@ -99,68 +135,24 @@ async def get_employees(db: AsyncSession, skip: int = 0, limit: int = 10):
     return formatted_employees
 
 
-async def get_employee(db: AsyncSession, employee_id: int):
-    result = await db.execute(select(Employee).filter_by(id=employee_id))
-    employee = result.scalar_one_or_none()
-    if not employee:
-        raise HTTPException(status_code=404, detail="Employee not found")
-
-    position = await db.execute(select(Position).filter_by(id=employee.position_id))
-    position = position.scalar_one_or_none()
+async def get_employees(db: AsyncSession, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    query = select_employee_rows().order_by(Employee.id).limit(limit)
+    query = query.filter(Employee.id > after_id) if after_id is not None else query.offset(skip)
+    result = await db.execute(query)
+    employees = result.all()
 
-    working_graphic = None
-    if employee.working_graphic_id:
-        working_graphic = await db.execute(select(WorkingGraphic).filter_by(id=employee.working_graphic_id))
-        working_graphic = working_graphic.scalar_one_or_none()
+    return await format_employees(db, employees)
 
-        if working_graphic:
-            days_result = await db.execute(select(Day).filter_by(working_graphic_id=employee.working_graphic_id))
-            days = days_result.scalars().all()
 
-            working_graphic = {
-                "id": working_graphic.id,
-                "name": working_graphic.name,
-                "days": [
-                    {
-                        "id": day.id,
-                        "day": day.day,
-                        "time_in": day.time_in,
-                        "time_out": day.time_out,
-                        "is_work_day": day.is_work_day,
-                    } for day in days
-                ],
-            }
+async def get_employee(db: AsyncSession, employee_id: int):
+    result = await db.execute(select_employee_rows().filter(Employee.id == employee_id))
+    employee = result.one_or_none()
+    if not employee:
+        raise HTTPException(status_code=404, detail="Employee not found")
 
-    filial = await db.execute(select(Filial).filter_by(id=employee.filial_id))
-    filial = filial.scalar_one_or_none()
-
-    images = await db.execute(select(EmployeeImage).filter_by(employee_id=employee.id))
-    images = images.scalars().all()
-
-    formatted_employee = {
-        "id": employee.id,
-        "name": employee.name,
-        "phone_number": employee.phone_number,
-        "position": {
-            "id": position.id,
-            "name": position.name,
-        },
-        "working_graphic": working_graphic,
-        "filial": {
-            "id": filial.id,
-            "name": filial.name,
-            "address": filial.address,
-        },
-        "images": [
-            {
-                "image_id": image.image_id,
-                "employee_id": image.employee_id,
-                "image_url": f"{BASE_URL}{image.image_url}",
-            } for image in images
-        ],
-    }
+    formatted_employees = await format_employees(db, [employee])
 
-    return formatted_employee
+    return formatted_employees[0]
 
 
 async def update_employee(db: AsyncSession, employee_id: int, employee: EmployeeUpdate):
@@ -193,6 +185,7 @@ async def update_employee(db: AsyncSession, employee_id: int, employee: Employee
             setattr(db_employee, key, value)
 
     await db.commit()
+    invalidate_reports(ATTENDANCE_REPORTS)
     await db.refresh(db_employee)
 
     formatted_employee = [
@@ -230,6 +223,7 @@ async def delete_employee(db: AsyncSession, employee_id: int):
 
         await db.delete(db_employee)
         await db.commit()
+        invalidate_reports(ATTENDANCE_REPORTS)
         logger.info(f"Employee {employee_id} deleted")
         return {"message": f"Employee {employee_id} deleted"}
     except Exception as e:
@@ -239,82 +233,62 @@ async def delete_employee(db: AsyncSession, employee_id: int):
 
 
 async def get_employee_deep(db: AsyncSession, employee_id: int, date: str):
-    result = await db.execute(select(Employee).filter_by(id=employee_id))
+    result = await db.execute(select(Employee).options(*EMPLOYEE_DETAIL_LOADERS).filter_by(id=employee_id))
     db_employee = result.scalar_one_or_none()
     if not db_employee:
         raise HTTPException(status_code=404, detail="Employee not found")
 
-    attendance_result = await db.execute(select(Attendance).filter_by(person_id=employee_id))
-    db_attendances = attendance_result.scalars().all()
-    if not db_attendances:
-        raise HTTPException(status_code=404, detail="Attendances not found")
-
-    formatted_date_attendances = []
-    for db_attendance in db_attendances:
-        try:
-            attendance_datetime = datetime.strptime(db_attendance.time, "%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            raise HTTPException(status_code=400, detail=f"Time data {db_attendance.time} does not match format %Y-%m-%d %H:%M:%S")
-
-        attendance_date = attendance_datetime.strftime("%Y-%m")
-        if attendance_date == date:
-            formatted_date_attendances.append(db_attendance)
-
-    if not formatted_date_attendances:
+    try:
+        month_start, month_end = get_date_range(date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format, expected YYYY-MM")
+
+    presence_result = await db.execute(
+        select(DailyPresence)
+        .filter(
+            DailyPresence.person_id == employee_id,
+            DailyPresence.date >= month_start.date(),
+            DailyPresence.date < month_end.date(),
+        )
+        .order_by(DailyPresence.date)
+    )
+    daily_presences = presence_result.scalars().all()
+
+    if not daily_presences:
         raise HTTPException(status_code=404, detail="No attendances found for the specified date")
 
-    daily_attendances = {}
-    for attendance in formatted_date_attendances:
-        attendance_date_str = datetime.strptime(attendance.time, "%Y-%m-%d %H:%M:%S").date().isoformat()
-        if attendance_date_str not in daily_attendances:
-            daily_attendances[attendance_date_str] = {
-                'first': attendance,
-                'last': attendance
-            }
-        else:
-            if datetime.strptime(attendance.time, "%Y-%m-%d %H:%M:%S") < datetime.strptime(daily_attendances[attendance_date_str]['first'].time, "%Y-%m-%d %H:%M:%S"):
-                daily_attendances[attendance_date_str]['first'] = attendance
-            elif datetime.strptime(attendance.time, "%Y-%m-%d %H:%M:%S") > datetime.strptime(daily_attendances[attendance_date_str]['last'].time, "%Y-%m-%d %H:%M:%S"):
-                daily_attendances[attendance_date_str]['last'] = attendance
+    schedule = await get_resolved_schedule(db, db_employee.working_graphic_id)
+    workdays = schedule.by_day if schedule else {}
 
     attendance_response = []
-    for attendance_date_str, att in daily_attendances.items():
-        date_obj = datetime.strptime(attendance_date_str, "%Y-%m-%d").date()
+    for presence in daily_presences:
+        date_obj = presence.date
 
         weekday = date_obj.strftime("%A").lower()
-        workday = next((day for day in db_employee.working_graphic.days if day.day == weekday), None)
-
-        if workday:
-            try:
-                time_in = datetime.combine(date_obj, datetime.strptime(workday.time_in, "%H:%M:%S").time())
-            except ValueError:
-                time_in = datetime.combine(date_obj, datetime.strptime(workday.time_in, "%H:%M").time())
-            try:
-                time_out = datetime.combine(date_obj, datetime.strptime(workday.time_out, "%H:%M:%S").time())
-            except ValueError:
-                time_out = datetime.combine(date_obj, datetime.strptime(workday.time_out, "%H:%M").time())
-
-            first_att = att['first']
-            last_att = att['last']
-
-            late_n_minute = int(
-                (datetime.strptime(first_att.time, "%Y-%m-%d %H:%M:%S") - time_in).total_seconds() // 60)
+        workday = workdays.get(weekday)
+
+        if workday and None not in workday:
+            time_in = datetime.combine(date_obj, workday[0])
+            time_out = datetime.combine(date_obj, workday[1])
+
+            late_n_minute = int((presence.first_ts - time_in).total_seconds() // 60)
             if late_n_minute < 0:
                 late_n_minute = 0
 
-            early_leave_n_minute = int(
-                (time_out - datetime.strptime(last_att.time, "%Y-%m-%d %H:%M:%S")).total_seconds() // 60)
+            early_leave_n_minute = int((time_out - presence.last_ts).total_seconds() // 60)
             if early_leave_n_minute < 0:
                 early_leave_n_minute = 0
 
             attendance_response.append({
                 "date": date_obj.isoformat(),
-                "attend_time": datetime.strptime(first_att.time, "%Y-%m-%d %H:%M:%S").time().isoformat(),
-                "attend_image": f"{BASE_URL}{first_att.file_path}",
+                "attend_time": presence.first_ts.time().isoformat(),
+                "attend_image": f"{BASE_URL}{presence.first_file_path}",
+                "attend_thumbnail": thumbnail_url(presence.first_file_path),
                 "late_n_minute": late_n_minute if late_n_minute > 0 else None,
                 "early_leave_n_minute": early_leave_n_minute if early_leave_n_minute > 0 else None,
-                "leave_time": datetime.strptime(last_att.time, "%Y-%m-%d %H:%M:%S").time().isoformat(),
-                "leave_image": f"{BASE_URL}{first_att.file_path}",
+                "leave_time": presence.last_ts.time().isoformat(),
+                "leave_image": f"{BASE_URL}{presence.last_file_path}",
+                "leave_thumbnail": thumbnail_url(presence.last_file_path),
             })
 
     response_model = {
@@ -338,7 +312,8 @@ async def get_employee_deep(db: AsyncSession, employee_id: int, date: str):
         "images": [
             {
                 "id": image.image_id,
-                "url": f"{BASE_URL}{image.image_url}"
+                "url": f"{BASE_URL}{image.image_url}",
+                "thumbnail": thumbnail_url(image.image_url),
             } for image in db_employee.images
         ],
         "attendances": attendance_response,
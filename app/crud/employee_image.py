@@ -1,4 +1,4 @@
-import os
+from typing import Optional
 
 from fastapi import HTTPException, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -6,38 +6,37 @@ from sqlalchemy.future import select
 from ..models.employee_image import EmployeeImage
 from ..schemas.employee_image import EmployeeImageCreate, EmployeeImageUpdate
 from ..utils.file_utils import save_upload_file
+from ..utils.image_variants import schedule_image_variants
 
 from ..database import BASE_URL
 
 
 async def create_employee_image(db: AsyncSession, employee_id: int, file: UploadFile):
     try:
-        main_image_url = f"/storage/users/"
-        dir_path = f"{main_image_url}{employee_id}"
-        img_type = "images"
-
-        if not os.path.exists(dir_path):
-            os.makedirs(f"{dir_path}/{img_type}")
-
-        file_path = save_upload_file(file, employee_id, img_type)
-        image_url = f"{main_image_url}{employee_id}/{img_type}/{file_path}"
+        image_url = await save_upload_file(file)
 
         db_employee_image = EmployeeImage(image_url=image_url, employee_id=employee_id)
         db.add(db_employee_image)
         await db.commit()
         await db.refresh(db_employee_image)
+        schedule_image_variants([image_url])
 
         db_employee_image.image_url = f"{BASE_URL}{image_url}"
 
         return db_employee_image
 
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def get_employees_images(db: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(EmployeeImage).offset(skip).limit(limit))
+async def get_employees_images(db: AsyncSession, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    query = select(EmployeeImage).order_by(EmployeeImage.image_id).limit(limit)
+    query = query.filter(EmployeeImage.image_id > after_id) if after_id is not None else query.offset(skip)
+    result = await db.execute(query)
     employee_images = result.scalars().all()
 
     for image in employee_images:
@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.future import select
+
+from ..database import BASE_URL, SessionLocal
+from ..models import Attendance, Employee, Filial, Position
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+EXPORT_COLUMNS = [
+    "id", "employee_id", "employee_name", "position", "filial_id", "filial", "camera_id", "time", "score",
+    "attendance_image",
+]
+
+
+def get_export_range(start_date: str, end_date: str):
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format, expected YYYY-MM-DD")
+
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+
+    return start, end
+
+
+def select_attendance_export(start: datetime, end: datetime, filial_id: Optional[int] = None,
+                             employee_id: Optional[int] = None):
+    query = (
+        select(
+            Attendance.id,
+            Attendance.person_id,
+            Employee.name,
+            Position.name,
+            Filial.id,
+            Filial.name,
+            Attendance.camera_id,
+            Attendance.ts,
+            Attendance.score,
+            Attendance.file_path,
+        )
+        .join(Employee, Employee.id == Attendance.person_id)
+        .outerjoin(Position, Position.id == Employee.position_id)
+        .outerjoin(Filial, Filial.id == Employee.filial_id)
+        .filter(Attendance.ts >= start, Attendance.ts < end)
+        .order_by(Attendance.ts, Attendance.id)
+    )
+    if filial_id is not None:
+        query = query.filter(Employee.filial_id == filial_id)
+    if employee_id is not None:
+        query = query.filter(Attendance.person_id == employee_id)
+
+    return query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def format_export_row(row) -> list:
+    return [
+        row[0], row[1], row[2], row[3], row[4], row[5], row[6], row[7].isoformat(sep=" "), row[8],
+        f"{BASE_URL}{row[9]}",
+    ]
+
+
+def encode_csv(rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def encode_ndjson(rows) -> str:
+    return "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in rows)
+
+
+async def stream_attendance_export(export_format: str, start: datetime, end: datetime,
+                                   filial_id: Optional[int] = None, employee_id: Optional[int] = None):
+    if export_format == "csv":
+        yield encode_csv([], header=True)
+
+    async with SessionLocal() as db:
+        result = await db.stream(select_attendance_export(start, end, filial_id, employee_id))
+        async for partition in result.partitions():
+            rows = [format_export_row(row) for row in partition]
+            yield encode_csv(rows) if export_format == "csv" else encode_ndjson(rows)
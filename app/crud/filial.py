@@ -1,16 +1,21 @@
+from collections import defaultdict
 from datetime import datetime
+from typing import Optional
 
 from fastapi import HTTPException
-from sqlalchemy import update
+from sqlalchemy import func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
 
-from ..crud.attendance import get_commers_by_filial
+from ..crud.attendance import get_commers_by_filial, get_date_range
 from ..database import BASE_URL
+from .loaders import EMPLOYEE_DETAIL_LOADERS
+from .report_cache import ATTENDANCE_REPORTS, invalidate_reports
 from ..models import Employee, Attendance, Position
 from ..models.filial import Filial
 from ..schemas.filial import FilialCreate, FilialUpdate, FilialResponse
-from .client import make_naive
+from ..utils.image_variants import thumbnail_url
 
 
 async def create_filial(db: AsyncSession, filial: FilialCreate):
@@ -19,21 +24,31 @@ async def create_filial(db: AsyncSession, filial: FilialCreate):
         db.add(db_filial)
         await db.commit()
         await db.refresh(db_filial)
-
-        return db_filial
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    return await get_filial(db, db_filial.id)
+
 
-async def get_filials(db: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(Filial).offset(skip).limit(limit))
+async def get_filials(db: AsyncSession, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    query = select(Filial).order_by(Filial.id).limit(limit)
+    query = query.filter(Filial.id > after_id) if after_id is not None else query.offset(skip)
+    result = await db.execute(query)
     filials = result.scalars().all()
 
+    employees_by_filial = defaultdict(list)
+    if filials:
+        employees_result = await db.execute(
+            select(Employee)
+            .options(*EMPLOYEE_DETAIL_LOADERS)
+            .filter(Employee.filial_id.in_([filial.id for filial in filials]))
+            .order_by(Employee.id)
+        )
+        for employee in employees_result.scalars().all():
+            employees_by_filial[employee.filial_id].append(employee)
+
     formatted_filials = []
     for filial in filials:
-        employees_result = await db.execute(select(Employee).filter_by(filial_id=filial.id))
-        employees = employees_result.scalars().all()
-
         formmated_employees = [
             {
                 "id": employee.id,
@@ -56,12 +71,13 @@ async def get_filials(db: AsyncSession, skip: int = 0, limit: int = 10):
                 "images": [
                     {
                         "id": image.image_id,
-                        "url": f"{BASE_URL}{image.image_url}"
+                        "url": f"{BASE_URL}{image.image_url}",
+                        "thumbnail": thumbnail_url(image.image_url),
                     } for image in employee.images
                 ],
                 "created_at": employee.created_at,
                 "updated_at": employee.updated_at,
-            } for employee in employees
+            } for employee in employees_by_filial[filial.id]
         ]
 
         formatted_filial = FilialResponse(
@@ -83,7 +99,9 @@ async def get_filial(db: AsyncSession, filial_id: int):
     if not filial:
         raise HTTPException(status_code=404, detail="Filial not found")
 
-    employees_result = await db.execute(select(Employee).filter_by(filial_id=filial.id))
+    employees_result = await db.execute(
+        select(Employee).options(*EMPLOYEE_DETAIL_LOADERS).filter_by(filial_id=filial.id)
+    )
     employees = employees_result.scalars().all()
 
     formatted_filial = FilialResponse(
@@ -112,7 +130,8 @@ async def get_filial(db: AsyncSession, filial_id: int):
                 "images": [
                     {
                         "id": image.image_id,
-                        "url": f"{BASE_URL}{image.image_url}"
+                        "url": f"{BASE_URL}{image.image_url}",
+                        "thumbnail": thumbnail_url(image.image_url),
                     } for image in employee.images
                 ],
                 "created_at": employee.created_at,
@@ -127,26 +146,32 @@ async def get_filial(db: AsyncSession, filial_id: int):
 
 
 async def get_filial_employees_by_date(db: AsyncSession, filial_id: int, date: str):
-    result = await db.execute(select(Employee).filter_by(filial_id=filial_id))
+    result = await db.execute(
+        select(Employee).options(selectinload(Employee.images)).filter_by(filial_id=filial_id)
+    )
     employees = result.scalars().all()
     if not employees:
         raise HTTPException(status_code=404, detail="Employees not found")
 
-    formatted_date_employees = []
-    for employee in employees:
-        attendance_results = await db.execute(select(Attendance).filter_by(person_id=employee.id))
-        attendances = attendance_results.scalars().all()
-
-        for attendance in attendances:
-            attendance_date = make_naive(attendance.created_at).date().isoformat()
-            if date.startswith(attendance_date[:7]) if len(date) == 7 else date == attendance_date:
-                formatted_date_employees.append(attendance)
+    try:
+        start, end = get_date_range(date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format, expected YYYY-MM or YYYY-MM-DD")
+
+    attendance_results = await db.execute(
+        select(Attendance)
+        .filter(
+            Attendance.person_id.in_([employee.id for employee in employees]),
+            Attendance.ts >= start,
+            Attendance.ts < end,
+        )
+        .order_by(Attendance.id)
+    )
+    formatted_date_employees = attendance_results.scalars().all()
 
     if not formatted_date_employees:
         return ["Not found"]
 
-    formatted_date_employees.sort(key=lambda x: x.id)
-
     formatted_employees = {employee.id: employee for employee in employees}
 
     position_result = await db.execute(select(Position))
@@ -166,12 +191,15 @@ async def get_filial_employees_by_date(db: AsyncSession, filial_id: int, date: s
                 "employee": {"id": attendance.person_id, "name": formatted_employees[attendance.person_id].name},
                 "main_image": f"{BASE_URL}{formatted_employees[attendance.person_id].images[0].image_url}"
                 if formatted_employees[attendance.person_id].images else None,
+                "main_thumbnail": thumbnail_url(formatted_employees[attendance.person_id].images[0].image_url)
+                if formatted_employees[attendance.person_id].images else None,
                 "position": {"id": formatted_employees[attendance.person_id].position_id,
                              "name": positions[formatted_employees[attendance.person_id].position_id].name},
                 "filial": {"id": filial.id, "name": filial.name},
                 "score": attendance.score,
                 "time": attendance.time,
                 "attendance_image": f"{BASE_URL}{attendance.file_path}",
+                "attendance_thumbnail": thumbnail_url(attendance.file_path),
                 "camera_id": attendance.camera_id if attendance.camera_id else None,
                 "created_at": attendance.created_at,
                 "updated_at": attendance.updated_at,
@@ -192,8 +220,9 @@ async def update_filial(db: AsyncSession, filial_id: int, filial: FilialUpdate):
         setattr(db_filial, key, value)
 
     await db.commit()
-    await db.refresh(db_filial)
-    return db_filial
+    invalidate_reports(ATTENDANCE_REPORTS, filial_id=filial_id)
+
+    return await get_filial(db, filial_id)
 
 
 async def delete_filial(db: AsyncSession, filial_id: int):
@@ -208,6 +237,7 @@ async def delete_filial(db: AsyncSession, filial_id: int):
 
     await db.delete(db_filial)
     await db.commit()
+    invalidate_reports(ATTENDANCE_REPORTS, filial_id=filial_id)
     return {"message": f"Filial {filial_id} deleted"}
 
 
@@ -217,9 +247,14 @@ async def get_commers_filials(db: AsyncSession, date: str):
     if not filials:
         raise HTTPException(status_code=404, detail="Filials not found")
 
+    employee_counts_result = await db.execute(
+        select(Employee.filial_id, func.count(Employee.id)).group_by(Employee.filial_id)
+    )
+    employee_counts = dict(employee_counts_result.all())
+
     formatted_filials = []
     for filial in filials:
         filial_commers = await get_commers_by_filial(db, date, filial.id)
-        formatted_filials.append({"filial_id": filial.id, "filial_name": filial.name, "filial_address": filial.address, "total_emp": len(filial.employees), "data": filial_commers})
+        formatted_filials.append({"filial_id": filial.id, "filial_name": filial.name, "filial_address": filial.address, "total_emp": employee_counts.get(filial.id, 0), "data": filial_commers})
 
     return formatted_filials
@@ -0,0 +1,60 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException
+
+from ..config import IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_CACHE_TTL
+
+MAX_KEY_LENGTH = 255
+
+
+class RecentKeys:
+    """
+    Responses of recently stored events by idempotency key, so a camera retrying a request it timed
+    out on is answered without touching the database. The unique indexes remain the real guard, this
+    only absorbs hot retries within one process.
+    """
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, response):
+        self._entries[key] = (time.monotonic() + self.ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: Optional[str]):
+        self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def event_key(*parts) -> str:
+    return hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def check_key(key: str) -> str:
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency key must be 1 to {MAX_KEY_LENGTH} characters")
+    return key
+
+
+recent_attendances = RecentKeys(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_CACHE_TTL)
+recent_clients = RecentKeys(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_CACHE_TTL)
@@ -0,0 +1,17 @@
+from sqlalchemy.orm import selectinload
+
+from ..models import Employee, WorkingGraphic
+
+EMPLOYEE_SUMMARY_LOADERS = (
+    selectinload(Employee.position),
+    selectinload(Employee.working_graphic),
+    selectinload(Employee.filial),
+    selectinload(Employee.images),
+)
+
+EMPLOYEE_DETAIL_LOADERS = (
+    selectinload(Employee.position),
+    selectinload(Employee.working_graphic).selectinload(WorkingGraphic.days),
+    selectinload(Employee.filial),
+    selectinload(Employee.images),
+)
@@ -1,3 +1,6 @@
+from collections import defaultdict
+from typing import Optional
+
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -7,6 +10,8 @@ from ..database import BASE_URL
 from ..models import Employee
 from ..models.position import Position
 from ..schemas.position import PositionCreate, PositionUpdate, PositionResponse
+from .loaders import EMPLOYEE_SUMMARY_LOADERS
+from .report_cache import ATTENDANCE_REPORTS, invalidate_reports
 
 
 async def create_position(db: AsyncSession, position: PositionCreate):
@@ -15,22 +20,32 @@ async def create_position(db: AsyncSession, position: PositionCreate):
         db.add(db_position)
         await db.commit()
         await db.refresh(db_position)
-
-        return db_position
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+    return await get_position(db, db_position.id)
 
-async def get_positions(db: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(Position).offset(skip).limit(limit))
+
+async def get_positions(db: AsyncSession, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    query = select(Position).order_by(Position.id).limit(limit)
+    query = query.filter(Position.id > after_id) if after_id is not None else query.offset(skip)
+    result = await db.execute(query)
     positions = result.scalars().all()
 
+    employees_by_position = defaultdict(list)
+    if positions:
+        employees_result = await db.execute(
+            select(Employee)
+            .options(*EMPLOYEE_SUMMARY_LOADERS)
+            .filter(Employee.position_id.in_([position.id for position in positions]))
+            .order_by(Employee.id)
+        )
+        for employee in employees_result.scalars().all():
+            employees_by_position[employee.position_id].append(employee)
+
     formatted_positions = []
     for position in positions:
-        employees = await db.execute(select(Employee).filter_by(position_id=position.id))
-        employees = employees.scalars().all()
-
         formatted_position = PositionResponse(
             id=position.id,
             name=position.name,
@@ -50,7 +65,7 @@ async def get_positions(db: AsyncSession, skip: int = 0, limit: int = 10):
                     ],
                     "created_at": employee.created_at,
                     "updated_at": employee.updated_at,
-                } for employee in employees
+                } for employee in employees_by_position[position.id]
             ],
             created_at=position.created_at,
             updated_at=position.updated_at,
@@ -66,7 +81,9 @@ async def get_position(db: AsyncSession, position_id: int):
     if not position:
         raise HTTPException(status_code=404, detail="Position not found")
 
-    employees_result = await db.execute(select(Employee).filter_by(position_id=position.id))
+    employees_result = await db.execute(
+        select(Employee).options(*EMPLOYEE_SUMMARY_LOADERS).filter_by(position_id=position.id)
+    )
     employees = employees_result.scalars().all()
 
     formatted_position = PositionResponse(
@@ -107,8 +124,9 @@ async def update_position(db: AsyncSession, position_id: int, position: Position
     for key, value in position.model_dump(exclude_unset=True).items():
         setattr(db_position, key, value)
     await db.commit()
-    await db.refresh(db_position)
-    return db_position
+    invalidate_reports(ATTENDANCE_REPORTS)
+
+    return await get_position(db, position_id)
 
 
 async def delete_position(db: AsyncSession, position_id: int):
@@ -120,4 +138,5 @@ async def delete_position(db: AsyncSession, position_id: int):
 
     await db.delete(db_position)
     await db.commit()
+    invalidate_reports(ATTENDANCE_REPORTS)
     return {"message": f"Position {position_id} deleted"}
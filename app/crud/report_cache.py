@@ -0,0 +1,102 @@
+import itertools
+import time
+from collections import OrderedDict
+from datetime import date as date_type, datetime, timedelta
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+from ..config import REPORT_CACHE_PAST_TTL, REPORT_CACHE_SIZE, REPORT_CACHE_TTL
+
+ATTENDANCE_REPORTS = "attendance"
+CLIENT_REPORTS = "clients"
+
+
+class ReportScope(NamedTuple):
+    kind: str
+    filial_id: Optional[int]
+    start: date_type
+    end: date_type
+
+
+_reports: OrderedDict[tuple, tuple[float, ReportScope, object]] = OrderedDict()
+# reports being computed, by token, and the tokens an invalidation overlapped meanwhile
+_pending: dict[int, ReportScope] = {}
+_stale_pending: set[int] = set()
+_tokens = itertools.count()
+
+report_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+
+def period_scope(kind: str, filial_id: Optional[int], period: str) -> Optional[ReportScope]:
+    try:
+        if len(period) == 7:
+            start = datetime.strptime(period, "%Y-%m").date()
+            end = (start + timedelta(days=32)).replace(day=1)
+        else:
+            start = datetime.strptime(period, "%Y-%m-%d").date()
+            end = start + timedelta(days=1)
+    except ValueError:
+        return None
+
+    return ReportScope(kind, filial_id, start, end)
+
+
+def range_scope(kind: str, filial_id: Optional[int], start: datetime, end: datetime) -> ReportScope:
+    return ReportScope(kind, filial_id, start.date(), end.date() + timedelta(days=1))
+
+
+async def cached_report(key: tuple, scope: Optional[ReportScope], compute: Callable[[], Awaitable]):
+    if scope is None:
+        return await compute()
+
+    now = time.monotonic()
+    cached = _reports.get(key)
+    if cached and cached[0] > now:
+        _reports.move_to_end(key)
+        report_cache_stats["hits"] += 1
+        return cached[2]
+
+    report_cache_stats["misses"] += 1
+    token = next(_tokens)
+    _pending[token] = scope
+    try:
+        report = await compute()
+    finally:
+        del _pending[token]
+        stale = token in _stale_pending
+        _stale_pending.discard(token)
+
+    if not stale:
+        # finished days only change through events, which invalidate them in this process only;
+        # the longer TTL bounds how long other workers and direct database writes go unseen
+        ttl = REPORT_CACHE_PAST_TTL if scope.end <= date_type.today() else REPORT_CACHE_TTL
+        expires_at = time.monotonic() + ttl
+        _reports[key] = (expires_at, scope, report)
+        _reports.move_to_end(key)
+        while len(_reports) > REPORT_CACHE_SIZE:
+            _reports.popitem(last=False)
+            report_cache_stats["evictions"] += 1
+
+    return report
+
+
+def overlaps(scope: ReportScope, kind: Optional[str], day: Optional[date_type], filial_id: Optional[int]) -> bool:
+    return (
+        (kind is None or scope.kind == kind)
+        and (day is None or scope.start <= day < scope.end)
+        and (filial_id is None or scope.filial_id is None or scope.filial_id == filial_id)
+    )
+
+
+def invalidate_reports(kind: Optional[str] = None, day: Optional[date_type] = None, filial_id: Optional[int] = None):
+    report_cache_stats["invalidations"] += 1
+
+    # a report computed across the change may miss it, so it is returned but not stored
+    _stale_pending.update(token for token, scope in _pending.items() if overlaps(scope, kind, day, filial_id))
+
+    stale = [key for key, (_, scope, _) in _reports.items() if overlaps(scope, kind, day, filial_id)]
+    for key in stale:
+        del _reports[key]
+
+
+def get_report_cache_stats() -> dict:
+    return {**report_cache_stats, "size": len(_reports), "max_size": REPORT_CACHE_SIZE}
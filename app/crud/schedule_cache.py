@@ -0,0 +1,98 @@
+import time
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..config import SCHEDULE_CACHE_TTL
+from ..models.working_graphic import Day
+from .report_cache import ATTENDANCE_REPORTS, invalidate_reports
+
+
+class ResolvedSchedule(NamedTuple):
+    days: list
+    weekly: dict
+    by_day: dict
+
+
+_schedules: dict[int, tuple[float, ResolvedSchedule]] = {}
+_generation = 0
+
+schedule_cache_stats = {"hits": 0, "misses": 0}
+
+
+def parse_time(time_str):
+    if time_str is None:
+        return None
+
+    try:
+        return datetime.strptime(time_str, "%H:%M:%S").time()
+    except ValueError:
+        return datetime.strptime(time_str, "%H:%M").time()
+
+
+def resolve_schedule(days) -> ResolvedSchedule:
+    schedule = ResolvedSchedule(days=[], weekly={}, by_day={})
+    for day, time_in, time_out, is_work_day in days:
+        time_in = parse_time(time_in)
+        schedule.days.append((time_in, time_out))
+        schedule.by_day.setdefault(day, (time_in, parse_time(time_out)))
+        if is_work_day and time_in is not None:
+            schedule.weekly[day.lower()] = (time_in, parse_time(time_out))
+
+    return schedule
+
+
+async def get_resolved_schedules(db: AsyncSession, working_graphic_ids) -> dict[int, ResolvedSchedule]:
+    now = time.monotonic()
+    schedules = {}
+    missing = set()
+    for working_graphic_id in working_graphic_ids:
+        cached = _schedules.get(working_graphic_id)
+        if cached and cached[0] > now:
+            schedules[working_graphic_id] = cached[1]
+        else:
+            missing.add(working_graphic_id)
+
+    schedule_cache_stats["hits"] += len(schedules)
+    schedule_cache_stats["misses"] += len(missing)
+    if not missing:
+        return schedules
+
+    generation = _generation
+    result = await db.execute(
+        select(Day.working_graphic_id, Day.day, Day.time_in, Day.time_out, Day.is_work_day)
+        .filter(Day.working_graphic_id.in_(missing))
+        .order_by(Day.id)
+    )
+    days = {working_graphic_id: [] for working_graphic_id in missing}
+    for working_graphic_id, *day in result.all():
+        days[working_graphic_id].append(day)
+
+    expires_at = time.monotonic() + SCHEDULE_CACHE_TTL
+    for working_graphic_id, rows in days.items():
+        schedule = resolve_schedule(rows)
+        schedules[working_graphic_id] = schedule
+        if generation == _generation:
+            _schedules[working_graphic_id] = (expires_at, schedule)
+
+    return schedules
+
+
+async def get_resolved_schedule(db: AsyncSession, working_graphic_id: Optional[int]) -> Optional[ResolvedSchedule]:
+    if working_graphic_id is None:
+        return None
+
+    schedules = await get_resolved_schedules(db, [working_graphic_id])
+    return schedules[working_graphic_id]
+
+
+def invalidate_schedule(working_graphic_id: Optional[int] = None):
+    global _generation
+    _generation += 1
+    if working_graphic_id is None:
+        _schedules.clear()
+    else:
+        _schedules.pop(working_graphic_id, None)
+    invalidate_reports(ATTENDANCE_REPORTS)
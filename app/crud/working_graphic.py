@@ -1,3 +1,5 @@
+from typing import Optional
+
 from fastapi import HTTPException
 from sqlalchemy import update
 from sqlalchemy.future import select
@@ -9,6 +11,8 @@ from ..database import BASE_URL
 from ..models.working_graphic import WorkingGraphic, Day
 from ..schemas.working_graphic import WorkingGraphicCreate, WorkingGraphicUpdate, DayCreate, DayUpdate, \
     WorkingGraphicResponse, DayResponse
+from .loaders import EMPLOYEE_SUMMARY_LOADERS
+from .schedule_cache import invalidate_schedule
 
 
 async def create_day(db: AsyncSession, day: DayCreate, working_graphic_id: int):
@@ -21,6 +25,7 @@ async def create_day(db: AsyncSession, day: DayCreate, working_graphic_id: int):
         else:
             db.add(db_day)
             await db.commit()
+            invalidate_schedule(working_graphic_id)
             await db.refresh(db_day)
 
     except Exception as e:
@@ -41,7 +46,7 @@ async def create_working_graphic(db: AsyncSession, working_graphic: WorkingGraph
         await db.rollback()
         raise e
 
-    return db_working_graphic
+    return await get_working_graphic(db, db_working_graphic.id)
 
 
 async def get_days(db: AsyncSession, working_graphic_id: int):
@@ -56,9 +61,12 @@ async def update_day(db: AsyncSession, day_id: int, day: DayUpdate):
     if not db_day:
         raise HTTPException(status_code=404, detail="Day not found")
 
+    working_graphic_id = db_day.working_graphic_id
+
     if day.time_in is None and day.time_out is None:
         await db.delete(db_day)
         await db.commit()
+        invalidate_schedule(working_graphic_id)
         return {"message": f"Day {day_id} deleted"}
 
     update_data = day.model_dump(exclude_unset=True)
@@ -66,19 +74,27 @@ async def update_day(db: AsyncSession, day_id: int, day: DayUpdate):
         setattr(db_day, key, value)
 
     await db.commit()
+    invalidate_schedule(working_graphic_id)
     await db.refresh(db_day)
     return db_day
 
 
-async def get_working_graphics(db: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(WorkingGraphic).offset(skip).limit(limit))
+async def get_working_graphics(db: AsyncSession, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    query = (
+        select(WorkingGraphic)
+        .options(
+            selectinload(WorkingGraphic.employees).options(*EMPLOYEE_SUMMARY_LOADERS),
+            selectinload(WorkingGraphic.days),
+        )
+        .order_by(WorkingGraphic.id)
+        .limit(limit)
+    )
+    query = query.filter(WorkingGraphic.id > after_id) if after_id is not None else query.offset(skip)
+    result = await db.execute(query)
     working_graphics = result.scalars().all()
 
     formatted_working_graphics = []
     for working_graphic in working_graphics:
-        days_result = await db.execute(select(Day).filter_by(working_graphic_id=working_graphic.id))
-        days = days_result.scalars().all()
-
         formatted_working_graphic = WorkingGraphicResponse(
             id=working_graphic.id,
             name=working_graphic.name,
@@ -91,7 +107,7 @@ async def get_working_graphics(db: AsyncSession, skip: int = 0, limit: int = 10)
                     is_work_day=day.is_work_day,
                     created_at=day.created_at,
                     updated_at=day.updated_at,
-                ) for day in days
+                ) for day in working_graphic.days
             ],
             employees=[
                 {
@@ -120,7 +136,11 @@ async def get_working_graphics(db: AsyncSession, skip: int = 0, limit: int = 10)
 
 
 async def get_working_graphic(db: AsyncSession, working_graphic_id: int):
-    result = await db.execute(select(WorkingGraphic).filter_by(id=working_graphic_id))
+    result = await db.execute(
+        select(WorkingGraphic)
+        .options(selectinload(WorkingGraphic.employees).options(*EMPLOYEE_SUMMARY_LOADERS))
+        .filter_by(id=working_graphic_id)
+    )
     working_graphic = result.scalar_one_or_none()
 
     if not working_graphic:
@@ -168,7 +188,9 @@ async def get_working_graphic(db: AsyncSession, working_graphic_id: int):
 
 
 async def update_working_graphic(db: AsyncSession, working_graphic_id: int, working_graphic: WorkingGraphicUpdate):
-    result = await db.execute(select(WorkingGraphic).filter_by(id=working_graphic_id))
+    result = await db.execute(
+        select(WorkingGraphic).options(selectinload(WorkingGraphic.days)).filter_by(id=working_graphic_id)
+    )
     db_working_graphic = result.scalar_one_or_none()
 
     if not db_working_graphic:
@@ -181,25 +203,27 @@ async def update_working_graphic(db: AsyncSession, working_graphic_id: int, work
         day.working_graphic_id = working_graphic_id
 
     await db.commit()
-    await db.refresh(db_working_graphic)
-    return db_working_graphic
+
+    return await get_working_graphic(db, working_graphic_id)
 
 
 async def delete_working_graphic(db: AsyncSession, working_graphic_id: int):
-    result = await db.execute(select(WorkingGraphic).filter_by(id=working_graphic_id))
+    result = await db.execute(
+        select(WorkingGraphic).options(selectinload(WorkingGraphic.days)).filter_by(id=working_graphic_id)
+    )
     db_working_graphic = result.scalar_one_or_none()
 
     if not db_working_graphic:
         raise HTTPException(status_code=404, detail="Working graphic not found")
 
     await db.execute(update(Employee).filter_by(working_graphic_id=working_graphic_id).values(working_graphic_id=None))
-    await db.commit()
 
     for day in db_working_graphic.days:
         await db.delete(day)
 
     await db.delete(db_working_graphic)
     await db.commit()
+    invalidate_schedule(working_graphic_id)
     return {"message": f"Working graphic {working_graphic_id} deleted"}
 
 
@@ -210,6 +234,8 @@ async def delete_day(db: AsyncSession, day_id: int):
     if not db_day:
         raise HTTPException(status_code=404, detail="Day not found")
 
+    working_graphic_id = db_day.working_graphic_id
     await db.delete(db_day)
     await db.commit()
+    invalidate_schedule(working_graphic_id)
     return {"message": f"Day {day_id} deleted"}
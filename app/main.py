@@ -1,10 +1,17 @@
 from fastapi import FastAPI, Depends
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api import router
-from app.database import create_session
+from app.config import ATTENDANCE_INGEST_MODE
+from app.crud.attendance_ingest import attendance_ingest
+from app.crud.report_cache import get_report_cache_stats
+from app.database import init_db, close_db
+from app.utils.image_variants import shutdown_variant_pool, start_variant_pool
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils.storage_files import StorageFiles
+from app.utils.metrics import MetricsMiddleware
+from app.utils.query_stats import SERVER_TIMING_HEADER, QueryStatsMiddleware
 
 from app.auth.auth import fastapi_users, current_user, auth_backend
 from app.auth.schemas import UserRead, UserCreate
@@ -14,8 +21,15 @@ from app.auth.db import User
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async for db in create_session():
-        yield db
+    await init_db()
+    await start_variant_pool()
+    if ATTENDANCE_INGEST_MODE == "queued":
+        await attendance_ingest.start()
+    yield
+    if attendance_ingest.running:
+        await attendance_ingest.stop()
+    shutdown_variant_pool()
+    await close_db()
 
 main_app = FastAPI(
     title="Employee Management API",
@@ -32,10 +46,13 @@ main_app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, SERVER_TIMING_HEADER],
 )
+main_app.add_middleware(QueryStatsMiddleware)
+main_app.add_middleware(MetricsMiddleware)
 
 main_app.include_router(router)
-main_app.mount("/storage", StaticFiles(directory="app/storage"), name="storage")
+main_app.mount("/storage", StorageFiles(directory="app/storage"), name="storage")
 
 main_app.include_router(
     fastapi_users.get_register_router(UserRead, UserCreate),
@@ -54,4 +71,12 @@ def protected_route(user: User = Depends(current_user)):
     return f"Hello, {user.email}"
 
 
+@main_app.get("/report-cache/stats")
+def report_cache_stats(user: User = Depends(current_user)):
+    """
+    Hit, miss, eviction and invalidation counters of the report cache since startup.
+    """
+    return get_report_cache_stats()
+
+
 
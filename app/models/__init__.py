@@ -5,4 +5,6 @@ from .position import Position
 from .working_graphic import WorkingGraphic, Day
 from .attendance import Attendance
 from .user import User
-from .client import Client, DailyReport
+from .client import Client, ClientEventKey, DailyReport, DailyReportCounter, DailyReportClient
+from .daily_presence import DailyPresence
+from .ingest_checkpoint import IngestCheckpoint
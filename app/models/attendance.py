@@ -1,19 +1,27 @@
 import datetime
+from typing import Optional
 
-from sqlalchemy import ForeignKey, text
+from sqlalchemy import ForeignKey, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from ..database import Base
 
 
 class Attendance(Base):
     __tablename__ = 'attendances'
+    __table_args__ = (
+        Index('ix_attendances_person_id_ts', 'person_id', 'ts'),
+        Index('ix_attendances_camera_id_ts', 'camera_id', 'ts'),
+        Index('ux_attendances_idempotency_key', 'idempotency_key', unique=True),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     person_id: Mapped[int] = mapped_column(ForeignKey('employees.id'))
     file_path: Mapped[str] = mapped_column()
     camera_id: Mapped[int] = mapped_column()
     time: Mapped[str] = mapped_column()
+    ts: Mapped[datetime.datetime] = mapped_column()
     score: Mapped[str] = mapped_column()
+    idempotency_key: Mapped[Optional[str]] = mapped_column()
 
     created_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
     updated_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"), onupdate=text("TIMEZONE('utc', now())"))
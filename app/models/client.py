@@ -1,13 +1,17 @@
 
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import text, JSON
+from sqlalchemy import Index, text, JSON
 import datetime
+from typing import Optional
 
 from ..database import Base
 
 
 class Client(Base):
     __tablename__ = 'clients'
+    __table_args__ = (
+        Index('ix_clients_camera_id_ts', 'camera_id', 'ts'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     gender: Mapped[str] = mapped_column()
@@ -16,14 +20,27 @@ class Client(Base):
     client_status: Mapped[str] = mapped_column()
     camera_id: Mapped[int] = mapped_column()
     time: Mapped[str] = mapped_column()
+    ts: Mapped[datetime.datetime] = mapped_column()
 
     created_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
     updated_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"),
                                                           onupdate=text("TIMEZONE('utc', now())"))
 
 
+class ClientEventKey(Base):
+    __tablename__ = 'client_event_keys'
+
+    key: Mapped[str] = mapped_column(primary_key=True)
+    client_id: Mapped[int] = mapped_column()
+
+    created_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
+
+
 class DailyReport(Base):
     __tablename__ = 'daily_reports'
+    __table_args__ = (
+        Index('ux_daily_reports_date', 'date', unique=True),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     date: Mapped[str] = mapped_column()
@@ -37,4 +54,34 @@ class DailyReport(Base):
     female_percentage: Mapped[float] = mapped_column(default=0.0)
 
     created_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
-    updated_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"), onupdate=text("TIMEZONE('utc', now())"))
\ No newline at end of file
+    updated_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"), onupdate=text("TIMEZONE('utc', now())"))
+
+class DailyReportCounter(Base):
+    __tablename__ = 'daily_report_counters'
+
+    date: Mapped[datetime.date] = mapped_column(primary_key=True)
+    time_slot: Mapped[str] = mapped_column(primary_key=True)
+    gender: Mapped[str] = mapped_column(primary_key=True)
+    age: Mapped[int] = mapped_column(primary_key=True)
+    client_status: Mapped[str] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(default=0)
+
+    created_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
+    updated_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"), onupdate=text("TIMEZONE('utc', now())"))
+
+
+class DailyReportClient(Base):
+    __tablename__ = 'daily_report_clients'
+    __table_args__ = (
+        Index('ix_daily_report_clients_ts', 'ts'),
+    )
+
+    date: Mapped[datetime.date] = mapped_column(primary_key=True)
+    client_id: Mapped[int] = mapped_column(primary_key=True)
+    ts: Mapped[datetime.datetime] = mapped_column()
+    time_slot: Mapped[Optional[str]] = mapped_column()
+    gender: Mapped[Optional[str]] = mapped_column()
+    age: Mapped[Optional[int]] = mapped_column()
+    client_status: Mapped[Optional[str]] = mapped_column()
+
+    created_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
@@ -0,0 +1,23 @@
+import datetime
+
+from sqlalchemy import ForeignKey, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+from ..database import Base
+
+
+class DailyPresence(Base):
+    __tablename__ = 'daily_presence'
+    __table_args__ = (
+        Index('ix_daily_presence_date', 'date'),
+    )
+
+    person_id: Mapped[int] = mapped_column(ForeignKey('employees.id'), primary_key=True)
+    date: Mapped[datetime.date] = mapped_column(primary_key=True)
+    first_ts: Mapped[datetime.datetime] = mapped_column()
+    last_ts: Mapped[datetime.datetime] = mapped_column()
+    punch_count: Mapped[int] = mapped_column(default=0)
+    first_file_path: Mapped[str] = mapped_column()
+    last_file_path: Mapped[str] = mapped_column()
+
+    created_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
+    updated_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"), onupdate=text("TIMEZONE('utc', now())"))
@@ -19,17 +19,17 @@ class Employee(Base):
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column(index=True)
     phone_number: Mapped[str] = mapped_column(index=True)
-    images: Mapped[list["EmployeeImage"]] = relationship(back_populates="employee", lazy="selectin")
+    images: Mapped[list["EmployeeImage"]] = relationship(back_populates="employee", lazy="raise")
 
     position_id: Mapped[int] = mapped_column(ForeignKey('positions.id'))
-    position: Mapped[list["Position"]] = relationship(back_populates="employees", lazy="selectin")
+    position: Mapped[list["Position"]] = relationship(back_populates="employees", lazy="raise")
 
     working_graphic_id: Mapped[Optional[int]] = mapped_column(ForeignKey('working_graphics.id'), nullable=True)
     working_graphic: Mapped[list["WorkingGraphic"]] = relationship(back_populates="employees",
-                                                                   lazy="selectin")
+                                                                   lazy="raise")
 
     filial_id: Mapped[int] = mapped_column(ForeignKey('filials.id'), nullable=True)
-    filial: Mapped[list["Filial"]] = relationship(back_populates="employees", lazy="selectin")
+    filial: Mapped[list["Filial"]] = relationship(back_populates="employees", lazy="raise")
 
     created_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
     updated_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"), onupdate=text("TIMEZONE('utc', now())"))
@@ -16,7 +16,7 @@ class EmployeeImage(Base):
     image_url: Mapped[str] = mapped_column(index=True)
     employee_id: Mapped[int] = mapped_column(ForeignKey("employees.id"))
     device_id: Mapped[int] = mapped_column(default=0)
-    employee: Mapped[list["Employee"]] = relationship(back_populates="images", lazy="selectin")
+    employee: Mapped[list["Employee"]] = relationship(back_populates="images", lazy="raise")
 
     created_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
     updated_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"),
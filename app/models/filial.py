@@ -15,7 +15,7 @@ class Filial(Base):
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column(index=True)
     address: Mapped[str] = mapped_column()
-    employees: Mapped[list["Employee"]] = relationship(back_populates="filial", lazy="selectin")
+    employees: Mapped[list["Employee"]] = relationship(back_populates="filial", lazy="raise")
 
     created_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
     updated_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"),
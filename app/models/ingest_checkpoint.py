@@ -0,0 +1,14 @@
+import datetime
+
+from sqlalchemy import BigInteger, text
+from sqlalchemy.orm import Mapped, mapped_column
+from ..database import Base
+
+
+class IngestCheckpoint(Base):
+    __tablename__ = 'ingest_checkpoints'
+
+    journal: Mapped[str] = mapped_column(primary_key=True)
+    last_seq: Mapped[int] = mapped_column(BigInteger)
+
+    updated_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"), onupdate=text("TIMEZONE('utc', now())"))
@@ -16,7 +16,7 @@ class Position(Base):
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column(index=True)
 
-    employees: Mapped[list["Employee"]] = relationship(back_populates="position", lazy="selectin")
+    employees: Mapped[list["Employee"]] = relationship(back_populates="position", lazy="raise")
 
     created_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
     updated_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"),
@@ -18,7 +18,7 @@ class Day(Base):
     is_work_day: Mapped[bool] = mapped_column()
 
     working_graphic_id: Mapped[int] = mapped_column(ForeignKey("working_graphics.id"))
-    working_graphic: Mapped["WorkingGraphic"] = relationship(back_populates="days", lazy="selectin")
+    working_graphic: Mapped["WorkingGraphic"] = relationship(back_populates="days", lazy="raise")
 
     created_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
     updated_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"),
@@ -30,8 +30,8 @@ class WorkingGraphic(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column()
-    days: Mapped[list["Day"]] = relationship( back_populates="working_graphic", lazy="selectin")
-    employees: Mapped[list["Employee"]] = relationship(back_populates="working_graphic", lazy="selectin")
+    days: Mapped[list["Day"]] = relationship( back_populates="working_graphic", lazy="raise")
+    employees: Mapped[list["Employee"]] = relationship(back_populates="working_graphic", lazy="raise")
 
     created_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
     updated_at: Mapped[datetime.datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"),
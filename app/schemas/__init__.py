@@ -3,5 +3,5 @@ from .employee_image import EmployeeImageBase, EmployeeImageCreate, EmployeeImag
 from .filial import FilialBase, FilialCreate, FilialUpdate
 from .position import PositionBase, PositionCreate, PositionUpdate
 from .working_graphic import WorkingGraphicBase, WorkingGraphicCreate, WorkingGraphicUpdate, WorkingGraphicResponse, DayBase, DayCreate, DayUpdate, DayResponse
-from .attendance import AttendanceBase, AttendanceCreate, AttendanceUpdate, AttendanceResponse, AttendanceDataResponse
+from .attendance import AttendanceBase, AttendanceCreate, AttendanceUpdate, AttendanceResponse, AttendanceDataResponse, AttendanceBulkItem, AttendanceBulkResponse, AttendanceQueuedResponse
 from .client import ClientBase, ClientCreate, ClientResponse, DailyReportResponse, DailyReportCreate, DailyReportBase
@@ -47,6 +47,36 @@ class AttendanceResponse(AttendanceBase):
         validate_assignment = True
 
 
+class AttendanceBulkItem(AttendanceBase):
+    file: str = Field(..., description="The filename of the multipart part holding the attendance image")
+    idempotency_key: Optional[str] = Field(
+        None, min_length=1, max_length=255,
+        description="Identifies retries of the event, derived from the camera, employee, time and image when omitted"
+    )
+
+
+class AttendanceBulkItemResponse(BaseModel):
+    index: int = Field(..., description="The position of the event in the batch")
+    status: str = Field(..., description="created, duplicate or error")
+    id: Optional[int] = Field(None, description="The ID of the created or previously stored attendance")
+    file_path: Optional[str] = Field(None, description="The path to the attendance image")
+    detail: Optional[str] = Field(None, description="Why the event was rejected")
+
+
+class AttendanceBulkResponse(BaseModel):
+    total: int
+    created: int
+    duplicates: int
+    failed: int
+    items: List[AttendanceBulkItemResponse]
+
+
+class AttendanceQueuedResponse(AttendanceBase):
+    seq: int = Field(..., description="The position of the attendance in the ingest journal")
+    status: str = Field("queued", description="Always queued, the attendance is stored shortly after")
+    file_path: str = Field(..., description="The path to the attendance image")
+
+
 class Image(BaseModel):
     id: int
     url: str
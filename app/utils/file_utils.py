@@ -1,15 +1,165 @@
+import hashlib
 import os
-from fastapi import UploadFile
+import tempfile
+import threading
+import time
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
+from typing import Optional
+
+from app.config import MAX_UPLOAD_SIZE
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 IMAGE_DIR = BASE_DIR / "storage" / "users"
+BLOB_DIR = BASE_DIR / "storage" / "blobs"
+BLOB_URL = "/storage/blobs"
+TEMP_PREFIX = ".upload-"
+
+CHUNK_SIZE = 1024 * 1024
+
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+    (b"BM", ".bmp"),
+)
+
+
+class WriteMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files = 0
+        self.bytes = 0
+        self.rejected = 0
+        self.deduplicated = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, size: int, seconds: float):
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+            self.seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def deduplicate(self):
+        with self._lock:
+            self.deduplicated += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "files": self.files,
+                "bytes": self.bytes,
+                "rejected": self.rejected,
+                "deduplicated": self.deduplicated,
+                "seconds": self.seconds,
+                "max_seconds": self.max_seconds,
+                "mean_seconds": self.seconds / self.files if self.files else 0.0,
+            }
+
+
+upload_write_metrics = WriteMetrics()
+
+
+def upload_too_large() -> HTTPException:
+    upload_write_metrics.reject()
+    return HTTPException(status_code=413, detail=f"File is larger than {MAX_UPLOAD_SIZE} bytes")
+
+
+def sniff_extension(head: bytes) -> str:
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return ".bin"
+
+
+def blob_name(digest: str, extension: str) -> str:
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def touch_blob(location: Path) -> bool:
+    # a fresh mtime keeps a reused blob out of reach of collect_blobs until its new reference is committed
+    try:
+        os.utime(location)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def check_upload_size(upload_file: UploadFile):
+    if upload_file.size is not None and upload_file.size > MAX_UPLOAD_SIZE:
+        raise upload_too_large()
+
+
+def write_upload_blob(upload_file: UploadFile, digest: Optional[str]) -> str:
+    started = time.perf_counter()
+    upload_file.file.seek(0)
+    extension = sniff_extension(upload_file.file.read(16))
+    upload_file.file.seek(0)
+
+    if digest is not None and touch_blob(BLOB_DIR / blob_name(digest, extension)):
+        upload_write_metrics.deduplicate()
+        return blob_name(digest, extension)
+
+    BLOB_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=BLOB_DIR, prefix=TEMP_PREFIX)
+    content_hash = hashlib.sha256()
+    size = 0
+    try:
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := upload_file.file.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise upload_too_large()
+                content_hash.update(chunk)
+                buffer.write(chunk)
+
+        name = blob_name(content_hash.hexdigest(), extension)
+        if touch_blob(BLOB_DIR / name):
+            os.unlink(tmp_path)
+            upload_write_metrics.deduplicate()
+            return name
+
+        (BLOB_DIR / name).parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, BLOB_DIR / name)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    upload_write_metrics.observe(size, time.perf_counter() - started)
+    return name
+
+
+def digest_upload_file(upload_file: UploadFile) -> str:
+    digest = hashlib.sha256()
+    upload_file.file.seek(0)
+    while chunk := upload_file.file.read(CHUNK_SIZE):
+        digest.update(chunk)
+    upload_file.file.seek(0)
+    return digest.hexdigest()
+
+
+async def hash_upload_file(upload_file: UploadFile) -> str:
+    check_upload_size(upload_file)
+    return await run_in_threadpool(digest_upload_file, upload_file)
 
 
-def save_upload_file(upload_file: UploadFile, employee_id: int, img_type: str) -> str:
-    employee_dir = IMAGE_DIR / str(employee_id) / img_type
-    employee_dir.mkdir(parents=True, exist_ok=True)
-    file_location = employee_dir / upload_file.filename
-    with open(file_location, "wb") as buffer:
-        buffer.write(upload_file.file.read())
-    return upload_file.filename
+async def save_upload_file(upload_file: UploadFile, digest: Optional[str] = None) -> str:
+    """
+    Store an upload in the content-addressed blob store and return its URL path. Identical
+    images share one file, so a known ``digest`` lets an existing blob be reused without a write.
+    """
+    check_upload_size(upload_file)
+    name = await run_in_threadpool(write_upload_blob, upload_file, digest)
+    return f"{BLOB_URL}/{name}"
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Iterable, Optional
+
+from PIL import Image, ImageOps
+
+from app.config import BASE_URL, IMAGE_VARIANT_FORMAT, THUMBNAIL_SIZE, THUMBNAIL_WORKERS
+from app.utils.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# resolved here rather than imported from file_utils: workers import this module on start
+# and should not pay for loading FastAPI
+STORAGE_DIR = Path(__file__).resolve().parent.parent / "storage"
+STORAGE_URL = "/storage/"
+VARIANT_DIR = STORAGE_DIR / "variants"
+
+VARIANT_SIZES = {"thumbnail": THUMBNAIL_SIZE}
+VARIANT_FORMATS = {
+    "webp": (".webp", "WEBP", {"quality": 80, "method": 4}),
+    "jpeg": (".jpg", "JPEG", {"quality": 80, "optimize": True, "progressive": True}),
+}
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
+
+variants_rendered = Counter("image_variants_rendered_total", "Downscaled image variants written.")
+variant_failures = Counter("image_variant_failures_total", "Images whose variants could not be rendered.")
+variant_render_seconds = Histogram(
+    "image_variant_render_seconds", "Time from scheduling the variants of an image to having them on disk."
+)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending: set[asyncio.Task] = set()
+
+
+def storage_location(url: str) -> Path:
+    return STORAGE_DIR / url.removeprefix(STORAGE_URL)
+
+
+def variant_url(url: str, variant: str) -> str:
+    extension = VARIANT_FORMATS[IMAGE_VARIANT_FORMAT][0]
+    return f"{STORAGE_URL}variants/{variant}/{os.path.splitext(url.removeprefix(STORAGE_URL))[0]}{extension}"
+
+
+def missing_variants(url: str, force: bool = False) -> list[tuple[str, int]]:
+    if os.path.splitext(url)[1].lower() not in IMAGE_EXTENSIONS:
+        return []
+    return [
+        (str(storage_location(variant_url(url, variant))), size)
+        for variant, size in VARIANT_SIZES.items()
+        if force or not storage_location(variant_url(url, variant)).exists()
+    ]
+
+
+def render_variants(source: str, targets: list[tuple[str, int]]) -> int:
+    """
+    Write downscaled copies of ``source``, largest first. Runs in a worker process, so
+    decoding and resizing camera frames never holds up the event loop.
+    """
+    _, image_format, options = VARIANT_FORMATS[IMAGE_VARIANT_FORMAT]
+    largest = max(size for _, size in targets)
+
+    with Image.open(source) as image:
+        # JPEG decodes straight to a reduced scale, far cheaper than resizing the full frame
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        for target, size in sorted(targets, key=lambda item: item[1], reverse=True):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            Path(target).parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=Path(target).parent, prefix=".variant-")
+            try:
+                os.fchmod(fd, 0o644)
+                with os.fdopen(fd, "wb") as buffer:
+                    image.save(buffer, image_format, **options)
+                os.replace(tmp_path, target)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    return len(targets)
+
+
+def lower_priority():
+    # rendering is background work, request handling keeps the CPU when both want it
+    os.nice(10)
+
+
+def get_variant_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(THUMBNAIL_WORKERS, mp_context=get_context("spawn"), initializer=lower_priority)
+    return _pool
+
+
+async def start_variant_pool():
+    # spawned workers import the application on start, which should not overlap the first burst of uploads
+    loop = asyncio.get_running_loop()
+    pool = get_variant_pool()
+    await asyncio.gather(*(loop.run_in_executor(pool, os.getpid) for _ in range(THUMBNAIL_WORKERS)))
+
+
+async def render_image_variants(url: str):
+    targets = missing_variants(url)
+    if not targets:
+        return
+
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        rendered = await loop.run_in_executor(get_variant_pool(), render_variants, str(storage_location(url)), targets)
+    except Exception as e:
+        logger.warning(f"Could not render the variants of {url}: {e}")
+        variant_failures.inc()
+        if isinstance(e, BrokenProcessPool):
+            # a worker died (e.g. killed while decoding a huge frame), the next image gets a fresh pool
+            shutdown_variant_pool()
+        return
+
+    variants_rendered.inc(rendered)
+    variant_render_seconds.observe(time.perf_counter() - started)
+
+
+def schedule_image_variants(urls: Iterable[str]):
+    for url in set(urls):
+        task = asyncio.create_task(render_image_variants(url))
+        _pending.add(task)
+        task.add_done_callback(_pending.discard)
+
+
+def pending_variant_renders() -> int:
+    return len(_pending)
+
+
+def shutdown_variant_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def variant_source(path: str) -> Optional[str]:
+    """
+    Storage path of the image a ``variants/<variant>/...`` path is rendered from, or None when
+    the variant is unknown or the image does not exist. Lists one directory, so keep it off the
+    event loop.
+    """
+    variant, _, stem = path.removeprefix("variants/").partition("/")
+    if variant not in VARIANT_SIZES or not stem:
+        return None
+
+    directory, name = os.path.split(os.path.splitext(stem)[0])
+    location = (STORAGE_DIR / directory).resolve()
+    if not location.is_relative_to(STORAGE_DIR) or location.is_relative_to(VARIANT_DIR):
+        return None
+    try:
+        entries = os.listdir(location)
+    except OSError:
+        return None
+    for entry in sorted(entries):
+        entry_name, extension = os.path.splitext(entry)
+        if entry_name == name and extension.lower() in IMAGE_EXTENSIONS:
+            return os.path.join(directory, entry)
+    return None
+
+
+def thumbnail_url(url: Optional[str]) -> Optional[str]:
+    """
+    Public URL of the thumbnail of a stored image. A thumbnail that has not been rendered yet
+    is rendered when it is first requested, see ``StorageFiles``.
+    """
+    if not url:
+        return None
+    if os.path.splitext(url)[1].lower() not in IMAGE_EXTENSIONS:
+        return f"{BASE_URL}{url}"
+    return f"{BASE_URL}{variant_url(url, 'thumbnail')}"
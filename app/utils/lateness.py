@@ -0,0 +1,150 @@
+from datetime import date, time
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+ON_TIME = 0
+LATE = 1
+DAY_OFF = 2
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+NO_SHIFT = -1
+MICROSECONDS_PER_MINUTE = 60 * 1_000_000
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class PunchEvaluation(NamedTuple):
+    status: np.ndarray
+    minutes_late: np.ndarray
+    minutes_early: np.ndarray
+
+
+class MonthEvaluation(NamedTuple):
+    days: np.ndarray
+    on_time: np.ndarray
+    late: np.ndarray
+    did_not_come: np.ndarray
+
+
+def time_to_microseconds(value: Optional[time]) -> int:
+    if value is None:
+        return NO_SHIFT
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1_000_000 + value.microsecond
+
+
+def weekday_index(days: np.ndarray) -> np.ndarray:
+    # 1970-01-01 was a Thursday
+    return (days.astype("datetime64[D]").astype(np.int64) + 3) % 7
+
+
+def to_datetime64(values) -> np.ndarray:
+    if isinstance(values, np.ndarray):
+        return values.astype("datetime64[us]").reshape(-1)
+
+    # numpy converts datetime objects one by one through a slow generic path
+    return np.fromiter(
+        (
+            ((value.toordinal() - EPOCH_ORDINAL) * 86400 + value.hour * 3600 + value.minute * 60 + value.second)
+            * 1_000_000 + value.microsecond
+            for value in values
+        ),
+        dtype=np.int64,
+    ).view("datetime64[us]")
+
+
+class ScheduleTable:
+    """
+    Shift start per working graphic and weekday, in microseconds since midnight.
+
+    Built from ``{working_graphic_id: {weekday: (time_in, time_out)}}`` as returned by
+    ``get_weekly_schedules``. The extra last row has no shifts and stands for employees
+    without a working graphic.
+    """
+
+    def __init__(self, weekly_schedules: dict):
+        self.ids = np.array(sorted(weekly_schedules), dtype=np.int64)
+        self.time_in = np.full((len(self.ids) + 1, 7), NO_SHIFT, dtype=np.int64)
+
+        for row, working_graphic_id in enumerate(self.ids.tolist()):
+            for weekday, (time_in, time_out) in weekly_schedules[working_graphic_id].items():
+                if weekday in WEEKDAYS:
+                    self.time_in[row, WEEKDAYS.index(weekday)] = time_to_microseconds(time_in)
+
+    def rows(self, working_graphic_ids) -> np.ndarray:
+        working_graphic_ids = np.array(
+            [NO_SHIFT if working_graphic_id is None else working_graphic_id for working_graphic_id in working_graphic_ids],
+            dtype=np.int64,
+        )
+        rows = np.searchsorted(self.ids, working_graphic_ids)
+        found = rows < len(self.ids)
+        found[found] = self.ids[rows[found]] == working_graphic_ids[found]
+        return np.where(found, rows, len(self.ids))
+
+    def shift_starts(self, rows: np.ndarray, days: np.ndarray) -> np.ndarray:
+        return self.time_in[rows, weekday_index(days)]
+
+
+def classify(table: ScheduleTable, rows: np.ndarray, punches: np.ndarray) -> PunchEvaluation:
+    days = punches.astype("datetime64[D]")
+    time_in = table.shift_starts(rows, days)
+    since_midnight = (punches - days).astype(np.int64)
+
+    scheduled = time_in != NO_SHIFT
+    late = scheduled & (since_midnight > time_in)
+
+    return PunchEvaluation(
+        status=np.where(scheduled, np.where(late, LATE, ON_TIME), DAY_OFF),
+        minutes_late=np.where(late, np.floor_divide(since_midnight - time_in, MICROSECONDS_PER_MINUTE), 0),
+        minutes_early=np.where(
+            scheduled & ~late, np.floor_divide(time_in - since_midnight, MICROSECONDS_PER_MINUTE), 0
+        ),
+    )
+
+
+def evaluate_punches(table: ScheduleTable, working_graphic_ids, first_ts) -> PunchEvaluation:
+    """
+    Classify first punches against the shift of their own weekday.
+
+    Minutes are floored like ``timedelta.total_seconds() // 60``: ``minutes_late`` is set for late
+    punches and ``minutes_early`` for on-time ones. Punches on a day without a shift are DAY_OFF.
+    """
+    return classify(table, table.rows(working_graphic_ids), to_datetime64(first_ts))
+
+
+def evaluate_month(table: ScheduleTable, employee_ids, working_graphic_ids, start: date, end: date,
+                   punch_person_ids, punch_first_ts) -> MonthEvaluation:
+    """
+    Count on-time, late and absent employees for every day in ``[start, end)`` at once.
+
+    ``punch_first_ts`` may be datetimes or an array of microseconds since the epoch, which
+    skips converting each datetime in Python.
+
+    An employee is expected on a day when their working graphic has a shift on its weekday.
+    Punches on days off, outside the range or by other employees are ignored.
+    """
+    days = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D"))
+    employee_ids = np.array(employee_ids, dtype=np.int64)
+    rows = table.rows(working_graphic_ids)
+
+    expected = table.time_in[rows[:, None], weekday_index(days)[None, :]] != NO_SHIFT
+    status = np.full(expected.shape, DAY_OFF, dtype=np.int64)
+
+    punches = to_datetime64(punch_first_ts)
+    punch_person_ids = np.array(punch_person_ids, dtype=np.int64).reshape(-1)
+    if len(punches) and len(employee_ids) and len(days):
+        order = np.argsort(employee_ids)
+        positions = np.searchsorted(employee_ids, punch_person_ids, sorter=order)
+        employee_rows = order[np.minimum(positions, len(employee_ids) - 1)]
+        columns = (punches.astype("datetime64[D]") - days[0]).astype(np.int64)
+        known = (employee_ids[employee_rows] == punch_person_ids) & (columns >= 0) & (columns < len(days))
+
+        employee_rows = employee_rows[known]
+        status[employee_rows, columns[known]] = classify(table, rows[employee_rows], punches[known]).status
+
+    return MonthEvaluation(
+        days=days,
+        on_time=(expected & (status == ON_TIME)).sum(axis=0),
+        late=(expected & (status == LATE)).sum(axis=0),
+        did_not_come=(expected & (status == DAY_OFF)).sum(axis=0),
+    )
@@ -0,0 +1,183 @@
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels.items()) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: dict[tuple, float] = {}
+        registry.register(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{format_labels(dict(zip(self.labelnames, key)))} {format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._lock = threading.Lock()
+        self._values: dict[tuple, list] = {}
+        registry.register(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.setdefault(key, [[0] * len(self.buckets), 0.0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key][1] = total + value
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+
+        lines = []
+        for key, (counts, total) in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels({**labels, 'le': format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    A gauge or counter read from existing state at scrape time.
+
+    ``collect`` returns ``(labels, value)`` pairs, so figures other modules already keep, such as
+    pool sizes and cache counters, are exposed without being tracked twice.
+    """
+
+    def __init__(self, name: str, documentation: str, metric_type: str,
+                 collect: Callable[[], Iterable[tuple[dict, float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.type = metric_type
+        self.collect = collect
+        registry.register(self)
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{format_labels(labels)} {format_value(value)}" for labels, value in self.collect()]
+
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Time spent answering HTTP requests.", ("method", "route", "status")
+)
+attendance_events = Counter(
+    "attendance_events_total", "Attendance events stored, by camera.", ("camera_id",)
+)
+client_events = Counter(
+    "client_events_total", "Client sightings stored, by camera.", ("camera_id",)
+)
+duplicate_events = Counter(
+    "duplicate_events_total", "Retried events recognised as already stored, by where they were caught.",
+    ("kind", "source")
+)
+
+
+def route_label(scope) -> Optional[str]:
+    route = scope.get("route")
+    if route is None and "endpoint" in scope:
+        # mounted apps such as /storage set no route, label them by their mount path
+        return scope.get("root_path")
+    return getattr(route, "path", None)
+
+
+class MetricsMiddleware:
+    """
+    Observe the latency of every request under its route template, e.g.
+    ``/attendance/commers/{filial_id}/{date}``, so path parameters do not split the series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_latency.observe(
+                time.perf_counter() - started_at,
+                method=scope["method"],
+                route=route_label(scope) or "unmatched",
+                status=status_code,
+            )
@@ -0,0 +1,36 @@
+import base64
+import binascii
+import json
+from typing import Optional
+
+from fastapi import HTTPException, Response
+
+MAX_PAGE_SIZE = 100
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def clamp_page_size(limit: int) -> int:
+    return max(0, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([last_id]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if cursor is None:
+        return None
+
+    try:
+        (last_id,) = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(last_id, int):
+            raise ValueError(last_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return last_id
+
+
+def set_next_cursor(response: Response, ids: list[int], limit: int):
+    if limit and len(ids) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(ids[-1])
@@ -0,0 +1,122 @@
+import json
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+
+from ..config import SLOW_REQUEST_MS
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_HEADER = "Server-Timing"
+MAX_LOGGED_STATEMENT_LENGTH = 2000
+
+
+class QueryStats:
+    __slots__ = ("statements", "duration", "slowest_duration", "slowest_statement")
+
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+        self.slowest_duration = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, duration: float):
+        self.statements += 1
+        self.duration += duration
+        if duration >= self.slowest_duration:
+            self.slowest_duration = duration
+            self.slowest_statement = statement
+
+    def server_timing(self, elapsed: float) -> str:
+        return (
+            f'db;dur={self.duration * 1000:.1f};desc="{self.statements} statements", '
+            f"db-slowest;dur={self.slowest_duration * 1000:.1f}, "
+            f"app;dur={elapsed * 1000:.1f}"
+        )
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info["query_started_at"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started_at)
+
+
+def handle_error(exception_context):
+    started_at = exception_context.connection.info.get("query_started_at") if exception_context.connection else None
+    if started_at:
+        started_at.pop()
+
+
+def track_queries(engine: AsyncEngine):
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", handle_error)
+
+
+class QueryStatsMiddleware:
+    """
+    Count the SQL statements of each request and time them.
+
+    The totals known when the response starts go out in a ``Server-Timing`` header. Once the
+    request is done, including streamed bodies and background tasks, a JSON log line records
+    them, and requests slower than ``SLOW_REQUEST_MS`` are logged as warnings with their
+    slowest statement.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(SERVER_TIMING_HEADER, stats.server_timing(time.perf_counter() - started_at))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            log_request(scope, status_code, stats, time.perf_counter() - started_at)
+
+
+def log_request(scope, status_code: int, stats: QueryStats, elapsed: float):
+    record = {
+        "method": scope["method"],
+        "path": scope["path"],
+        "status": status_code,
+        "duration_ms": round(elapsed * 1000, 1),
+        "db_statements": stats.statements,
+        "db_duration_ms": round(stats.duration * 1000, 1),
+        "db_slowest_ms": round(stats.slowest_duration * 1000, 1),
+    }
+
+    if elapsed * 1000 >= SLOW_REQUEST_MS:
+        record["slowest_statement"] = (stats.slowest_statement or "")[:MAX_LOGGED_STATEMENT_LENGTH]
+        logger.warning(f"slow request {json.dumps(record)}")
+    else:
+        logger.info(f"request {json.dumps(record)}")
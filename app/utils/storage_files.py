@@ -0,0 +1,191 @@
+import hashlib
+import os
+import re
+from email.utils import parsedate
+from functools import lru_cache
+from typing import Optional
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from app.utils.file_utils import CHUNK_SIZE
+from app.utils.image_variants import STORAGE_URL, render_image_variants, variant_source
+from app.utils.metrics import Counter
+
+# blobs are named after the digest of their content and never change, variants are only
+# re-rendered by an explicit backfill --force, files under users/ may be overwritten
+CACHE_CONTROL = {
+    "blobs": "public, max-age=31536000, immutable",
+    "variants": "public, max-age=86400",
+}
+DEFAULT_CACHE_CONTROL = "no-cache"
+PREFIXES = {"blobs", "variants", "users"}
+BLOB_NAME = re.compile(r"[0-9a-f]{64}")
+ETAG_CACHE_SIZE = 4096
+
+storage_responses = Counter(
+    "storage_responses_total", "Responses served from /storage, by prefix and status.", ("prefix", "status")
+)
+storage_sent_bytes = Counter(
+    "storage_sent_bytes_total", "File bytes sent from /storage, by prefix.", ("prefix",)
+)
+storage_saved_bytes = Counter(
+    "storage_saved_bytes_total", "File bytes not sent because the client's copy was still valid, by prefix.",
+    ("prefix",)
+)
+
+
+@lru_cache(maxsize=ETAG_CACHE_SIZE)
+def content_etag(path: str, mtime_ns: int, size: int) -> str:
+    # mtime and size are only part of the cache key, a rewritten file is hashed again
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()}"'
+
+
+def storage_prefix(path: str) -> str:
+    prefix = path.split("/", 1)[0]
+    return prefix if prefix in PREFIXES else "other"
+
+
+def is_not_modified(response_headers: Headers, request_headers: Headers) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        # weak comparison, and If-Modified-Since is ignored when If-None-Match is sent
+        etag = response_headers["etag"]
+        return any(tag.strip() in ("*", etag, f"W/{etag}") for tag in if_none_match.split(","))
+
+    if_modified_since = parsedate(request_headers.get("if-modified-since", ""))
+    return if_modified_since is not None and if_modified_since >= parsedate(response_headers["last-modified"])
+
+
+def requested_range(request_headers: Headers, response_headers: Headers, size: int) -> Optional[tuple[int, int]]:
+    """
+    The first and last byte asked for by a single-range ``Range`` header, or None to send the whole
+    file. Several ranges, malformed headers and stale ``If-Range`` validators get the whole file.
+    """
+    value = request_headers.get("range", "")
+    if not value.startswith("bytes="):
+        return None
+    if_range = request_headers.get("if-range")
+    if if_range is not None and if_range not in (response_headers["etag"], response_headers["last-modified"]):
+        return None
+
+    spec = value.removeprefix("bytes=").strip()
+    if "," in spec:
+        return None
+    start, _, end = spec.partition("-")
+    try:
+        if not start:
+            suffix = int(end)
+            return (max(size - suffix, 0), size - 1) if suffix > 0 else (size, size - 1)
+        return int(start), min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+
+
+class StorageFileResponse(FileResponse):
+    """
+    A stored file with a strong ETag, Cache-Control by storage prefix, conditional requests and
+    single byte ranges. Whole files still go out through ``http.response.pathsend`` where the
+    server supports it.
+    """
+
+    def __init__(self, path: str, stat_result: os.stat_result, prefix: str, etag: Optional[str] = None,
+                 cache_control: Optional[str] = None):
+        headers = {
+            "cache-control": cache_control or CACHE_CONTROL.get(prefix, DEFAULT_CACHE_CONTROL),
+            "accept-ranges": "bytes",
+        }
+        if etag:
+            headers["etag"] = etag
+        super().__init__(path, stat_result=stat_result, headers=headers)
+        self.prefix = prefix
+        self.content_etag = etag is not None
+
+    async def __call__(self, scope, receive, send):
+        size = self.stat_result.st_size
+        if not self.content_etag:
+            self.headers["etag"] = await anyio.to_thread.run_sync(
+                content_etag, str(self.path), self.stat_result.st_mtime_ns, size
+            )
+
+        request_headers = Headers(scope=scope)
+        if is_not_modified(self.headers, request_headers):
+            storage_responses.inc(prefix=self.prefix, status=304)
+            storage_saved_bytes.inc(size, prefix=self.prefix)
+            await NotModifiedResponse(self.headers)(scope, receive, send)
+            return
+
+        byte_range = requested_range(request_headers, self.headers, size) if scope["method"] == "GET" else None
+        if byte_range is None:
+            storage_responses.inc(prefix=self.prefix, status=self.status_code)
+            storage_sent_bytes.inc(size if scope["method"] == "GET" else 0, prefix=self.prefix)
+            await super().__call__(scope, receive, send)
+            return
+
+        start, end = byte_range
+        if start >= size or start > end:
+            storage_responses.inc(prefix=self.prefix, status=416)
+            await Response(status_code=416, headers={"content-range": f"bytes */{size}"})(scope, receive, send)
+            return
+
+        length = end - start + 1
+        self.status_code = 206
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(length)
+        storage_responses.inc(prefix=self.prefix, status=206)
+        storage_sent_bytes.inc(length, prefix=self.prefix)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(start)
+            more_body = True
+            while more_body:
+                chunk = await file.read(min(self.chunk_size, length))
+                length -= len(chunk)
+                more_body = length > 0 and bool(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+class StorageFiles(StaticFiles):
+    """
+    Serve app/storage. Blob URLs carry the sha256 of their content, so their ETag needs no I/O;
+    other files are hashed once per modification. A variant that is not on disk yet is rendered
+    on first request, or stood in for by its source image when rendering fails.
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as e:
+            if e.status_code != 404 or storage_prefix(path) != "variants":
+                raise
+
+        source = await anyio.to_thread.run_sync(variant_source, path)
+        if source is None:
+            raise HTTPException(status_code=404)
+
+        await render_image_variants(f"{STORAGE_URL}{source}")
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, source)
+        if stat_result is None:
+            raise HTTPException(status_code=404)
+        # the variant URL will serve the thumbnail once it renders, so the source is not cached
+        return StorageFileResponse(full_path, stat_result, "variants", cache_control=DEFAULT_CACHE_CONTROL)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        path = self.get_path(scope)
+        prefix = storage_prefix(path)
+        name = os.path.splitext(os.path.basename(path))[0]
+        etag = f'"{name}"' if prefix == "blobs" and BLOB_NAME.fullmatch(name) else None
+        return StorageFileResponse(full_path, stat_result, prefix, etag)
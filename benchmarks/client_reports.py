@@ -0,0 +1,167 @@
+"""
+Post clients concurrently through the ASGI app and check that the daily report
+counters and the range report account for every one of them. Then drive
+store_daily_report directly from concurrent sessions at --rate upserts per second,
+all on two counter rows, and check that no increment is lost. The rate actually
+reached is printed; a host that cannot reach --rate only verifies that lower bound.
+
+    python -m benchmarks.client_reports --clients 2000 --concurrency 20 --upserts 5000 --rate 500
+
+The run uses client ids starting at --first-id on --date and --upsert-date and removes
+its own rows for that id range and those dates before posting.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+import httpx
+from sqlalchemy import delete, event, func
+from sqlalchemy.future import select
+
+from app.auth.auth import current_user
+from app.crud.client import store_daily_report
+from app.database import engine, SessionLocal
+from app.main import main_app
+from app.models import Client, ClientEventKey, DailyReportCounter, DailyReportClient
+from app.schemas import ClientCreate
+
+
+class BenchmarkUser:
+    id = 0
+    email = "benchmark@localhost"
+
+
+async def reset(first_id: int, clients: int, report_date):
+    async with SessionLocal() as db:
+        await db.execute(delete(Client).filter(Client.id.between(first_id, first_id + clients - 1)))
+        await db.execute(delete(ClientEventKey).filter(ClientEventKey.client_id.between(first_id, first_id + clients - 1)))
+        await db.execute(delete(DailyReportCounter).filter_by(date=report_date))
+        await db.execute(delete(DailyReportClient).filter_by(date=report_date))
+        await db.commit()
+
+
+async def count_reports(report_date):
+    async with SessionLocal() as db:
+        counted = (await db.execute(
+            select(func.coalesce(func.sum(DailyReportCounter.count), 0)).filter_by(date=report_date)
+        )).scalar()
+        members = (await db.execute(
+            select(func.count()).select_from(DailyReportClient).filter_by(date=report_date)
+        )).scalar()
+    return counted, members
+
+
+async def run_upserts(upserts: int, rate: int, concurrency: int, first_id: int, date: str):
+    report_date = datetime.strptime(date, "%Y-%m-%d").date()
+    await reset(first_id, upserts, report_date)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    async def store(n: int):
+        # open loop: upsert n is due at n / rate whether or not the earlier ones have finished
+        await asyncio.sleep(max(0.0, started + n / rate - time.perf_counter()))
+        async with semaphore:
+            async with SessionLocal() as db:
+                await store_daily_report(db, date, ClientCreate(
+                    id=first_id + n,
+                    gender="male" if n % 2 else "female",
+                    camera_id=1,
+                    score="0.9",
+                    age=30,
+                    client_status="new",
+                    time=f"{date} 12:00:00",
+                ))
+
+    await asyncio.gather(*(store(n) for n in range(upserts)))
+    achieved = upserts / (time.perf_counter() - started)
+    counted, members = await count_reports(report_date)
+
+    print(f"store_daily_report upserts={upserts} rate={rate}/s concurrency={concurrency}")
+    print(f"  achieved:   {achieved:.0f} upserts/s")
+    print(f"  counted:    {counted} (members {members})")
+    if counted != upserts or members != upserts:
+        raise SystemExit(f"lost increments: expected {upserts}")
+    # the open loop cannot outrun the host, so the check only covers the rate it reached
+    if achieved < rate * 0.95:
+        print(f"  no increments lost up to {achieved:.0f} upserts/s, the host could not reach {rate}/s")
+    else:
+        print(f"  no increments lost at {rate} upserts/s")
+
+
+async def run(clients: int, concurrency: int, first_id: int, date: str):
+    report_date = datetime.strptime(date, "%Y-%m-%d").date()
+    await reset(first_id, clients, report_date)
+
+    main_app.dependency_overrides[current_user] = lambda: BenchmarkUser()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(client, n: int):
+        async with semaphore:
+            response = await client.post("/clients/", json={
+                "id": first_id + n,
+                "gender": "male" if n % 2 else "female",
+                "camera_id": 1,
+                "score": "0.9",
+                "age": 18 + n % 50,
+                "client_status": "new",
+                "time": f"{date} {n // 60 % 24:02}:{n % 60:02}:00",
+            })
+            response.raise_for_status()
+
+    transport = httpx.ASGITransport(app=main_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(post(client, n) for n in range(clients)))
+        elapsed = time.perf_counter() - started
+
+        statements = 0
+
+        def count_statement(*args):
+            nonlocal statements
+            statements += 1
+
+        event.listen(engine.sync_engine, "after_cursor_execute", count_statement)
+        started = time.perf_counter()
+        response = await client.get("/clients/reports", params={
+            "start_datetime": f"{date} 00:00", "end_datetime": f"{date} 23:59",
+        })
+        range_elapsed = time.perf_counter() - started
+        event.remove(engine.sync_engine, "after_cursor_execute", count_statement)
+        response.raise_for_status()
+        range_clients = len(response.json()["clients"])
+
+    counted, members = await count_reports(report_date)
+
+    print(f"POST /clients/ clients={clients} concurrency={concurrency}")
+    print(f"  throughput: {clients / elapsed:.0f} posts/s")
+    print(f"  counted:    {counted} (members {members})")
+    print(f"GET /clients/reports range: {range_clients} clients, {statements} statements, {range_elapsed * 1000:.0f} ms")
+    if counted != clients or members != clients:
+        raise SystemExit(f"lost increments: expected {clients}")
+    if range_clients != clients:
+        raise SystemExit(f"range report lost clients: expected {clients}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--first-id", type=int, default=900_000_000)
+    parser.add_argument("--date", default="2000-01-01")
+    parser.add_argument("--upserts", type=int, default=5000)
+    parser.add_argument("--rate", type=int, default=500)
+    parser.add_argument("--upsert-date", default="2000-01-02")
+    args = parser.parse_args()
+
+    async def run_all():
+        await run(args.clients, args.concurrency, args.first_id, args.date)
+        await run_upserts(args.upserts, args.rate, args.concurrency, args.first_id, args.upsert_date)
+        await engine.dispose()
+
+    asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Time get_commers_by_filial against the database configured in .env.
+
+    python -m benchmarks.commers --filial 1 --date 2024-09-03 --repeat 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import event
+
+from app.crud.attendance import get_commers_by_filial
+from app.database import engine, SessionLocal
+
+
+async def run(filial_id: int, date: str, repeat: int):
+    statements = 0
+
+    def count_statement(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+
+    timings = []
+    for _ in range(repeat):
+        statements = 0
+        async with SessionLocal() as db:
+            started = time.perf_counter()
+            await get_commers_by_filial(db, date, filial_id)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+    await engine.dispose()
+
+    timings.sort()
+    print(f"get_commers_by_filial filial={filial_id} date={date} repeat={repeat}")
+    print(f"  statements per call: {statements}")
+    print(f"  mean: {statistics.mean(timings):.1f} ms")
+    print(f"  p50:  {timings[len(timings) // 2]:.1f} ms")
+    print(f"  max:  {timings[-1]:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filial", type=int, required=True)
+    parser.add_argument("--date", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.filial, args.date, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
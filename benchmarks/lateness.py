@@ -0,0 +1,317 @@
+"""
+Check the vectorized lateness evaluation against a per-row Python reference on a
+synthetic filial-month, and time both. Before that, pin it to the classification the
+reports used before the engine, on the cases where that behaviour is kept and on each
+case where it intentionally differs. Any mismatch exits non-zero.
+
+    python -m benchmarks.lateness --employees 2000 --graphics 20
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta, time as time_type
+
+import numpy as np
+
+from app.utils.lateness import ScheduleTable, WEEKDAYS, evaluate_month, evaluate_punches, to_datetime64, LATE, ON_TIME, \
+    DAY_OFF
+
+
+def make_month(employees: int, graphics: int, seed: int):
+    rng = random.Random(seed)
+    start = date(2024, 9, 1)
+    end = date(2024, 10, 1)
+
+    weekly_schedules = {}
+    for working_graphic_id in range(1, graphics + 1):
+        weekly_schedules[working_graphic_id] = {
+            weekday: (time_type(rng.randint(7, 10), rng.choice([0, 15, 30, 45])), time_type(18))
+            for weekday in WEEKDAYS if rng.random() < 0.8
+        }
+
+    employee_ids = list(range(1, employees + 1))
+    working_graphic_ids = [None if rng.random() < 0.05 else rng.randint(1, graphics) for _ in employee_ids]
+
+    punch_person_ids = []
+    punch_first_ts = []
+    current = start
+    while current < end:
+        for employee_id in employee_ids:
+            if rng.random() < 0.85:
+                punch_person_ids.append(employee_id)
+                punch_first_ts.append(
+                    datetime.combine(current, time_type(7)) + timedelta(seconds=rng.randint(0, 4 * 3600))
+                )
+        current += timedelta(days=1)
+
+    return weekly_schedules, employee_ids, working_graphic_ids, start, end, punch_person_ids, punch_first_ts
+
+
+def reference_punches(weekly_schedules, working_graphic_ids, first_ts):
+    results = []
+    for working_graphic_id, first_time in zip(working_graphic_ids, first_ts):
+        workday = weekly_schedules.get(working_graphic_id, {}).get(first_time.strftime("%A").lower())
+        if workday is None:
+            results.append((DAY_OFF, 0, 0))
+            continue
+
+        shift_start = datetime.combine(first_time.date(), workday[0])
+        if first_time <= shift_start:
+            results.append((ON_TIME, 0, (shift_start - first_time).total_seconds() // 60))
+        else:
+            results.append((LATE, (first_time - shift_start).total_seconds() // 60, 0))
+
+    return results
+
+
+def reference_month(weekly_schedules, employee_ids, working_graphic_ids, start, end, punch_person_ids, punch_first_ts):
+    first_times = {(person_id, ts.date()): ts for person_id, ts in zip(punch_person_ids, punch_first_ts)}
+
+    days = []
+    current = start
+    while current < end:
+        weekday = current.strftime("%A").lower()
+        on_time = late = did_not_come = 0
+        for employee_id, working_graphic_id in zip(employee_ids, working_graphic_ids):
+            workday = weekly_schedules.get(working_graphic_id, {}).get(weekday)
+            if workday is None:
+                continue
+
+            first_time = first_times.get((employee_id, current))
+            if first_time is None:
+                did_not_come += 1
+            elif first_time.time() <= workday[0]:
+                on_time += 1
+            else:
+                late += 1
+        days.append((on_time, late, did_not_come))
+        current += timedelta(days=1)
+
+    return days
+
+
+def baseline_days(day_rows):
+    # the Day rows as get_schedule_days returned them, in insertion order
+    return [time_in for weekday, time_in, is_work_day in day_rows]
+
+
+def baseline_commers(day_rows, first_time):
+    """get_commers_by_filial: every (status, minutes_late, minutes_early) entry an employee got."""
+    attendance_time = first_time.time().isoformat()
+    on_time = []
+    late = []
+    for time_in in baseline_days(day_rows):
+        if time_in is None:
+            continue
+        shift_start = datetime.combine(first_time.date(), time_in)
+        if attendance_time <= time_in.isoformat():
+            on_time.append((ON_TIME, 0, (shift_start - first_time).total_seconds() // 60))
+            break
+        late.append((LATE, (first_time - shift_start).total_seconds() // 60, 0))
+
+    # late entries were deduplicated per employee and attendance time, keeping the last
+    return on_time + late[-1:]
+
+
+def baseline_daily(day_rows, first_time):
+    """get_daily_attendance: the first row with a time_in decides."""
+    for time_in in baseline_days(day_rows):
+        if time_in is None:
+            continue
+        shift_start = datetime.combine(first_time.date(), time_in)
+        if first_time.time().isoformat() <= time_in.isoformat():
+            return ON_TIME, 0, (shift_start - first_time).total_seconds() // 60
+        return LATE, (first_time - shift_start).total_seconds() // 60, 0
+
+
+def baseline_attend_day(day_rows, first_time):
+    """get_attend_day: minutes late against the first row the punch is after, None if not listed."""
+    for time_in in baseline_days(day_rows):
+        if time_in is None:
+            continue
+        if first_time.time().isoformat() > time_in.isoformat():
+            return (first_time - datetime.combine(first_time.date(), time_in)).total_seconds() // 60
+
+
+def baseline_did_not_come(day_rows):
+    """get_commers_by_filial: an absent employee was listed whenever the graphic had any Day row."""
+    return bool(day_rows)
+
+
+def engine_punch(day_rows, first_time):
+    # mirrors resolve_schedule: only work days with a time_in are shifts
+    weekly = {weekday: (time_in, None) for weekday, time_in, is_work_day in day_rows if is_work_day and time_in}
+    evaluation = evaluate_punches(ScheduleTable({1: weekly}), [1], [first_time])
+    return tuple(int(values[0]) for values in evaluation)
+
+
+def engine_commers(day_rows, first_time):
+    return [engine_punch(day_rows, first_time)]
+
+
+def engine_daily(day_rows, first_time):
+    return engine_punch(day_rows, first_time)
+
+
+def engine_attend_day(day_rows, first_time):
+    status, minutes_late, minutes_early = engine_punch(day_rows, first_time)
+    return minutes_late if status == LATE else None
+
+
+def engine_did_not_come(day_rows, day):
+    weekly = {weekday: (time_in, None) for weekday, time_in, is_work_day in day_rows if is_work_day and time_in}
+    evaluation = evaluate_month(ScheduleTable({1: weekly}), [1], [1], day, day + timedelta(days=1), [], [])
+    return bool(evaluation.did_not_come[0])
+
+
+MONDAY = date(2024, 9, 2)
+TUESDAY = date(2024, 9, 3)
+SINGLE_MONDAY = [("monday", time_type(8, 30), True)]
+
+# a single Day row, punched on its own weekday, around the exact minute of time_in
+KEPT = [
+    (SINGLE_MONDAY, datetime.combine(MONDAY, time_type(8, 0))),
+    (SINGLE_MONDAY, datetime.combine(MONDAY, time_type(8, 29, 59))),
+    (SINGLE_MONDAY, datetime.combine(MONDAY, time_type(8, 30))),
+    (SINGLE_MONDAY, datetime.combine(MONDAY, time_type(8, 30, 0, 500000))),
+    (SINGLE_MONDAY, datetime.combine(MONDAY, time_type(8, 30, 59))),
+    (SINGLE_MONDAY, datetime.combine(MONDAY, time_type(8, 31))),
+    (SINGLE_MONDAY, datetime.combine(MONDAY, time_type(10, 15, 30))),
+    ([("monday", time_type(9, 0, 15), True)], datetime.combine(MONDAY, time_type(9, 0, 15))),
+    ([("monday", time_type(9, 0, 15), True)], datetime.combine(MONDAY, time_type(9, 0, 16))),
+]
+KEPT_CHECKS = [
+    (baseline_commers, engine_commers),
+    (baseline_daily, engine_daily),
+    (baseline_attend_day, engine_attend_day),
+]
+
+# (what changed, report, day rows, punch or day, baseline result, engine result)
+DIVERGENCES = [
+    (
+        "a punch on a weekday without a Day row was judged against the first row, now it is a day off",
+        "commers", SINGLE_MONDAY, datetime.combine(TUESDAY, time_type(9)),
+        [(LATE, 30, 0)], [(DAY_OFF, 0, 0)],
+    ),
+    (
+        "with several rows the first row decided, now the row of the punch's weekday does",
+        "daily", [("monday", time_type(9), True), ("tuesday", time_type(8), True)],
+        datetime.combine(TUESDAY, time_type(8, 30)),
+        (ON_TIME, 0, 30), (LATE, 30, 0),
+    ),
+    (
+        "a punch late for an earlier row and on time for a later one was listed both late and on time",
+        "commers", [("monday", time_type(8), True), ("tuesday", time_type(9), True)],
+        datetime.combine(TUESDAY, time_type(8, 30)),
+        [(ON_TIME, 0, 30), (LATE, 30, 0)], [(ON_TIME, 0, 30)],
+    ),
+    (
+        "the day list skipped rows the punch was on time for and reported lateness against a later row",
+        "attend_day", [("monday", time_type(9), True), ("tuesday", time_type(8), True)],
+        datetime.combine(MONDAY, time_type(8, 30)),
+        30, None,
+    ),
+    (
+        "a Day row with is_work_day false still had its time_in applied, now it is a day off",
+        "daily", [("monday", time_type(8, 30), False)], datetime.combine(MONDAY, time_type(9)),
+        (LATE, 30, 0), (DAY_OFF, 0, 0),
+    ),
+    (
+        "absent employees were counted on every day the graphic had any row, now only on scheduled weekdays",
+        "did_not_come", SINGLE_MONDAY, TUESDAY,
+        True, False,
+    ),
+]
+DIVERGENCE_CHECKS = {
+    "commers": (baseline_commers, engine_commers),
+    "daily": (baseline_daily, engine_daily),
+    "attend_day": (baseline_attend_day, engine_attend_day),
+    "did_not_come": (lambda day_rows, day: baseline_did_not_come(day_rows), engine_did_not_come),
+}
+
+
+def check_baseline():
+    mismatches = []
+    for day_rows, first_time in KEPT:
+        for baseline, engine in KEPT_CHECKS:
+            expected = baseline(day_rows, first_time)
+            actual = engine(day_rows, first_time)
+            if actual != expected:
+                mismatches.append(f"{baseline.__name__} {day_rows} {first_time}: expected {expected}, got {actual}")
+
+    for description, report, day_rows, value, baseline_result, engine_result in DIVERGENCES:
+        baseline, engine = DIVERGENCE_CHECKS[report]
+        results = baseline(day_rows, value), engine(day_rows, value)
+        if results != (baseline_result, engine_result):
+            mismatches.append(f"{description}: expected {(baseline_result, engine_result)}, got {results}")
+
+    print(f"baseline cases={len(KEPT) * len(KEPT_CHECKS)} divergences={len(DIVERGENCES)}")
+    for mismatch in mismatches:
+        print(f"  {mismatch}")
+    if mismatches:
+        raise SystemExit("lateness evaluation differs from the baseline")
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def run(employees: int, graphics: int, seed: int):
+    check_baseline()
+
+    month = make_month(employees, graphics, seed)
+    weekly_schedules, employee_ids, working_graphic_ids, start, end, punch_person_ids, punch_first_ts = month
+    graphic_by_employee = dict(zip(employee_ids, working_graphic_ids))
+    punch_graphic_ids = [graphic_by_employee[person_id] for person_id in punch_person_ids]
+
+    expected_punches, reference_seconds = timed(reference_punches, weekly_schedules, punch_graphic_ids, punch_first_ts)
+    evaluation, vectorized_seconds = timed(
+        lambda: evaluate_punches(ScheduleTable(weekly_schedules), punch_graphic_ids, punch_first_ts)
+    )
+    actual_punches = list(zip(
+        evaluation.status.tolist(), evaluation.minutes_late.tolist(), evaluation.minutes_early.tolist()
+    ))
+    print(f"punches={len(punch_first_ts)}")
+    print(f"  reference:  {reference_seconds * 1000:.1f} ms")
+    print(f"  vectorized: {vectorized_seconds * 1000:.1f} ms")
+
+    expected_month, reference_month_seconds = timed(reference_month, *month)
+    evaluation_month, vectorized_month_seconds = timed(
+        lambda: evaluate_month(ScheduleTable(weekly_schedules), *month[1:])
+    )
+    # get_commers_percentage fetches first punches as epoch microseconds straight from SQL
+    punch_epochs = to_datetime64(punch_first_ts).astype(np.int64)
+    evaluation_epochs, epochs_month_seconds = timed(
+        lambda: evaluate_month(ScheduleTable(weekly_schedules), *month[1:5], np.array(punch_person_ids), punch_epochs)
+    )
+    actual_month = list(zip(
+        evaluation_month.on_time.tolist(), evaluation_month.late.tolist(), evaluation_month.did_not_come.tolist()
+    ))
+    actual_epochs_month = list(zip(
+        evaluation_epochs.on_time.tolist(), evaluation_epochs.late.tolist(), evaluation_epochs.did_not_come.tolist()
+    ))
+    print(f"month employees={employees} days={len(expected_month)}")
+    print(f"  reference:             {reference_month_seconds * 1000:.1f} ms")
+    print(f"  vectorized, datetimes: {vectorized_month_seconds * 1000:.1f} ms")
+    print(f"  vectorized, epochs:    {epochs_month_seconds * 1000:.1f} ms")
+
+    if actual_punches != expected_punches:
+        raise SystemExit("punch evaluation differs from the reference")
+    if actual_month != expected_month or actual_epochs_month != expected_month:
+        raise SystemExit("month evaluation differs from the reference")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--graphics", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.employees, args.graphics, args.seed)
+
+
+if __name__ == "__main__":
+    main()
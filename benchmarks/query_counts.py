@@ -0,0 +1,88 @@
+"""
+Profile the SQL statements each endpoint issues and the rows they fetch, and check
+that list endpoints stay at a constant number of statements whatever the page size.
+
+    python -m benchmarks.query_counts --limits 1 10 100
+"""
+import argparse
+import asyncio
+
+import httpx
+from sqlalchemy import event
+
+from app.auth.auth import current_user
+from app.database import engine
+from app.main import main_app
+
+PAGED_PATHS = [
+    "/employees/?limit={limit}",
+    "/filials/?limit={limit}",
+    "/positions/?limit={limit}",
+    "/working_graphics/?limit={limit}",
+]
+
+PROFILED_PATHS = [
+    "/employees/1",
+    "/employees/deep/1?date=2024-09",
+    "/filials/?limit=10",
+    "/filials/1",
+    "/positions/?limit=10",
+    "/working_graphics/?limit=10",
+    "/attendance/",
+]
+
+
+class BenchmarkUser:
+    id = 0
+    email = "benchmark@localhost"
+
+
+async def run(limits: list[int]):
+    statements = 0
+    rows = 0
+
+    def count_statement(conn, cursor, *args):
+        nonlocal statements, rows
+        statements += 1
+        rows += max(cursor.rowcount, 0)
+
+    event.listen(engine.sync_engine, "after_cursor_execute", count_statement)
+    main_app.dependency_overrides[current_user] = lambda: BenchmarkUser()
+
+    failures = []
+    transport = httpx.ASGITransport(app=main_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        async def profile(path: str) -> tuple[int, int, int]:
+            nonlocal statements, rows
+            statements = rows = 0
+            response = await client.get(path)
+            return response.status_code, statements, rows
+
+        for template in PAGED_PATHS:
+            counts = {limit: await profile(template.format(limit=limit)) for limit in limits}
+            print(f"GET {template}: " + ", ".join(
+                f"limit={limit} -> {n} statements / {fetched} rows" for limit, (_, n, fetched) in counts.items()
+            ))
+            if len({n for _, n, _ in counts.values()}) > 1:
+                failures.append(template)
+
+        for path in PROFILED_PATHS:
+            status_code, n, fetched = await profile(path)
+            print(f"GET {path} [{status_code}]: {n} statements / {fetched} rows")
+
+    await engine.dispose()
+
+    if failures:
+        raise SystemExit(f"statement count grows with page size: {', '.join(failures)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limits", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    asyncio.run(run(args.limits))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Measure end-to-end latency of a cheap authenticated endpoint through the ASGI app.
+
+    python -m benchmarks.request_latency --path /positions/?limit=0 --repeat 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app.auth.auth import current_user
+from app.database import engine
+from app.main import main_app
+
+
+class BenchmarkUser:
+    id = 0
+    email = "benchmark@localhost"
+
+
+async def run(path: str, repeat: int):
+    main_app.dependency_overrides[current_user] = lambda: BenchmarkUser()
+
+    timings = []
+    transport = httpx.ASGITransport(app=main_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        await client.get(path)
+
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = await client.get(path)
+            timings.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+
+    await engine.dispose()
+
+    timings.sort()
+    print(f"GET {path} repeat={repeat}")
+    print(f"  mean: {statistics.mean(timings):.2f} ms")
+    print(f"  p50:  {timings[len(timings) // 2]:.2f} ms")
+    print(f"  p95:  {timings[int(len(timings) * 0.95)]:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--path", default="/positions/?limit=0")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.path, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
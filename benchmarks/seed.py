@@ -0,0 +1,214 @@
+"""
+Fill the database configured in .env with a synthetic company: filials, positions,
+working graphics, employees, months of attendance punches and client sightings.
+
+    python -m benchmarks.seed --filials 5 --employees 50 --months 2 --clients 300 --reset
+
+Point DB_NAME at a scratch database: --reset truncates every application table.
+The generator is seeded, so the same arguments always produce the same rows.
+"""
+import argparse
+import asyncio
+import random
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import func, insert, text
+from sqlalchemy.future import select
+
+from app.crud.client import get_time_slot
+from app.crud.daily_presence import rebuild_daily_presence
+from app.database import SessionLocal, engine, init_db
+from app.models import Attendance, Client, DailyReportClient, DailyReportCounter, Day, Employee, Filial, Position, \
+    WorkingGraphic
+from app.utils.lateness import WEEKDAYS
+
+SEEDED_TABLES = [
+    "daily_report_clients", "daily_report_counters", "daily_reports", "clients", "daily_presence", "attendances",
+    "employee_images", "employees", "days", "working_graphics", "positions", "filials",
+]
+POSITIONS = ["cashier", "manager", "guard", "cleaner", "developer"]
+BATCH_SIZE = 5000
+
+
+def month_range(first_month: str, months: int) -> tuple[date, date]:
+    start = datetime.strptime(first_month, "%Y-%m").date()
+    end = start
+    for _ in range(months):
+        end = (end + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def make_graphic(rng: random.Random) -> list[dict]:
+    shift_start = time(rng.choice([8, 9, 10]), rng.choice([0, 30]))
+    shift_end = time(shift_start.hour + 9, shift_start.minute)
+    works_saturday = rng.random() < 0.3
+
+    days = []
+    for weekday in WEEKDAYS:
+        is_work_day = weekday not in ("saturday", "sunday") or (weekday == "saturday" and works_saturday)
+        days.append({
+            "day": weekday.capitalize(),
+            "time_in": shift_start.strftime("%H:%M") if is_work_day else None,
+            "time_out": shift_end.strftime("%H:%M") if is_work_day else None,
+            "is_work_day": is_work_day,
+        })
+    return days
+
+
+def make_punches(rng: random.Random, employee: dict, days_by_graphic: dict, start: date, end: date):
+    schedule = {day["day"].lower(): day for day in days_by_graphic[employee["working_graphic_id"]]}
+    current = start
+    while current < end:
+        workday = schedule[WEEKDAYS[current.weekday()]]
+        if workday["is_work_day"] and rng.random() < 0.9:
+            shift_start = datetime.combine(current, datetime.strptime(workday["time_in"], "%H:%M").time())
+            shift_end = datetime.combine(current, datetime.strptime(workday["time_out"], "%H:%M").time())
+            arrival = shift_start + timedelta(minutes=rng.gauss(-5, 15))
+            yield arrival
+            yield arrival + timedelta(minutes=rng.randint(60, 240))
+            yield shift_end + timedelta(minutes=rng.gauss(10, 20))
+        elif not workday["is_work_day"] and rng.random() < 0.05:
+            yield datetime.combine(current, time(11)) + timedelta(minutes=rng.randint(0, 120))
+        current += timedelta(days=1)
+
+
+async def insert_batches(db, model, rows: list[dict]):
+    for offset in range(0, len(rows), BATCH_SIZE):
+        await db.execute(insert(model), rows[offset:offset + BATCH_SIZE])
+
+
+async def insert_returning_ids(db, model, rows: list[dict]) -> list[int]:
+    result = await db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), rows)
+    return result.scalars().all()
+
+
+async def seed(filials: int, employees: int, graphics: int, first_month: str, months: int, clients: int,
+               seed_value: int, reset: bool) -> dict:
+    rng = random.Random(seed_value)
+    start, end = month_range(first_month, months)
+    await init_db()
+
+    async with SessionLocal() as db:
+        existing = await db.execute(select(func.count()).select_from(Employee))
+        if existing.scalar() and not reset:
+            raise SystemExit("the database already holds employees, pass --reset to truncate it first")
+        if reset:
+            await db.execute(text(f"TRUNCATE {', '.join(SEEDED_TABLES)} RESTART IDENTITY CASCADE"))
+
+        filial_ids = await insert_returning_ids(db, Filial, [
+            {"name": f"Filial {number}", "address": f"Street {number}"} for number in range(1, filials + 1)
+        ])
+        position_ids = await insert_returning_ids(db, Position, [{"name": name} for name in POSITIONS])
+        graphic_ids = await insert_returning_ids(db, WorkingGraphic, [
+            {"name": f"Graphic {number}"} for number in range(1, graphics + 1)
+        ])
+
+        days_by_graphic = {graphic_id: make_graphic(rng) for graphic_id in graphic_ids}
+        await insert_batches(db, Day, [
+            {**day, "working_graphic_id": graphic_id}
+            for graphic_id, days in days_by_graphic.items() for day in days
+        ])
+
+        employee_rows = [
+            {
+                "name": f"Employee {filial_id}-{number}",
+                "phone_number": f"+99890{filial_id:03d}{number:04d}",
+                "position_id": rng.choice(position_ids),
+                "filial_id": filial_id,
+                "working_graphic_id": rng.choice(graphic_ids),
+            }
+            for filial_id in filial_ids for number in range(1, employees + 1)
+        ]
+        employee_ids = await insert_returning_ids(db, Employee, employee_rows)
+
+        attendances = []
+        for employee_id, employee in zip(employee_ids, employee_rows):
+            camera_id = employee["filial_id"] * 10 + 1
+            for ts in make_punches(rng, employee, days_by_graphic, start, end):
+                ts = ts.replace(microsecond=0)
+                attendances.append({
+                    "person_id": employee_id,
+                    "camera_id": camera_id,
+                    "time": ts.strftime("%Y-%m-%d %H:%M:%S"),
+                    "ts": ts,
+                    "score": f"{rng.uniform(0.6, 1.0):.2f}",
+                    "file_path": f"/storage/users/{employee_id}/attendances/seed.jpg",
+                })
+        await insert_batches(db, Attendance, attendances)
+        await db.commit()
+        presence_rows = await rebuild_daily_presence(db)
+
+        visits, client_rows, counters = make_client_visits(rng, clients, start, end, len(filial_ids))
+        await insert_batches(db, Client, list(client_rows.values()))
+        await insert_batches(db, DailyReportClient, visits)
+        await insert_batches(db, DailyReportCounter, [
+            {"date": report_date, "time_slot": time_slot, "gender": gender, "age": age, "client_status": status,
+             "count": count}
+            for (report_date, time_slot, gender, age, status), count in counters.items()
+        ])
+        await db.commit()
+
+    await engine.dispose()
+    return {
+        "filials": len(filial_ids),
+        "employees": len(employee_ids),
+        "working_graphics": len(graphic_ids),
+        "attendances": len(attendances),
+        "daily_presence": presence_rows,
+        "clients": len(client_rows),
+        "client_visits": len(visits),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+    }
+
+
+def make_client_visits(rng: random.Random, clients_per_day: int, start: date, end: date, filials: int):
+    population = [
+        {"id": client_id, "gender": rng.choice(["male", "female"]), "age": rng.randint(16, 70)}
+        for client_id in range(1, clients_per_day * 10 + 1)
+    ]
+
+    visits = []
+    client_rows = {}
+    counters = Counter()
+    current = start
+    while current < end:
+        for client in rng.sample(population, clients_per_day):
+            ts = datetime.combine(current, time(9)) + timedelta(seconds=rng.randint(0, 12 * 3600))
+            status = "regular" if client["id"] in client_rows else "new"
+            time_slot = get_time_slot(ts)
+            visits.append({
+                "date": current, "client_id": client["id"], "ts": ts, "time_slot": time_slot,
+                "gender": client["gender"], "age": client["age"], "client_status": status,
+            })
+            client_rows[client["id"]] = {
+                **client, "score": "0.90", "client_status": status, "camera_id": rng.randint(1, filials) * 10 + 2,
+                "time": ts.strftime("%Y-%m-%d %H:%M:%S"), "ts": ts,
+            }
+            counters[(current, time_slot, client["gender"], client["age"], status)] += 1
+        current += timedelta(days=1)
+
+    return visits, client_rows, counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filials", type=int, default=5)
+    parser.add_argument("--employees", type=int, default=50, help="employees per filial")
+    parser.add_argument("--graphics", type=int, default=10)
+    parser.add_argument("--month", default="2024-09", help="first month of punches, YYYY-MM")
+    parser.add_argument("--months", type=int, default=2)
+    parser.add_argument("--clients", type=int, default=300, help="client sightings per day")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reset", action="store_true", help="truncate the application tables first")
+    args = parser.parse_args()
+
+    counts = asyncio.run(seed(
+        args.filials, args.employees, args.graphics, args.month, args.months, args.clients, args.seed, args.reset
+    ))
+    print(", ".join(f"{name}={value}" for name, value in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Run timed scenarios against the FastAPI app through an in-process ASGI client and
+emit the results as JSON, so runs can be diffed and compared.
+
+    python -m benchmarks.seed --reset
+    python -m benchmarks.suite --repeat 20 --output before.json
+    python -m benchmarks.suite --repeat 20 --baseline before.json
+
+Scenario parameters (filial, day, month) default to the first filial and the
+busiest month found in the database. The report cache is cleared before every
+timed GET so the numbers measure the computation; the "*_cached" scenarios
+measure cache hits. The create_attendance burst posts through camera
+--burst-camera and removes its rows and images afterwards.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import delete, func
+from sqlalchemy.future import select
+
+from app.auth.auth import current_user
+from app.crud.daily_presence import refresh_daily_presence
+from app.crud.report_cache import invalidate_reports
+from app.database import SessionLocal, engine
+from app.main import main_app
+from app.models import Attendance, DailyPresence, DailyReportClient, Employee, Filial
+from app.utils.file_utils import IMAGE_DIR
+from app.utils.image_variants import shutdown_variant_pool, start_variant_pool
+
+SERVER_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) statements"')
+
+
+class BenchmarkUser:
+    id = 0
+    email = "benchmark@localhost"
+
+
+def summarize(timings: list[float], statuses: list[int], statements: list[int], db_times: list[float]) -> dict:
+    timings = sorted(timings)
+    return {
+        "requests": len(timings),
+        "statuses": {str(code): statuses.count(code) for code in sorted(set(statuses))},
+        "mean_ms": round(statistics.mean(timings), 2),
+        "p50_ms": round(timings[len(timings) // 2], 2),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        "max_ms": round(timings[-1], 2),
+        "db_statements": max(statements),
+        "db_mean_ms": round(statistics.mean(db_times), 2),
+    }
+
+
+async def timed_request(client: httpx.AsyncClient, method: str, url: str, **kwargs):
+    started = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    match = SERVER_TIMING.search(response.headers.get("server-timing", ""))
+    db_time, statements = (float(match.group(1)), int(match.group(2))) if match else (0.0, 0)
+    return response.status_code, elapsed, statements, db_time
+
+
+async def run_get(client: httpx.AsyncClient, url: str, repeat: int, cached: bool) -> dict:
+    await client.get(url)
+    results = []
+    for _ in range(repeat):
+        if not cached:
+            invalidate_reports()
+        results.append(await timed_request(client, "GET", url))
+
+    statuses, timings, statements, db_times = zip(*results)
+    return {"url": url, **summarize(list(timings), list(statuses), list(statements), list(db_times))}
+
+
+async def run_attendance_burst(client: httpx.AsyncClient, person_ids: list[int], day: str, events: int,
+                               concurrency: int, camera_id: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    started_at = datetime.strptime(day, "%Y-%m-%d").replace(hour=8)
+
+    async def post(number: int):
+        async with semaphore:
+            return await timed_request(
+                client, "POST", "/attendance/",
+                params={
+                    "person_id": person_ids[number % len(person_ids)],
+                    "camera_id": camera_id,
+                    "time": (started_at + timedelta(seconds=number)).strftime("%Y-%m-%d %H:%M:%S"),
+                    "score": "0.9",
+                },
+                files={"file": (f"benchmark-{number}.jpg", b"\xff\xd8" + number.to_bytes(4, "big") + bytes(4092),
+                                "image/jpeg")},
+            )
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(post(number) for number in range(events)))
+    wall = time.perf_counter() - started
+
+    statuses, timings, statements, db_times = zip(*results)
+    return {
+        "events": events,
+        "concurrency": concurrency,
+        "events_per_second": round(events / wall, 1),
+        **summarize(list(timings), list(statuses), list(statements), list(db_times)),
+    }
+
+
+async def remove_burst(camera_id: int):
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(Attendance.person_id, Attendance.ts, Attendance.file_path).filter_by(camera_id=camera_id)
+        )
+        rows = result.all()
+        await db.execute(delete(Attendance).filter_by(camera_id=camera_id))
+        await db.flush()
+        for person_id, day in {(person_id, ts.date()) for person_id, ts, _ in rows}:
+            await refresh_daily_presence(db, person_id, day)
+        await db.commit()
+
+    for _, _, file_path in rows:
+        (IMAGE_DIR.parent / file_path.removeprefix("/storage/")).unlink(missing_ok=True)
+
+
+async def pick_parameters(filial_id, month, day) -> dict:
+    async with SessionLocal() as db:
+        if filial_id is None:
+            result = await db.execute(select(func.min(Filial.id)))
+            filial_id = result.scalar()
+        if month is None:
+            month_start = func.date_trunc("month", DailyPresence.date)
+            result = await db.execute(
+                select(month_start).group_by(month_start).order_by(func.count().desc()).limit(1)
+            )
+            busiest = result.scalar()
+            month = busiest.strftime("%Y-%m") if busiest else datetime.now().strftime("%Y-%m")
+        if day is None:
+            day = f"{month}-15"
+
+        result = await db.execute(select(Employee.id).filter_by(filial_id=filial_id).order_by(Employee.id))
+        person_ids = result.scalars().all()
+        result = await db.execute(select(func.count()).select_from(DailyReportClient))
+        client_visits = result.scalar()
+        result = await db.execute(select(func.count()).select_from(Attendance))
+        attendances = result.scalar()
+
+    month_start = datetime.strptime(month, "%Y-%m")
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(minutes=1)
+    return {
+        "filial_id": filial_id,
+        "month": month,
+        "day": day,
+        "range_start": month_start.strftime("%Y-%m-%d %H:%M"),
+        "range_end": month_end.strftime("%Y-%m-%d %H:%M"),
+        "person_ids": person_ids,
+        "attendances": attendances,
+        "client_visits": client_visits,
+    }
+
+
+async def run(args) -> dict:
+    main_app.dependency_overrides[current_user] = lambda: BenchmarkUser()
+    parameters = await pick_parameters(args.filial, args.month, args.day)
+    if not parameters["person_ids"]:
+        raise SystemExit("no employees found, seed the database with python -m benchmarks.seed first")
+
+    filial_id, month, day = parameters["filial_id"], parameters["month"], parameters["day"]
+    reports_range = httpx.QueryParams({
+        "start_datetime": parameters["range_start"], "end_datetime": parameters["range_end"]
+    })
+    gets = {
+        "get_commers_by_filial": (f"/attendance/commers/{filial_id}/{day}", False),
+        "get_commers_by_filial_cached": (f"/attendance/commers/{filial_id}/{day}", True),
+        "get_commers_percentage": (f"/attendance/commers-percent/{month}?filial_id={filial_id}", False),
+        "get_daily_report_range": (f"/clients/reports?{reports_range}", False),
+        "get_daily_report_range_cached": (f"/clients/reports?{reports_range}", True),
+        "get_filials": (f"/filials/?limit={args.page_size}", False),
+    }
+
+    scenarios = {}
+    transport = httpx.ASGITransport(app=main_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for name, (url, cached) in gets.items():
+            if args.only and name not in args.only:
+                continue
+            scenarios[name] = await run_get(client, url, args.repeat, cached)
+            print(f"{name}: p50 {scenarios[name]['p50_ms']} ms, {scenarios[name]['db_statements']} statements",
+                  file=sys.stderr)
+
+        if not args.only or "create_attendance_burst" in args.only:
+            # the server starts its thumbnail workers on startup, the transport does not run the lifespan
+            await start_variant_pool()
+            try:
+                scenarios["create_attendance_burst"] = await run_attendance_burst(
+                    client, parameters["person_ids"], day, args.burst, args.concurrency, args.burst_camera
+                )
+            finally:
+                await remove_burst(args.burst_camera)
+            print(f"create_attendance_burst: {scenarios['create_attendance_burst']['events_per_second']} events/s",
+                  file=sys.stderr)
+
+    shutdown_variant_pool()
+    await engine.dispose()
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "dataset": {key: value for key, value in parameters.items() if key != "person_ids"},
+        "scenarios": scenarios,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, scenario in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        ratio = scenario["p50_ms"] / before["p50_ms"] if before["p50_ms"] else 1.0
+        print(f"{name}: p50 {before['p50_ms']} -> {scenario['p50_ms']} ms ({ratio:.2f}x), "
+              f"statements {before['db_statements']} -> {scenario['db_statements']}", file=sys.stderr)
+        if ratio > tolerance or scenario["db_statements"] > before["db_statements"]:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--filial", type=int)
+    parser.add_argument("--month", help="YYYY-MM, defaults to the month with the most presence rows")
+    parser.add_argument("--day", help="YYYY-MM-DD, defaults to the 15th of --month")
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--burst", type=int, default=200, help="attendances posted by the burst scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--burst-camera", type=int, default=999999)
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed p50 slowdown against --baseline")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            raise SystemExit(f"regressed: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()